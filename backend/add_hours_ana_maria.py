@@ -6,14 +6,14 @@ O: python manage.py shell, luego exec(open('add_hours_ana_maria.py').read())
 
 import os
 import django
-from datetime import datetime, timedelta, time
+from datetime import datetime
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'veterinaria_pochita.settings')
 django.setup()
 
 from apps.users.models import User
-from apps.appointments.models import TimeSlot
+from apps.appointments.services import generate_time_slots
 
 print("🔧 Agregando más horarios para Ana María Oñate...")
 
@@ -26,44 +26,11 @@ except User.DoesNotExist:
     exit(1)
 
 today = datetime.now().date()
-time_slots_created = 0
 
-# Agregar horarios para los próximos 30 días
-for day in range(30):
-    date = today + timedelta(days=day)
-    
-    # Saltar domingos
-    if date.weekday() == 6:
-        continue
-    
-    # Horarios de mañana (9:00 - 13:00) - Agregar todos, no solo alternados
-    for hour in range(9, 13):
-        slot, created = TimeSlot.objects.get_or_create(
-            veterinarian=ana_maria,
-            date=date,
-            start_time=time(hour, 0),
-            defaults={
-                'end_time': time(hour + 1, 0),
-                'is_available': True
-            }
-        )
-        if created:
-            time_slots_created += 1
-    
-    # Horarios de tarde (15:00 - 19:00) - Solo días de semana
-    if date.weekday() < 5:  # Lunes a Viernes
-        for hour in range(15, 19):
-            slot, created = TimeSlot.objects.get_or_create(
-                veterinarian=ana_maria,
-                date=date,
-                start_time=time(hour, 0),
-                defaults={
-                    'end_time': time(hour + 1, 0),
-                    'is_available': True
-                }
-            )
-            if created:
-                time_slots_created += 1
+# Agregar horarios para los próximos 30 días: mañanas de lunes a sábado (9:00 - 13:00)
+# y tardes de lunes a viernes (15:00 - 19:00), insertados en bloque
+result = generate_time_slots([ana_maria], today, 30)
+time_slots_created = result['created']
 
 print(f"✅ Se agregaron {time_slots_created} nuevos bloques de tiempo para {ana_maria.get_full_name()}")
 print(f"📅 Horarios creados para los próximos 30 días (excluyendo domingos)")
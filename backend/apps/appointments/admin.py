@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TimeSlot, Appointment, WaitingList
+from .models import TimeSlot, Appointment, WaitingList, AvailabilityRule, AvailabilityException
 
 
 @admin.register(TimeSlot)
@@ -20,6 +20,22 @@ class TimeSlotAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(AvailabilityRule)
+class AvailabilityRuleAdmin(admin.ModelAdmin):
+    list_display = ('veterinarian', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until', 'is_active')
+    list_filter = ('is_active', 'weekday', 'veterinarian')
+    search_fields = ('veterinarian__first_name', 'veterinarian__last_name')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(AvailabilityException)
+class AvailabilityExceptionAdmin(admin.ModelAdmin):
+    list_display = ('veterinarian', 'date', 'start_time', 'end_time', 'reason')
+    list_filter = ('date', 'veterinarian')
+    search_fields = ('veterinarian__first_name', 'veterinarian__last_name', 'reason')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('pet', 'client', 'veterinarian', 'appointment_date', 'appointment_time', 'status')
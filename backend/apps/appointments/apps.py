@@ -5,4 +5,7 @@ class AppointmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.appointments'
     verbose_name = 'Citas'
-
+    
+    def ready(self):
+        # Registrar señales de invalidación del caché de calendario
+        from . import signals  # noqa: F401
@@ -0,0 +1,262 @@
+"""
+Índice de disponibilidad en memoria.
+
+Por cada veterinario y fecha guarda un entero usado como bitmap: el bit N
+encendido indica un bloque libre que comienza en el minuto N del día. Responde
+"primer bloque libre del veterinario después de T", "veterinarios libres en T"
+y "días con bloques libres del mes" sin consultar la base de datos.
+
+Incluye los bloques guardados libres y los bloques virtuales de los horarios
+recurrentes. Cubre desde el día en que se construyó (los días pasados no se
+reservan) hasta AVAILABILITY_INDEX_DAYS días después, y se arma de forma perezosa en el primer uso, para no consultar
+la base de datos al importar la app ni durante las migraciones. signals.py y
+services.py lo mantienen al día al confirmar cada transacción. Una versión
+compartida en el caché detecta cambios hechos por otros procesos y fuerza la
+reconstrucción; AVAILABILITY_INDEX_MAX_AGE limita la antigüedad cuando el caché
+no se comparte entre procesos (locmem).
+
+El índice es orientativo: las reservas siempre se confirman contra la base de
+datos (claim_time_slot), por lo que un dato desactualizado nunca produce una
+doble reserva.
+"""
+
+import threading
+import time as time_module
+from calendar import monthrange
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.models import User
+from .models import TimeSlot
+from .virtual_slots import expand_virtual_slots
+
+
+VERSION_KEY = 'availability:version'
+
+
+def _minute(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minute):
+    return time(minute // 60, minute % 60)
+
+
+def _bits(bitmap):
+    """Posiciones de los bits encendidos, de menor a mayor"""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+class AvailabilityIndex:
+    """Bitmaps de bloques libres por veterinario y fecha"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._free = {}
+        self._active = set()
+        self._start = None
+        self._end = None
+        self._version = None
+        self._built_at = None
+
+    # Construcción y frescura
+
+    def _shared_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # Timestamp inicial para que un desalojo de la clave nunca repita una versión
+            cache.add(VERSION_KEY, time_module.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _load(self, start, end):
+        """Lee los bloques libres entre `start` y `end` (sin modificar el índice)"""
+        free = {}
+
+        def add(veterinarian_id, day, start_time):
+            days = free.setdefault(veterinarian_id, {})
+            days[day] = days.get(day, 0) | (1 << _minute(start_time))
+
+        materialized = set()
+        rows = TimeSlot.objects.filter(
+            date__gte=start,
+            date__lte=end,
+            veterinarian__role='VETERINARIO'
+        ).values_list('veterinarian_id', 'date', 'start_time', 'is_available')
+        for veterinarian_id, day, start_time, is_available in rows.iterator(chunk_size=5000):
+            materialized.add((veterinarian_id, day, start_time))
+            if is_available:
+                add(veterinarian_id, day, start_time)
+
+        for slot in expand_virtual_slots(start, end, materialized=materialized):
+            add(slot.veterinarian_id, slot.date, slot.start_time)
+
+        active = set(User.objects.filter(role='VETERINARIO', is_active=True).values_list('id', flat=True))
+        return free, active
+
+    def rebuild(self):
+        """Reconstruye el índice completo desde TimeSlot"""
+        with self._lock:
+            # Leer la versión antes de consultar: un cambio durante la carga fuerza otra reconstrucción
+            version = self._shared_version()
+            start = timezone.localdate()
+            end = start + timedelta(days=settings.AVAILABILITY_INDEX_DAYS)
+            self._free, self._active = self._load(start, end)
+            self._start = start
+            self._end = end
+            self._version = version
+            self._built_at = time_module.monotonic()
+
+    def invalidate(self):
+        """Marca el índice para reconstruirlo en el próximo uso (en todos los procesos)"""
+        with self._lock:
+            self._built_at = None
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                pass
+
+    def _ensure_fresh(self):
+        max_age = settings.AVAILABILITY_INDEX_MAX_AGE
+        if (
+            self._built_at is None
+            or time_module.monotonic() - self._built_at > max_age
+            or self._shared_version() != self._version
+        ):
+            self.rebuild()
+
+    def apply(self, changes):
+        """
+        Aplica cambios confirmados: iterable de (veterinario, fecha, hora de inicio, libre).
+        Si otro proceso modificó la disponibilidad desde la última sincronización,
+        el índice se reconstruye en el próximo uso en lugar de aplicar el cambio.
+        """
+        with self._lock:
+            try:
+                version = cache.incr(VERSION_KEY)
+            except ValueError:
+                version = None
+
+            if self._built_at is None or version is None or version != self._version + 1:
+                self._built_at = None
+                return
+
+            self._version = version
+            for veterinarian_id, day, start_time, is_free in changes:
+                if not self._start <= day <= self._end:
+                    continue
+                days = self._free.setdefault(veterinarian_id, {})
+                bit = 1 << _minute(start_time)
+                bitmap = days.get(day, 0)
+                bitmap = bitmap | bit if is_free else bitmap & ~bit
+                if bitmap:
+                    days[day] = bitmap
+                else:
+                    days.pop(day, None)
+
+    # Consultas
+
+    def covers(self, day):
+        """True si el índice tiene información de la fecha"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._start <= day <= self._end
+
+    def free_times(self, veterinarian_id, day):
+        """Horas de inicio libres del veterinario en la fecha"""
+        with self._lock:
+            self._ensure_fresh()
+            bitmap = self._free.get(veterinarian_id, {}).get(day, 0)
+        return [_time(minute) for minute in _bits(bitmap)]
+
+    def first_free_after(self, veterinarian_id, moment, days=60):
+        """
+        Primer bloque libre del veterinario que comienza en `moment` o después,
+        buscando hasta `days` días hacia adelante. Retorna (fecha, hora) o None.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            vet_days = self._free.get(veterinarian_id)
+            if not vet_days:
+                return None
+
+            day = max(moment.date(), self._start)
+            min_minute = _minute(moment) if day == moment.date() else 0
+            for _ in range(min(days, (self._end - day).days + 1)):
+                # Apagar los bits anteriores al minuto mínimo
+                bitmap = vet_days.get(day, 0) >> min_minute << min_minute
+                if bitmap:
+                    return day, _time((bitmap & -bitmap).bit_length() - 1)
+                day += timedelta(days=1)
+                min_minute = 0
+        return None
+
+    def veterinarians_free_at(self, day, start_time):
+        """Ids de los veterinarios activos con un bloque libre que comienza en (fecha, hora)"""
+        bit = 1 << _minute(start_time)
+        with self._lock:
+            self._ensure_fresh()
+            return [
+                veterinarian_id
+                for veterinarian_id, vet_days in self._free.items()
+                if vet_days.get(day, 0) & bit and veterinarian_id in self._active
+            ]
+
+    def free_days(self, year, month, veterinarian_id=None):
+        """
+        Fechas del mes (desde hoy) con al menos un bloque libre, del veterinario
+        indicado o de cualquier veterinario activo.
+        """
+        first_day = date(year, month, 1)
+        with self._lock:
+            self._ensure_fresh()
+            if veterinarian_id is None:
+                calendars = [self._free.get(vet_id, {}) for vet_id in self._active]
+            else:
+                calendars = [self._free.get(veterinarian_id, {})]
+
+            days = []
+            for offset in range(monthrange(year, month)[1]):
+                day = first_day + timedelta(days=offset)
+                if self._start <= day <= self._end and any(vet_days.get(day) for vet_days in calendars):
+                    days.append(day)
+        return days
+
+    def verify(self):
+        """
+        Compara el índice con la base de datos.
+        Retorna la lista de diferencias (veterinario, fecha, hora, libre_en_índice, libre_en_bd).
+        """
+        with self._lock:
+            self._ensure_fresh()
+            expected, _ = self._load(self._start, self._end)
+            differences = []
+            for veterinarian_id in set(expected) | set(self._free):
+                indexed = self._free.get(veterinarian_id, {})
+                stored = expected.get(veterinarian_id, {})
+                for day in set(indexed) | set(stored):
+                    mismatch = indexed.get(day, 0) ^ stored.get(day, 0)
+                    for minute in _bits(mismatch):
+                        in_index = bool(indexed.get(day, 0) >> minute & 1)
+                        differences.append((veterinarian_id, day, _time(minute), in_index, not in_index))
+        return sorted(differences)
+
+
+availability_index = AvailabilityIndex()
+
+
+def apply_on_commit(changes):
+    """Aplica cambios de disponibilidad al índice cuando se confirma la transacción actual"""
+    changes = list(changes)
+    if not all(isinstance(day, date) and isinstance(start_time, time) for _, day, start_time, _ in changes):
+        # Valores sin normalizar (p. ej. cadenas pasadas a objects.create): reconstruir
+        transaction.on_commit(availability_index.invalidate)
+        return
+    transaction.on_commit(lambda: availability_index.apply(changes))
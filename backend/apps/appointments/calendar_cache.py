@@ -0,0 +1,84 @@
+"""
+Caché del calendario mensual por (año, mes, veterinario).
+Las entradas se invalidan desde signals.py cuando cambia un bloque o una cita.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+GENERATION_KEY = 'calendar:generation'
+
+
+def _generation():
+    """
+    Generación actual del caché. Cambiarla invalida todas las entradas a la vez
+    (por ejemplo, cuando cambia el nombre de un veterinario o una mascota).
+    Se usa un timestamp para que, si la clave se desaloja, nunca se repita un valor antiguo.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.set(GENERATION_KEY, generation, None)
+    return generation
+
+
+def _key(generation, kind, year, month, veterinarian_id):
+    return f'calendar:{generation}:{kind}:{year}:{month}:{veterinarian_id or "all"}'
+
+
+def _version_key(generation, year, month, veterinarian_id):
+    return f'calendar:{generation}:version:{year}:{month}:{veterinarian_id or "all"}'
+
+
+def get_month(kind, year, month, veterinarian_id=None):
+    """Obtener el payload cacheado de un mes (None si no existe)"""
+    return cache.get(_key(_generation(), kind, year, month, veterinarian_id))
+
+
+def set_month(kind, year, month, veterinarian_id, payload):
+    """Guardar el payload serializado de un mes"""
+    cache.set(
+        _key(_generation(), kind, year, month, veterinarian_id),
+        payload,
+        settings.CALENDAR_CACHE_TIMEOUT
+    )
+
+
+def month_version(year, month, veterinarian_id=None):
+    """
+    Versión del mes para los GET condicionales: timestamp (ns) del último cambio.
+    Si la clave no existe (primer uso, desalojo o nueva generación) se crea con la
+    hora actual, que nunca es anterior al último cambio real.
+    """
+    key = _version_key(_generation(), year, month, veterinarian_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    # Sin caché compartido (DummyCache) cada petición tiene una versión nueva
+    return version if version is not None else time.time_ns()
+
+
+def invalidate_month(veterinarian_id, day):
+    """Invalidar las vistas del mes de `day` que incluyen al veterinario"""
+    generation = _generation()
+    cache.delete_many([
+        _key(generation, 'monthly', day.year, day.month, veterinarian_id),
+        _key(generation, 'monthly', day.year, day.month, None),
+        _key(generation, 'compact', day.year, day.month, veterinarian_id),
+        _key(generation, 'compact', day.year, day.month, None),
+        _key(generation, 'public', day.year, day.month, veterinarian_id),
+    ])
+    version = time.time_ns()
+    cache.set_many({
+        _version_key(generation, day.year, day.month, veterinarian_id): version,
+        _version_key(generation, day.year, day.month, None): version,
+    }, None)
+
+
+def invalidate_all():
+    """Invalidar todo el caché de calendario"""
+    cache.set(GENERATION_KEY, time.time_ns(), None)
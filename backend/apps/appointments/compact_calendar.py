@@ -0,0 +1,170 @@
+"""
+Formato compacto del calendario mensual (?format=compact).
+
+El formato normal repite en cada bloque los campos de TimeSlotSerializer
+(nombre del veterinario, fechas de creación y actualización, ...). El compacto
+describe cada día de un veterinario con una grilla:
+
+    {
+      "year": 2025, "month": 11, "format": "compact",
+      "veterinarians": [
+        {"id": 3, "name": "Ana Pérez", "days": [
+          {"day": 3, "start": "09:00", "step": 60, "slots": "11-0011",
+           "ids": [[4501, 3], [0, 1], [4505, 2]],
+           "appointments": [[4, 812, "PENDIENTE"]]}
+        ]}
+      ]
+    }
+
+- slots: un carácter por posición de la grilla, que parte en `start` y avanza
+  de a `step` minutos: "1" libre, "0" ocupado, "-" sin bloque.
+- ids: ids de los bloques de la grilla en orden, en tramos [primer id, cantidad]
+  de ids consecutivos. El 0 indica bloques virtuales (horarios recurrentes), cuyo
+  id se obtiene con virtual_slot_id(veterinario, fecha, hora).
+- appointments: [posición, id de la cita, estado], solo para los bloques
+  ocupados que tienen cita.
+- extra: bloques que no calzan en la grilla (otra duración o desfasados), como
+  {"id", "start", "end", "free"} y, si tienen cita, "appointment" y "status".
+
+decodeCompactCalendar() en main.js lo convierte a la lista de días del formato normal.
+"""
+
+from collections import Counter, defaultdict
+
+from rest_framework.renderers import JSONRenderer
+
+from apps.users.models import User
+from .models import TimeSlot
+from .services import month_bounds
+from .virtual_slots import expand_virtual_slots
+
+
+class CompactCalendarRenderer(JSONRenderer):
+    """Habilita ?format=compact; la vista arma el payload compacto"""
+    format = 'compact'
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _runs(ids):
+    """Tramos [primer id, cantidad] de ids consecutivos (los 0 se agrupan entre sí)"""
+    runs = []
+    for slot_id in ids:
+        if runs:
+            first, count = runs[-1]
+            if slot_id == (first + count if first else 0):
+                runs[-1][1] += 1
+                continue
+        runs.append([slot_id, 1])
+    return runs
+
+
+def _compact_day(slots):
+    """
+    Grilla de un día de un veterinario. `slots` son tuplas (inicio, fin, libre,
+    id, id de la cita, estado) ordenadas por hora; los bloques virtuales tienen id negativo.
+    """
+    step = Counter(_minutes(end) - _minutes(start) for start, end, *_ in slots).most_common(1)[0][0]
+    anchor = _minutes(slots[0][0])
+    grid, ids, appointments, extra = [], [], [], []
+
+    for start_time, end_time, available, slot_id, appointment_id, status in slots:
+        start = _minutes(start_time)
+        position, remainder = divmod(start - anchor, step) if step > 0 else (0, 1)
+        # Solo los bloques ocupados muestran su cita
+        appointment_id = None if available else appointment_id
+
+        if remainder or _minutes(end_time) - start != step or position < len(grid):
+            data = {
+                'id': slot_id,
+                'start': start_time.strftime('%H:%M'),
+                'end': end_time.strftime('%H:%M'),
+                'free': available,
+            }
+            if appointment_id:
+                data.update({'appointment': appointment_id, 'status': status})
+            extra.append(data)
+            continue
+
+        grid.extend('-' * (position - len(grid)))
+        grid.append('1' if available else '0')
+        ids.append(max(slot_id, 0))
+        if appointment_id:
+            appointments.append([position, appointment_id, status])
+
+    data = {
+        'start': slots[0][0].strftime('%H:%M'),
+        'step': step,
+        'slots': ''.join(grid),
+        'ids': _runs(ids),
+    }
+    if appointments:
+        data['appointments'] = appointments
+    if extra:
+        data['extra'] = extra
+    return data
+
+
+def build_compact_calendar(year, month, veterinarian_id=None):
+    """
+    Calendario mensual en formato compacto, con los mismos bloques que
+    build_monthly_calendar. Los bloques se leen como tuplas, sin instanciar
+    modelos ni convertir sus fechas de creación, que es la mayor parte del costo
+    del formato normal.
+    """
+    first_day, last_day = month_bounds(year, month)
+
+    veterinarians = User.objects.filter(role='VETERINARIO')
+    if veterinarian_id:
+        veterinarians = veterinarians.filter(id=veterinarian_id)
+    else:
+        veterinarians = veterinarians.filter(is_active=True)
+
+    # {veterinario: {fecha: [(inicio, fin, libre, id, id de la cita, estado), ...]}}
+    days = defaultdict(lambda: defaultdict(list))
+    rows = TimeSlot.objects.filter(
+        date__gte=first_day,
+        date__lte=last_day,
+        veterinarian__in=veterinarians
+    ).values_list(
+        'veterinarian_id', 'date', 'start_time', 'end_time', 'is_available',
+        'id', 'appointment__id', 'appointment__status'
+    )
+    for vet_id, day, *slot in rows:
+        days[vet_id][day].append(tuple(slot))
+
+    virtual_slots = expand_virtual_slots(
+        first_day,
+        last_day,
+        [veterinarian_id] if veterinarian_id else None,
+        materialized={
+            (vet_id, day, slot[0])
+            for vet_id, vet_days in days.items() for day, slots in vet_days.items() for slot in slots
+        }
+    )
+    for slot in virtual_slots:
+        days[slot.veterinarian_id][slot.date].append((slot.start_time, slot.end_time, True, slot.id, None, None))
+
+    # Mismo orden de veterinarios que User.Meta.ordering (y el formato normal)
+    result = []
+    for veterinarian in veterinarians.order_by('-created_at', 'id').only('id', 'first_name', 'last_name'):
+        vet_days = days.get(veterinarian.id)
+        if not vet_days:
+            continue
+        result.append({
+            'id': veterinarian.id,
+            'name': veterinarian.get_full_name(),
+            'days': [
+                {'day': day.day, **_compact_day(sorted(vet_days[day]))}
+                for day in sorted(vet_days)
+            ]
+        })
+
+    return {
+        'year': year,
+        'month': month,
+        'format': 'compact',
+        'veterinarians': result
+    }
@@ -5,9 +5,8 @@ Ejecutar con: python manage.py add_hours_ana
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta, time
 from apps.users.models import User
-from apps.appointments.models import TimeSlot
+from apps.appointments.services import generate_time_slots
 
 
 class Command(BaseCommand):
@@ -33,44 +32,11 @@ class Command(BaseCommand):
             return
         
         today = timezone.now().date()
-        time_slots_created = 0
         
-        # Crear horarios para los proximos 60 dias
-        for day in range(60):
-            date = today + timedelta(days=day)
-            
-            # Saltar domingos
-            if date.weekday() == 6:
-                continue
-            
-            # Horarios de manana (9:00 - 13:00) - TODOS los horarios
-            for hour in range(9, 13):
-                slot, created = TimeSlot.objects.get_or_create(
-                    veterinarian=ana_maria,
-                    date=date,
-                    start_time=time(hour, 0),
-                    defaults={
-                        'end_time': time(hour + 1, 0),
-                        'is_available': True
-                    }
-                )
-                if created:
-                    time_slots_created += 1
-            
-            # Horarios de tarde (15:00 - 19:00) - Solo dias de semana
-            if date.weekday() < 5:  # Lunes a Viernes
-                for hour in range(15, 19):
-                    slot, created = TimeSlot.objects.get_or_create(
-                        veterinarian=ana_maria,
-                        date=date,
-                        start_time=time(hour, 0),
-                        defaults={
-                            'end_time': time(hour + 1, 0),
-                            'is_available': True
-                        }
-                    )
-                    if created:
-                        time_slots_created += 1
+        # Horarios para los proximos 60 dias: mananas de lunes a sabado (9:00 - 13:00)
+        # y tardes de lunes a viernes (15:00 - 19:00), insertados en bloque
+        result = generate_time_slots([ana_maria], today, 60)
+        time_slots_created = result['created']
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -0,0 +1,222 @@
+"""
+Comando de Django para medir el rendimiento de reservas concurrentes
+Ejecutar con: python manage.py benchmark_booking [--threads 16] [--slots 200] [--contention 4] [--reschedule]
+
+Crea usuarios temporales "bench_booking_*" con bloques en un futuro lejano,
+lanza reservas en paralelo contra POST /api/appointments/ y luego elimina todo.
+Sirve para comparar los perfiles de base de datos (DB_ENGINE=sqlite / postgresql)
+bajo carga de escritura: reservas por segundo, conflictos y errores.
+
+Con --reschedule agenda citas en la mitad de los bloques y lanza reprogramaciones
+en paralelo de citas al azar hacia bloques al azar del mismo conjunto. Al final
+verifica que cada cita tenga un bloque propio, que solo los bloques con cita
+estén ocupados y que la fecha y hora de cada cita coincidan con las de su bloque.
+"""
+
+import random
+import statistics
+import threading
+import time as time_module
+from collections import Counter
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from apps.pets.models import Pet
+from apps.appointments.models import TimeSlot, Appointment
+from apps.appointments.services import generate_time_slots
+
+
+PREFIX = 'bench_booking_'
+
+
+class Command(BaseCommand):
+    help = 'Mide reservas de citas concurrentes sobre la base de datos configurada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Hilos que reservan en paralelo')
+        parser.add_argument('--slots', type=int, default=200, help='Bloques a reservar')
+        parser.add_argument(
+            '--contention', type=int, default=4,
+            help='Cantidad de hilos que intentan reservar cada bloque'
+        )
+        parser.add_argument(
+            '--reschedule', action='store_true',
+            help='Medir reprogramaciones concurrentes entre los bloques en lugar de reservas'
+        )
+
+    def _setup(self, slot_count):
+        receptionist = User.objects.create(username=f'{PREFIX}receptionist', role='RECEPCIONISTA', password='!')
+        client = User.objects.create(username=f'{PREFIX}client', role='CLIENTE', password='!')
+        vet = User.objects.create(
+            username=f'{PREFIX}vet', first_name='Vet', last_name='Benchmark', role='VETERINARIO', password='!'
+        )
+        pet = Pet.objects.create(name='Mascota benchmark', species='PERRO', gender='MACHO', owner=client)
+
+        # Muy en el futuro para no mezclarse con la agenda real
+        start_date = timezone.localdate() + timedelta(days=3650)
+        template = {weekday: [(time(0), time(23))] for weekday in range(7)}
+        days = slot_count // 23 + 1
+        generate_time_slots([vet], start_date, days, template=template)
+        slots = list(
+            TimeSlot.objects.filter(veterinarian=vet).order_by('date', 'start_time')[:slot_count]
+        )
+        return receptionist, client, pet, slots
+
+    def _run(self, receptionist, requests, threads, outcomes):
+        """Envía los POST (url, payload) desde `threads` hilos; retorna (resultados, latencias, segundos)"""
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        results = Counter()
+        timings = []
+        lock = threading.Lock()
+        cursor = iter(requests)
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            api_client = APIClient()
+            api_client.force_authenticate(receptionist)
+            barrier.wait()
+            try:
+                while True:
+                    with lock:
+                        request = next(cursor, None)
+                    if request is None:
+                        break
+                    url, payload = request
+                    started = time_module.perf_counter()
+                    try:
+                        response = api_client.post(url, payload, format='json', HTTP_HOST=host)
+                        outcome = outcomes.get(response.status_code, response.status_code)
+                    except Exception as exc:
+                        outcome = type(exc).__name__
+                    elapsed = (time_module.perf_counter() - started) * 1000
+                    with lock:
+                        results[outcome] += 1
+                        timings.append(elapsed)
+            finally:
+                # Cada hilo abre su propia conexión; cerrarla al terminar
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time_module.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results, timings, time_module.perf_counter() - started
+
+    def _book(self, receptionist, client, pet, slots, options):
+        requests = [
+            ('/api/appointments/', {
+                'pet': pet.id,
+                'client': client.id,
+                'veterinarian': slot.veterinarian_id,
+                'time_slot': slot.id,
+                'appointment_date': slot.date.isoformat(),
+                'appointment_time': slot.start_time.strftime('%H:%M'),
+                'reason': 'Benchmark'
+            })
+            for slot in slots
+            for _ in range(options['contention'])
+        ]
+        self.stdout.write(
+            f'Base de datos: {connections["default"].vendor} - {len(requests)} intentos sobre '
+            f'{len(slots)} bloques con {options["threads"]} hilos...'
+        )
+        results, timings, elapsed = self._run(
+            receptionist, requests, options['threads'], {201: 'reservas', 400: 'conflictos'}
+        )
+        booked = Appointment.objects.filter(client=client).count()
+
+        self.stdout.write(f'Resultados: {dict(results)}')
+        self.stdout.write(
+            f'Latencia: mediana {statistics.median(timings):.1f}ms, '
+            f'máx {max(timings):.1f}ms'
+        )
+        message = (
+            f'{results["reservas"]} reservas en {elapsed:.2f}s - '
+            f'{results["reservas"] / elapsed:,.1f} reservas/s, '
+            f'{len(requests) / elapsed:,.1f} intentos/s'
+        )
+        if booked != len(slots):
+            self.stdout.write(self.style.ERROR(f'{message} - {booked} citas para {len(slots)} bloques'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _reschedule(self, receptionist, client, pet, slots, options):
+        rng = random.Random(42)
+        for slot in slots[:len(slots) // 2]:
+            Appointment.objects.create(
+                pet=pet, client=client, veterinarian_id=slot.veterinarian_id, time_slot=slot,
+                appointment_date=slot.date, appointment_time=slot.start_time, reason='Benchmark'
+            )
+            slot.is_available = False
+            slot.save(update_fields=['is_available', 'updated_at'])
+        appointment_ids = list(Appointment.objects.filter(client=client).values_list('id', flat=True))
+
+        requests = []
+        for _ in range(len(slots) * options['contention']):
+            slot = rng.choice(slots)
+            requests.append((f'/api/appointments/{rng.choice(appointment_ids)}/reschedule/', {
+                'new_date': slot.date.isoformat(),
+                'new_time': slot.start_time.strftime('%H:%M'),
+                'new_time_slot': slot.id,
+                'reason': 'Benchmark'
+            }))
+        self.stdout.write(
+            f'Base de datos: {connections["default"].vendor} - {len(requests)} reprogramaciones de '
+            f'{len(appointment_ids)} citas entre {len(slots)} bloques con {options["threads"]} hilos...'
+        )
+        results, timings, elapsed = self._run(
+            receptionist, requests, options['threads'], {200: 'reprogramaciones', 400: 'conflictos'}
+        )
+
+        self.stdout.write(f'Resultados: {dict(results)}')
+        self.stdout.write(
+            f'Latencia: mediana {statistics.median(timings):.1f}ms, '
+            f'máx {max(timings):.1f}ms'
+        )
+        message = (
+            f'{results["reprogramaciones"]} reprogramaciones en {elapsed:.2f}s - '
+            f'{results["reprogramaciones"] / elapsed:,.1f} reprogramaciones/s'
+        )
+
+        # Invariantes: cada cita en un bloque propio y ocupado, y solo esos bloques ocupados
+        appointments = list(Appointment.objects.filter(client=client).select_related('time_slot'))
+        slot_ids = [appointment.time_slot_id for appointment in appointments]
+        taken = set(TimeSlot.objects.filter(pk__in=[slot.pk for slot in slots], is_available=False).values_list('id', flat=True))
+        problems = []
+        if None in slot_ids or len(set(slot_ids)) != len(appointments):
+            problems.append('citas sin bloque o compartiendo bloque')
+        if taken != set(slot_ids):
+            problems.append(f'{len(taken - set(slot_ids))} bloques ocupados sin cita, '
+                            f'{len(set(slot_ids) - taken)} citas en bloques libres')
+        if any((a.appointment_date, a.appointment_time) != (a.time_slot.date, a.time_slot.start_time)
+               for a in appointments if a.time_slot):
+            problems.append('citas con fecha u hora distinta a la de su bloque')
+
+        if problems:
+            self.stdout.write(self.style.ERROR(f'{message} - ' + '; '.join(problems)))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{message} - invariantes correctas'))
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['slots'] < 1 or options['contention'] < 1:
+            raise CommandError('--threads, --slots y --contention deben ser mayores que 0')
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError('Quedaron datos de una ejecución anterior; elimine los usuarios bench_booking_*')
+
+        receptionist, client, pet, slots = self._setup(options['slots'])
+        try:
+            if options['reschedule']:
+                self._reschedule(receptionist, client, pet, slots, options)
+            else:
+                self._book(receptionist, client, pet, slots, options)
+        finally:
+            # Eliminar usuarios en cascada borra mascotas, bloques y citas del benchmark
+            User.objects.filter(username__startswith=PREFIX).delete()
@@ -0,0 +1,276 @@
+"""
+Comando de Django para medir la latencia de los endpoints más consultados
+Ejecutar con: python manage.py benchmark_endpoints [--seed 1000000] [--repeat 20]
+
+--seed carga datos sintéticos (usuarios "bench_*") antes de medir; usar SOLO
+sobre una base de datos desechable. Para comparar antes/después de los índices:
+    python manage.py migrate appointments 0001 && python manage.py migrate pets 0002 \\
+        && python manage.py migrate products 0001
+    python manage.py benchmark_endpoints
+    python manage.py migrate
+    python manage.py benchmark_endpoints
+
+--deep-page N compara además la página N de los listados con cursor (keyset)
+contra la misma página con ?page=N (OFFSET).
+
+--conditional compara, para los endpoints con ETag, una consulta repetida
+completa (200, con el caché ya cargado) contra la misma consulta con
+If-None-Match (304): bytes enviados, latencia y tiempo de CPU.
+"""
+
+import random
+import statistics
+import time as time_module
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from apps.pets.models import Pet, MedicalRecord
+from apps.appointments.models import TimeSlot, Appointment, WaitingList
+from apps.products.models import Product, ProductReservation, Sale, SaleItem
+from veterinaria_pochita.pagination import KeysetPagination
+
+
+BATCH_SIZE = 5000
+
+
+def _bulk(model, objects):
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed(appointments, stdout):
+    """Carga datos sintéticos proporcionales a la cantidad de citas"""
+    rng = random.Random(42)
+    today = timezone.localdate()
+
+    vets = [
+        User(username=f'bench_vet_{i}', first_name='Vet', last_name=f'Bench {i}',
+             role='VETERINARIO', password='!')
+        for i in range(20)
+    ]
+    clients = [
+        User(username=f'bench_client_{i}', first_name='Cliente', last_name=f'Bench {i}',
+             role='CLIENTE', password='!')
+        for i in range(max(100, appointments // 200))
+    ]
+    _bulk(User, vets + clients + [User(username='bench_receptionist', role='RECEPCIONISTA', password='!')])
+    vets = list(User.objects.filter(username__startswith='bench_vet_'))
+    clients = list(User.objects.filter(username__startswith='bench_client_'))
+    stdout.write(f'  {len(vets)} veterinarios, {len(clients)} clientes')
+
+    _bulk(Pet, [
+        Pet(name=f'Mascota {client.id}', species=rng.choice(['PERRO', 'GATO']),
+            gender=rng.choice(['MACHO', 'HEMBRA']), owner=client)
+        for client in clients
+    ])
+    pets = list(Pet.objects.filter(owner__username__startswith='bench_client_').values_list('id', 'owner_id'))
+
+    # Bloques de ±90 días para cada veterinario
+    slots = []
+    for vet in vets:
+        for offset in range(-90, 90):
+            day = today + timedelta(days=offset)
+            for hour in range(9, 17):
+                slots.append(TimeSlot(veterinarian=vet, date=day, start_time=time(hour),
+                                      end_time=time(hour + 1), is_available=rng.random() < 0.6))
+    for slot in slots:
+        slot.sync_bounds()
+    _bulk(TimeSlot, slots)
+    stdout.write(f'  {len(slots)} bloques de tiempo')
+
+    statuses = [choice for choice, _ in Appointment.STATUS_CHOICES]
+    created = 0
+    while created < appointments:
+        batch = []
+        for _ in range(min(BATCH_SIZE, appointments - created)):
+            pet_id, client_id = rng.choice(pets)
+            batch.append(Appointment(
+                pet_id=pet_id, client_id=client_id, veterinarian=rng.choice(vets),
+                appointment_date=today + timedelta(days=rng.randint(-730, 60)),
+                appointment_time=time(rng.randint(9, 16)),
+                reason='Control', status=rng.choice(statuses)
+            ))
+        for appointment in batch:
+            appointment.sync_bounds()
+        Appointment.objects.bulk_create(batch)
+        created += len(batch)
+    stdout.write(f'  {created} citas')
+
+    _bulk(MedicalRecord, [
+        MedicalRecord(pet_id=rng.choice(pets)[0], veterinarian=rng.choice(vets),
+                      reason='Control', diagnosis='Sano', treatment='Ninguno')
+        for _ in range(appointments // 10)
+    ])
+    _bulk(WaitingList, [
+        WaitingList(client_id=client_id, pet_id=pet_id, reason='Control',
+                    priority=rng.randint(0, 5), contacted=rng.random() < 0.3)
+        for pet_id, client_id in rng.sample(pets, min(len(pets), 5000))
+    ])
+
+    _bulk(Product, [
+        Product(name=f'Producto bench {i}', category='OTRO', price=Decimal('1000'),
+                cost=Decimal('600'), stock=1000, sku=f'BENCH-{i}', barcode=f'780000{i:06d}')
+        for i in range(200)
+    ])
+    products = list(Product.objects.filter(sku__startswith='BENCH-'))
+    _bulk(ProductReservation, [
+        ProductReservation(product=rng.choice(products), client=rng.choice(clients),
+                           status=rng.choice(['PENDIENTE', 'CONTACTADO', 'COMPLETADA']),
+                           priority=rng.randint(0, 5))
+        for _ in range(5000)
+    ])
+    _bulk(Sale, [
+        Sale(client=rng.choice(clients), total_amount=Decimal('1000'), payment_method='EFECTIVO')
+        for _ in range(appointments // 20)
+    ])
+    _bulk(SaleItem, [
+        SaleItem(sale_id=sale_id, product=rng.choice(products), quantity=1,
+                 unit_price=Decimal('1000'), subtotal=Decimal('1000'))
+        for sale_id in Sale.objects.filter(client__username__startswith='bench_client_').values_list('id', flat=True)
+    ])
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de los endpoints principales (opcionalmente cargando datos sintéticos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Cantidad de citas sintéticas a cargar antes de medir')
+        parser.add_argument('--repeat', type=int, default=20, help='Repeticiones por endpoint')
+        parser.add_argument('--only', help='Medir solo endpoints cuya URL contenga este texto')
+        parser.add_argument('--deep-page', type=int, default=0,
+                            help='Comparar cursor vs OFFSET en esta página de los listados')
+        parser.add_argument('--conditional', action='store_true',
+                            help='Comparar consultas repetidas completas contra If-None-Match (304)')
+
+    def _deep_cursor_url(self, url, queryset, ordering, page):
+        """URL con el cursor que entrega la página `page` de un listado keyset, o None si no existe"""
+        offset = (page - 1) * settings.REST_FRAMEWORK['PAGE_SIZE']
+        last = queryset.order_by(*ordering)[offset - 1:offset].first()
+        if last is None:
+            return None
+        paginator = KeysetPagination()
+        paginator.base_url = url
+        paginator.ordering = ordering
+        return paginator.encode_cursor(paginator._position(last), reverse=False)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if User.objects.filter(username='bench_receptionist').exists():
+                raise CommandError('Ya existen datos de benchmark en esta base de datos')
+            self.stdout.write(f'Cargando datos sintéticos ({options["seed"]} citas)...')
+            started = time_module.perf_counter()
+            seed(options['seed'], self.stdout)
+            self.stdout.write(f'Datos cargados en {time_module.perf_counter() - started:.1f}s')
+
+        try:
+            receptionist = User.objects.get(username='bench_receptionist')
+        except User.DoesNotExist:
+            raise CommandError('No hay datos de benchmark. Ejecute primero con --seed N')
+
+        vet = User.objects.filter(username__startswith='bench_vet_').first()
+        client = User.objects.filter(username__startswith='bench_client_').first()
+        pet = Pet.objects.filter(owner=client).first()
+        today = timezone.localdate()
+
+        endpoints = [
+            (receptionist, '/api/appointments/'),
+            (receptionist, f'/api/appointments/?veterinarian={vet.id}&appointment_date={today}'),
+            (client, '/api/appointments/?status=PENDIENTE'),
+            (receptionist, f'/api/appointments/timeslots/?veterinarian={vet.id}&date={today}&is_available=true'),
+            (None, f'/api/appointments/calendar/monthly/?year={today.year}&month={today.month}'),
+            (None, f'/api/appointments/availability/public/?year={today.year}&month={today.month}&veterinarian_id={vet.id}'),
+            (receptionist, '/api/appointments/waiting-list/'),
+            (receptionist, '/api/products/reservations/?status=PENDIENTE'),
+            (receptionist, f'/api/pets/{pet.id}/history/'),
+            (receptionist, '/api/products/'),
+            (None, '/api/auth/veterinarians/'),
+            (receptionist, '/api/products/sales/'),
+            (receptionist, '/api/dashboard/'),
+        ]
+        if options['only']:
+            endpoints = [(user, url) for user, url in endpoints if options['only'] in url]
+
+        page = options['deep_page']
+        if page > 1:
+            for url, queryset, ordering in [
+                ('/api/appointments/', Appointment.objects.all(), ['-appointment_date', '-appointment_time', '-id']),
+                ('/api/pets/medical-records/', MedicalRecord.objects.all(), ['-visit_date', '-id']),
+                ('/api/products/sales/', Sale.objects.all(), ['-created_at', '-id']),
+            ]:
+                cursor_url = self._deep_cursor_url(url, queryset, ordering, page)
+                if cursor_url is None:
+                    self.stdout.write(f'{url} tiene menos de {page} páginas; se omite')
+                    continue
+                endpoints += [
+                    (receptionist, url),
+                    (receptionist, cursor_url),
+                    (receptionist, f'{url}?page=1'),
+                    (receptionist, f'{url}?page={page}'),
+                ]
+
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        api_client = APIClient()
+
+        self.stdout.write(f'\n{"endpoint":<95} {"mediana":>9} {"mín":>9} {"consultas":>9}')
+        for user, url in endpoints:
+            api_client.force_authenticate(user)
+            timings = []
+            queries = 0
+            for _ in range(options['repeat']):
+                # Medir sin caché para comparar el costo real de las consultas
+                cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time_module.perf_counter()
+                    response = api_client.get(url, HTTP_HOST=host)
+                    timings.append((time_module.perf_counter() - started) * 1000)
+                queries = len(captured.captured_queries)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} respondió {response.status_code}')
+
+            self.stdout.write(
+                f'{url:<95} {statistics.median(timings):>7.1f}ms {min(timings):>7.1f}ms {queries:>9}'
+            )
+
+        if options['conditional']:
+            self._benchmark_conditional(api_client, endpoints, host, options['repeat'])
+
+    def _poll(self, api_client, url, host, repeat, **headers):
+        """Repite la consulta y retorna (respuesta, mediana en ms, CPU en ms por consulta)"""
+        timings = []
+        cpu_started = time_module.process_time()
+        for _ in range(repeat):
+            started = time_module.perf_counter()
+            response = api_client.get(url, HTTP_HOST=host, **headers)
+            timings.append((time_module.perf_counter() - started) * 1000)
+        cpu = (time_module.process_time() - cpu_started) * 1000 / repeat
+        return response, statistics.median(timings), cpu
+
+    def _benchmark_conditional(self, api_client, endpoints, host, repeat):
+        self.stdout.write(
+            f'\n{"endpoint (200 completo / 304)":<95} {"bytes":>16} {"mediana":>17} {"CPU":>17}'
+        )
+        for user, url in endpoints:
+            api_client.force_authenticate(user)
+            # Primera consulta fuera de la medición para cargar el caché
+            api_client.get(url, HTTP_HOST=host)
+            full, full_ms, full_cpu = self._poll(api_client, url, host, repeat)
+            etag = full.get('ETag')
+            if not etag:
+                continue
+            conditional, conditional_ms, conditional_cpu = self._poll(
+                api_client, url, host, repeat, HTTP_IF_NONE_MATCH=etag
+            )
+            if conditional.status_code != 304:
+                raise CommandError(f'{url} respondió {conditional.status_code} con If-None-Match')
+            self.stdout.write(
+                f'{url:<95} {len(full.content):>8} / {len(conditional.content):<5} '
+                f'{full_ms:>6.1f} / {conditional_ms:>5.1f}ms {full_cpu:>6.1f} / {conditional_cpu:>5.1f}ms'
+            )
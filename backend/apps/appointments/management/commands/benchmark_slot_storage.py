@@ -0,0 +1,134 @@
+"""
+Comando de Django para comparar bloques materializados (TimeSlot) con horarios recurrentes
+Ejecutar con: python manage.py benchmark_slot_storage [--veterinarians 20] [--days 365]
+
+Crea veterinarios temporales "bench_storage_*": la mitad con bloques generados
+para --days días y la otra mitad con reglas recurrentes equivalentes. Mide filas,
+espacio en disco (SQLite/PostgreSQL) y el costo de armar el calendario mensual
+y la disponibilidad de un día con cada esquema. Luego elimina los datos creados.
+"""
+
+import statistics
+import time as time_module
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.users.models import User
+from apps.appointments.models import TimeSlot, AvailabilityRule, AvailabilityException
+from apps.appointments.services import (
+    build_monthly_calendar, generate_time_slots, create_availability_rules
+)
+from apps.appointments.virtual_slots import expand_virtual_slots
+
+
+PREFIX = 'bench_storage_'
+
+
+def _table_bytes(model):
+    """Bytes que ocupa la tabla con sus índices, o None si no se puede medir"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                    [table]
+                )
+            except Exception:
+                return None
+        else:
+            return None
+        return cursor.fetchone()[0] or 0
+
+
+def _day_slots(veterinarian, day):
+    """Bloques libres de un día, como VeterinarianAvailabilityView"""
+    time_slots = list(TimeSlot.objects.filter(veterinarian=veterinarian, date=day))
+    virtual_slots = expand_virtual_slots(
+        day, day, [veterinarian.id],
+        materialized={(slot.veterinarian_id, slot.date, slot.start_time) for slot in time_slots}
+    )
+    return [slot for slot in time_slots if slot.is_available] + virtual_slots
+
+
+def _measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time_module.perf_counter()
+            function()
+            timings.append((time_module.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(captured.captured_queries)
+
+
+class Command(BaseCommand):
+    help = 'Compara almacenamiento y costo de consulta entre bloques materializados y horarios recurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--veterinarians', type=int, default=20, help='Veterinarios por esquema')
+        parser.add_argument('--days', type=int, default=365, help='Días de bloques materializados')
+        parser.add_argument('--repeat', type=int, default=10, help='Repeticiones por medición')
+
+    def _create_veterinarians(self, label, count):
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}{label}_{i}', first_name='Vet', last_name=f'{label} {i}',
+                 role='VETERINARIO', password='!')
+            for i in range(count)
+        ])
+        return list(User.objects.filter(username__startswith=f'{PREFIX}{label}_'))
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError('Quedaron datos de una ejecución anterior; elimine los usuarios bench_storage_*')
+
+        count, days, repeat = options['veterinarians'], options['days'], options['repeat']
+        start_date = timezone.localdate()
+        next_month = (start_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+        weekday = start_date + timedelta(days=(7 - start_date.weekday()) % 7 or 7)
+
+        try:
+            rows_before = (TimeSlot.objects.count(), AvailabilityRule.objects.count())
+            bytes_before = (_table_bytes(TimeSlot), _table_bytes(AvailabilityRule))
+
+            materialized_vets = self._create_veterinarians('slots', count)
+            generate_time_slots(materialized_vets, start_date, days)
+            rows_after_slots = TimeSlot.objects.count()
+            bytes_after_slots = _table_bytes(TimeSlot)
+
+            rule_vets = self._create_veterinarians('rules', count)
+            create_availability_rules(rule_vets, start_date)
+            rows_after_rules = AvailabilityRule.objects.count()
+            bytes_after_rules = _table_bytes(AvailabilityRule)
+
+            self.stdout.write(f'{count} veterinarios por esquema, {days} días de horario:')
+            self.stdout.write(f'  bloques materializados: {rows_after_slots - rows_before[0]} filas en TimeSlot')
+            self.stdout.write(f'  horarios recurrentes:   {rows_after_rules - rows_before[1]} filas en AvailabilityRule')
+            if bytes_before[0] is not None:
+                self.stdout.write(
+                    f'  espacio: {(bytes_after_slots - bytes_before[0]) / 1024:,.0f} KiB vs '
+                    f'{(bytes_after_rules - bytes_before[1]) / 1024:,.0f} KiB'
+                )
+
+            materialized_vet, rule_vet = materialized_vets[0], rule_vets[0]
+            cases = [
+                ('calendario mensual de un veterinario', lambda vet: build_monthly_calendar(
+                    next_month.year, next_month.month, vet.id)),
+                ('bloques libres de un día', lambda vet: _day_slots(vet, weekday)),
+            ]
+            self.stdout.write(f'\n{"consulta":<40} {"materializado":>22} {"recurrente":>22}')
+            for label, function in cases:
+                slots_ms, slots_queries = _measure(lambda: function(materialized_vet), repeat)
+                rules_ms, rules_queries = _measure(lambda: function(rule_vet), repeat)
+                self.stdout.write(
+                    f'{label:<40} {slots_ms:>8.2f}ms {slots_queries:>3} consultas '
+                    f'{rules_ms:>8.2f}ms {rules_queries:>3} consultas'
+                )
+        finally:
+            AvailabilityException.objects.filter(veterinarian__username__startswith=PREFIX).delete()
+            User.objects.filter(username__startswith=PREFIX).delete()
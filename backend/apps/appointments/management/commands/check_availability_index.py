@@ -0,0 +1,70 @@
+"""
+Comando de Django para verificar el índice de disponibilidad en memoria
+Ejecutar con: python manage.py check_availability_index [--repeat 1000]
+
+Construye el índice, lo compara bloque a bloque con TimeSlot y mide las
+consultas que responde (primer bloque libre, veterinarios libres, días libres).
+"""
+
+import time as time_module
+from datetime import time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.users.models import User
+from apps.appointments.availability import availability_index
+
+
+class Command(BaseCommand):
+    help = 'Compara el índice de disponibilidad con la base de datos y mide sus consultas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1000, help='Repeticiones por consulta medida')
+
+    def _measure(self, label, function, repeat):
+        started = time_module.perf_counter()
+        for _ in range(repeat):
+            result = function()
+        elapsed = (time_module.perf_counter() - started) / repeat * 1_000_000
+        self.stdout.write(f'  {label:<45} {elapsed:>8.1f}µs')
+        return result
+
+    def handle(self, *args, **options):
+        started = time_module.perf_counter()
+        availability_index.rebuild()
+        self.stdout.write(f'Índice construido en {(time_module.perf_counter() - started) * 1000:.1f}ms')
+
+        differences = availability_index.verify()
+        if differences:
+            for veterinarian_id, day, start_time, in_index, in_database in differences[:20]:
+                self.stdout.write(
+                    f'  veterinario {veterinarian_id} {day} {start_time:%H:%M}: '
+                    f'índice={"libre" if in_index else "ocupado"} bd={"libre" if in_database else "ocupado"}'
+                )
+            raise CommandError(f'El índice difiere de la base de datos en {len(differences)} bloque(s)')
+        self.stdout.write(self.style.SUCCESS('El índice coincide con la base de datos'))
+
+        veterinarian = User.objects.filter(role='VETERINARIO', is_active=True).first()
+        if not veterinarian:
+            return
+
+        now = timezone.localtime().replace(tzinfo=None)
+        tomorrow = now.date() + timedelta(days=1)
+        repeat = options['repeat']
+        self.stdout.write('Consultas:')
+        self._measure(
+            'primer bloque libre del veterinario',
+            lambda: availability_index.first_free_after(veterinarian.id, now),
+            repeat
+        )
+        self._measure(
+            'veterinarios libres mañana a las 10:00',
+            lambda: availability_index.veterinarians_free_at(tomorrow, time(10)),
+            repeat
+        )
+        self._measure(
+            'días con bloques libres este mes',
+            lambda: availability_index.free_days(now.year, now.month),
+            repeat
+        )
@@ -0,0 +1,132 @@
+"""
+Comando de Django para generar bloques de tiempo de forma masiva
+Ejecutar con: python manage.py generate_timeslots [--days 60] [--veterinarian ID ...]
+
+Horario semanal personalizado (--template archivo.json), claves 0 = lunes ... 6 = domingo:
+    {"0": [["09:00", "13:00"], ["15:00", "19:00"]], "5": [["09:00", "13:00"]]}
+Para horarios distintos por veterinario se puede agregar:
+    {"veterinarians": {"7": {"0": [["10:00", "14:00"]]}}}
+
+Con --rules el horario se guarda como reglas recurrentes (AvailabilityRule) y los
+bloques se calculan al consultar; solo se guardan al reservarlos o bloquearlos.
+"""
+
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.users.models import User
+from apps.appointments.services import generate_time_slots, create_availability_rules
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value}. Use YYYY-MM-DD')
+
+
+def _parse_template(data):
+    """Convierte {"0": [["09:00", "13:00"]]} en {0: [(time, time)]}"""
+    try:
+        return {
+            int(weekday): [
+                (datetime.strptime(start, '%H:%M').time(), datetime.strptime(end, '%H:%M').time())
+                for start, end in shifts
+            ]
+            for weekday, shifts in data.items()
+        }
+    except (TypeError, ValueError):
+        raise CommandError('Horario semanal inválido. Use {"0": [["09:00", "13:00"]], ...}')
+
+
+class Command(BaseCommand):
+    help = 'Genera bloques de tiempo para los veterinarios según un horario semanal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=_parse_date, help='Fecha de inicio (YYYY-MM-DD), por defecto hoy')
+        parser.add_argument('--days', type=int, default=60, help='Cantidad de días a generar')
+        parser.add_argument('--slot-minutes', type=int, default=60, help='Duración de cada bloque en minutos')
+        parser.add_argument(
+            '--veterinarian', type=int, action='append', dest='veterinarians',
+            help='Id de veterinario (repetible). Por defecto todos los activos'
+        )
+        parser.add_argument('--template', help='Archivo JSON con el horario semanal')
+        parser.add_argument(
+            '--holiday', type=_parse_date, action='append', dest='holidays', default=[],
+            help='Feriado sin atención (YYYY-MM-DD, repetible)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por INSERT')
+        parser.add_argument(
+            '--rules', action='store_true',
+            help='Guardar el horario como reglas recurrentes en vez de generar bloques (ignora --days)'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['slot_minutes'] < 1:
+            raise CommandError('--days y --slot-minutes deben ser mayores que 0')
+
+        veterinarians = User.objects.filter(role='VETERINARIO', is_active=True)
+        if options['veterinarians']:
+            veterinarians = veterinarians.filter(id__in=options['veterinarians'])
+        veterinarians = list(veterinarians)
+        if not veterinarians:
+            raise CommandError('No se encontraron veterinarios activos')
+
+        template = None
+        templates = {}
+        if options['template']:
+            with open(options['template'], encoding='utf-8') as template_file:
+                data = json.load(template_file)
+            per_vet = data.pop('veterinarians', {})
+            templates = {int(vet_id): _parse_template(vet_data) for vet_id, vet_data in per_vet.items()}
+            if data:
+                template = _parse_template(data)
+
+        start_date = options['start'] or timezone.now().date()
+
+        if options['rules']:
+            result = create_availability_rules(
+                veterinarians,
+                start_date,
+                template=template,
+                templates=templates,
+                slot_minutes=options['slot_minutes'],
+                holidays=options['holidays']
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Se crearon {result["rules"]} reglas recurrentes y {result["exceptions"]} '
+                    f'excepciones para {len(veterinarians)} veterinario(s) desde {start_date}'
+                )
+            )
+            return
+
+        self.stdout.write(
+            f'Generando bloques para {len(veterinarians)} veterinario(s) '
+            f'desde {start_date} ({options["days"]} días)...'
+        )
+
+        result = generate_time_slots(
+            veterinarians,
+            start_date,
+            options['days'],
+            template=template,
+            templates=templates,
+            slot_minutes=options['slot_minutes'],
+            holidays=options['holidays'],
+            batch_size=options['batch_size']
+        )
+
+        elapsed = result['elapsed']
+        total = result['created'] + result['existing']
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Se crearon {result["created"]} bloques nuevos '
+                f'({result["existing"]} ya existían) en {elapsed:.2f}s '
+                f'- {rate:,.0f} bloques/s'
+            )
+        )
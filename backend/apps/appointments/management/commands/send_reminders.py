@@ -0,0 +1,48 @@
+"""
+Comando de Django para enviar los recordatorios de confirmación 24h antes de cada cita
+Ejecutar con: python manage.py send_reminders [--batch-size 500] [--loop --interval 300]
+
+Sin --loop envía los recordatorios pendientes una vez (apto para cron); con --loop
+queda como proceso que revisa cada --interval segundos. Puede reiniciarse en
+cualquier momento: las citas ya marcadas con confirmed_24h no se vuelven a enviar.
+--backend permite probar con otro backend de correo, por ejemplo
+django.core.mail.backends.locmem.EmailBackend.
+"""
+
+import time as time_module
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from apps.appointments.reminders import send_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'Envía los recordatorios de las citas que comienzan en las próximas 24 horas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Recordatorios por lote')
+        parser.add_argument('--loop', action='store_true', help='Seguir revisando en lugar de terminar')
+        parser.add_argument('--interval', type=int, default=300, help='Segundos entre revisiones con --loop')
+        parser.add_argument('--backend', help='Backend de correo (por defecto EMAIL_BACKEND)')
+
+    def _run(self, options):
+        result = send_due_reminders(
+            batch_size=options['batch_size'],
+            connection=get_connection(options['backend'])
+        )
+        total = result['sent'] + result['skipped']
+        if not total:
+            self.stdout.write('No hay recordatorios pendientes')
+            return
+        rate = total / result['elapsed'] if result['elapsed'] else total
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["sent"]} recordatorios enviados, {result["skipped"]} citas sin correo '
+            f'en {result["elapsed"]:.2f}s ({rate:,.0f} citas/s)'
+        ))
+
+    def handle(self, *args, **options):
+        self._run(options)
+        while options['loop']:
+            time_module.sleep(options['interval'])
+            self._run(options)
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['veterinarian', 'appointment_date', 'appointment_time'], name='appt_vet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'status'], name='appt_client_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-appointment_date', '-appointment_time'], name='appt_date_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['veterinarian', 'date', 'is_available'], name='timeslot_vet_date_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['date', 'start_time'], name='timeslot_free_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitinglist',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['contacted', 'priority', 'created_at'], name='waitinglist_active_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Día de la semana')),
+                ('start_time', models.TimeField(verbose_name='Inicio del turno')),
+                ('end_time', models.TimeField(verbose_name='Fin del turno')),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=60, verbose_name='Duración del bloque (minutos)')),
+                ('valid_from', models.DateField(blank=True, null=True, verbose_name='Vigente desde')),
+                ('valid_until', models.DateField(blank=True, null=True, verbose_name='Vigente hasta')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activa')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('veterinarian', models.ForeignKey(limit_choices_to={'role': 'VETERINARIO'}, on_delete=django.db.models.deletion.CASCADE, related_name='availability_rules', to=settings.AUTH_USER_MODEL, verbose_name='Veterinario')),
+            ],
+            options={
+                'verbose_name': 'Horario Recurrente',
+                'verbose_name_plural': 'Horarios Recurrentes',
+                'ordering': ['veterinarian', 'weekday', 'start_time'],
+                'indexes': [models.Index(fields=['veterinarian', 'weekday'], name='rule_vet_weekday_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilityException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('start_time', models.TimeField(blank=True, null=True, verbose_name='Desde')),
+                ('end_time', models.TimeField(blank=True, null=True, verbose_name='Hasta')),
+                ('reason', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('veterinarian', models.ForeignKey(limit_choices_to={'role': 'VETERINARIO'}, on_delete=django.db.models.deletion.CASCADE, related_name='availability_exceptions', to=settings.AUTH_USER_MODEL, verbose_name='Veterinario')),
+            ],
+            options={
+                'verbose_name': 'Excepción de Horario',
+                'verbose_name_plural': 'Excepciones de Horario',
+                'ordering': ['date', 'start_time'],
+                'indexes': [models.Index(fields=['veterinarian', 'date'], name='exception_vet_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_availability_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='waitinglist',
+            name='offered_time_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waiting_list_offers', to='appointments.timeslot', verbose_name='Bloque ofrecido'),
+        ),
+    ]
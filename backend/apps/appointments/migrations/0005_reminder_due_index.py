@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_waiting_list_offered_slot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('confirmed_24h', False)), fields=['appointment_date', 'appointment_time'], name='appt_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:20
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+BATCH_SIZE = 2000
+
+
+def _local(day, value):
+    return timezone.make_aware(datetime.combine(day, value))
+
+
+def _batches(queryset):
+    """Filas por lotes de BATCH_SIZE en orden de pk, sin OFFSET"""
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def backfill_bounds(apps, schema_editor):
+    TimeSlot = apps.get_model('appointments', 'TimeSlot')
+    Appointment = apps.get_model('appointments', 'Appointment')
+
+    for batch in _batches(TimeSlot.objects.only('date', 'start_time', 'end_time')):
+        for slot in batch:
+            slot.starts_at = _local(slot.date, slot.start_time)
+            slot.ends_at = _local(slot.date, slot.end_time)
+        TimeSlot.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+
+    # Mismo cálculo que Appointment.sync_bounds()
+    appointments = Appointment.objects.select_related('time_slot').only(
+        'appointment_date', 'appointment_time', 'time_slot__date', 'time_slot__start_time', 'time_slot__end_time'
+    )
+    for batch in _batches(appointments):
+        for appointment in batch:
+            appointment.starts_at = _local(appointment.appointment_date, appointment.appointment_time)
+            slot = appointment.time_slot
+            if slot and (slot.date, slot.start_time) == (appointment.appointment_date, appointment.appointment_time):
+                appointment.ends_at = _local(slot.date, slot.end_time)
+            else:
+                appointment.ends_at = appointment.starts_at + timedelta(minutes=60)
+        Appointment.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_reminder_due_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslot',
+            name='starts_at',
+            field=models.DateTimeField(null=True, verbose_name='Inicio'),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='ends_at',
+            field=models.DateTimeField(null=True, verbose_name='Fin'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(null=True, verbose_name='Inicio'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(null=True, verbose_name='Fin'),
+        ),
+        migrations.RunPython(backfill_bounds, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timeslot',
+            name='starts_at',
+            field=models.DateTimeField(verbose_name='Inicio'),
+        ),
+        migrations.AlterField(
+            model_name='timeslot',
+            name='ends_at',
+            field=models.DateTimeField(verbose_name='Fin'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(verbose_name='Inicio'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(verbose_name='Fin'),
+        ),
+        migrations.AlterModelOptions(
+            name='appointment',
+            options={'ordering': ['-starts_at'], 'verbose_name': 'Cita', 'verbose_name_plural': 'Citas'},
+        ),
+        migrations.RemoveIndex(
+            model_name='timeslot',
+            name='timeslot_free_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_vet_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_date_desc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_reminder_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['veterinarian', 'starts_at'], name='timeslot_vet_starts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['starts_at'], name='timeslot_free_starts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['veterinarian', 'starts_at'], name='appt_vet_starts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-starts_at'], name='appt_starts_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('confirmed_24h', False)), fields=['starts_at'], name='appt_reminder_due_idx'),
+        ),
+    ]
@@ -1,8 +1,27 @@
+from datetime import datetime, timedelta
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from apps.pets.models import Pet
 
 
+# Duración de una cita sin bloque asignado (la misma de los bloques por defecto)
+DEFAULT_APPOINTMENT_MINUTES = 60
+
+
+def local_datetime(day, value):
+    """Fecha y hora locales (TIME_ZONE) como datetime con zona horaria"""
+    return timezone.make_aware(datetime.combine(day, value))
+
+
+def _with_bounds(update_fields, source_fields):
+    """Agrega starts_at/ends_at a update_fields si se guarda alguno de los campos de origen"""
+    if update_fields is None or not set(update_fields) & source_fields:
+        return update_fields
+    return set(update_fields) | {'starts_at', 'ends_at'}
+
+
 class TimeSlot(models.Model):
     """Bloques de tiempo disponibles para citas por veterinario"""
     
@@ -18,6 +37,10 @@ class TimeSlot(models.Model):
     start_time = models.TimeField(verbose_name='Hora de inicio')
     end_time = models.TimeField(verbose_name='Hora de fin')
     
+    # Inicio y fin con zona horaria, derivados de date/start_time/end_time al guardar
+    starts_at = models.DateTimeField(verbose_name='Inicio')
+    ends_at = models.DateTimeField(verbose_name='Fin')
+    
     is_available = models.BooleanField(default=True, verbose_name='Disponible')
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
@@ -28,9 +51,118 @@ class TimeSlot(models.Model):
         verbose_name_plural = 'Bloques de Tiempo'
         ordering = ['date', 'start_time']
         unique_together = ['veterinarian', 'date', 'start_time']
+        indexes = [
+            # Disponibilidad de un veterinario por día (calendario, disponibilidad)
+            models.Index(fields=['veterinarian', 'date', 'is_available'], name='timeslot_vet_date_avail_idx'),
+            # Bloques de un veterinario por rango horario (listado por semana, traslapes)
+            models.Index(fields=['veterinarian', 'starts_at'], name='timeslot_vet_starts_idx'),
+            # Bloques libres por inicio (veterinarios alternativos, búsqueda cercana)
+            models.Index(
+                fields=['starts_at'],
+                condition=models.Q(is_available=True),
+                name='timeslot_free_starts_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.veterinarian.get_full_name()} - {self.date} {self.start_time}-{self.end_time}"
+    
+    def sync_bounds(self):
+        """Calcula starts_at/ends_at; bulk_create no llama a save(), por lo que debe invocarse antes"""
+        self.starts_at = local_datetime(self.date, self.start_time)
+        self.ends_at = local_datetime(self.date, self.end_time)
+    
+    def save(self, *args, **kwargs):
+        self.sync_bounds()
+        kwargs['update_fields'] = _with_bounds(kwargs.get('update_fields'), {'date', 'start_time', 'end_time'})
+        super().save(*args, **kwargs)
+
+
+class AvailabilityRule(models.Model):
+    """
+    Horario recurrente de un veterinario: un turno semanal dividido en bloques.
+    Los bloques se calculan al leer (bloques virtuales) y solo se guardan como
+    TimeSlot cuando se reservan o se bloquean.
+    """
+    
+    WEEKDAY_CHOICES = (
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    )
+    
+    veterinarian = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='availability_rules',
+        limit_choices_to={'role': 'VETERINARIO'},
+        verbose_name='Veterinario'
+    )
+    
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name='Día de la semana')
+    start_time = models.TimeField(verbose_name='Inicio del turno')
+    end_time = models.TimeField(verbose_name='Fin del turno')
+    slot_minutes = models.PositiveSmallIntegerField(default=60, verbose_name='Duración del bloque (minutos)')
+    
+    # Vigencia opcional de la regla
+    valid_from = models.DateField(blank=True, null=True, verbose_name='Vigente desde')
+    valid_until = models.DateField(blank=True, null=True, verbose_name='Vigente hasta')
+    is_active = models.BooleanField(default=True, verbose_name='Activa')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
+    
+    class Meta:
+        verbose_name = 'Horario Recurrente'
+        verbose_name_plural = 'Horarios Recurrentes'
+        ordering = ['veterinarian', 'weekday', 'start_time']
+        indexes = [
+            models.Index(fields=['veterinarian', 'weekday'], name='rule_vet_weekday_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.veterinarian.get_full_name()} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+
+class AvailabilityException(models.Model):
+    """Excepción a los horarios recurrentes: día completo o tramo sin atención"""
+    
+    veterinarian = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='availability_exceptions',
+        limit_choices_to={'role': 'VETERINARIO'},
+        verbose_name='Veterinario'
+    )
+    
+    date = models.DateField(verbose_name='Fecha')
+    # Sin horas la excepción cubre el día completo
+    start_time = models.TimeField(blank=True, null=True, verbose_name='Desde')
+    end_time = models.TimeField(blank=True, null=True, verbose_name='Hasta')
+    reason = models.CharField(max_length=200, blank=True, verbose_name='Motivo')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    
+    class Meta:
+        verbose_name = 'Excepción de Horario'
+        verbose_name_plural = 'Excepciones de Horario'
+        ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(fields=['veterinarian', 'date'], name='exception_vet_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.veterinarian.get_full_name()} - {self.date}"
+    
+    def covers(self, start_time, end_time):
+        """True si el bloque [start_time, end_time) se superpone con la excepción"""
+        if self.start_time is None or self.end_time is None:
+            return True
+        return start_time < self.end_time and end_time > self.start_time
 
 
 class Appointment(models.Model):
@@ -81,6 +213,9 @@ class Appointment(models.Model):
     # Fecha y hora
     appointment_date = models.DateField(verbose_name='Fecha de la cita')
     appointment_time = models.TimeField(verbose_name='Hora de la cita')
+    # Inicio y fin con zona horaria, derivados de la fecha, la hora y el bloque al guardar
+    starts_at = models.DateTimeField(verbose_name='Inicio')
+    ends_at = models.DateTimeField(verbose_name='Fin')
     
     # Motivo y estado
     reason = models.CharField(max_length=200, verbose_name='Motivo de consulta')
@@ -133,14 +268,42 @@ class Appointment(models.Model):
     class Meta:
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
-        ordering = ['-appointment_date', '-appointment_time']
+        ordering = ['-starts_at']
+        indexes = [
+            # Agenda del veterinario y disponibilidad pública por rango horario
+            models.Index(fields=['veterinarian', 'starts_at'], name='appt_vet_starts_idx'),
+            # Citas de un cliente por estado
+            models.Index(fields=['client', 'status'], name='appt_client_status_idx'),
+            # Orden por defecto del listado de recepción y próximas citas del dashboard
+            models.Index(fields=['-starts_at'], name='appt_starts_desc_idx'),
+            # Recordatorios 24h pendientes (send_reminders): solo citas sin confirmar
+            models.Index(
+                fields=['starts_at'],
+                condition=models.Q(confirmed_24h=False),
+                name='appt_reminder_due_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.pet.name} - {self.appointment_date} {self.appointment_time} - {self.get_status_display()}"
     
+    def sync_bounds(self):
+        """Calcula starts_at/ends_at; el fin es el del bloque o, sin bloque, la duración por defecto"""
+        self.starts_at = local_datetime(self.appointment_date, self.appointment_time)
+        slot = self.time_slot
+        if slot and (slot.date, slot.start_time) == (self.appointment_date, self.appointment_time):
+            self.ends_at = local_datetime(self.appointment_date, slot.end_time)
+        else:
+            self.ends_at = self.starts_at + timedelta(minutes=DEFAULT_APPOINTMENT_MINUTES)
+    
     def save(self, *args, **kwargs):
+        self.sync_bounds()
+        kwargs['update_fields'] = _with_bounds(
+            kwargs.get('update_fields'), {'appointment_date', 'appointment_time', 'time_slot', 'time_slot_id'}
+        )
         # Si se asigna un time_slot, marcar como no disponible
-        if self.time_slot:
+        # (una cita cancelada conserva la referencia, pero el bloque queda libre)
+        if self.time_slot and self.status != 'CANCELADA':
             self.time_slot.is_available = False
             self.time_slot.save()
         super().save(*args, **kwargs)
@@ -181,6 +344,14 @@ class WaitingList(models.Model):
     is_active = models.BooleanField(default=True, verbose_name='Activo')
     contacted = models.BooleanField(default=False, verbose_name='Contactado')
     contact_date = models.DateTimeField(blank=True, null=True, verbose_name='Fecha de contacto')
+    offered_time_slot = models.ForeignKey(
+        TimeSlot,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='waiting_list_offers',
+        verbose_name='Bloque ofrecido'
+    )
     
     # Prioridad (orden en la lista)
     priority = models.IntegerField(default=0, verbose_name='Prioridad')
@@ -192,6 +363,14 @@ class WaitingList(models.Model):
         verbose_name = 'Lista de Espera'
         verbose_name_plural = 'Listas de Espera'
         ordering = ['priority', 'created_at']
+        indexes = [
+            # Entradas activas en orden de atención (listado y liberación de horarios)
+            models.Index(
+                fields=['contacted', 'priority', 'created_at'],
+                condition=models.Q(is_active=True),
+                name='waitinglist_active_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.client.get_full_name()} - {self.pet.name} - Prioridad: {self.priority}"
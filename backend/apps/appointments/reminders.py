@@ -0,0 +1,98 @@
+"""
+Recordatorios de confirmación 24 horas antes de la cita.
+
+Las citas vigentes que comienzan dentro de las próximas REMINDER_WINDOW_HOURS
+horas y aún no tienen confirmed_24h se leen con un rango sobre starts_at en el
+índice parcial appt_reminder_due_idx, se envían por lotes sobre una única
+conexión de correo y se marcan con un solo UPDATE por lote. Como el UPDATE
+solo toca citas con confirmed_24h=False, volver a ejecutar el envío (o
+reiniciarlo a mitad de camino) no repite recordatorios ya marcados.
+"""
+
+import time as time_module
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import Appointment
+
+
+ACTIVE_STATUSES = ('PENDIENTE', 'CONFIRMADA', 'REPROGRAMADA')
+
+
+def due_reminders(now=None):
+    """Citas vigentes sin recordatorio que comienzan entre `now` y `now` + la ventana"""
+    now = now or timezone.now()
+    return Appointment.objects.filter(
+        starts_at__gte=now,
+        starts_at__lt=now + timedelta(hours=settings.REMINDER_WINDOW_HOURS),
+        confirmed_24h=False,
+        status__in=ACTIVE_STATUSES
+    ).order_by('starts_at', 'id')
+
+
+def build_reminder(appointment):
+    """Correo de recordatorio de una cita"""
+    veterinarian = appointment.veterinarian.get_full_name() if appointment.veterinarian else 'nuestro equipo'
+    body = (
+        f'Hola {appointment.client.get_full_name()},\n\n'
+        f'Le recordamos la cita de {appointment.pet.name} el '
+        f'{appointment.appointment_date:%d/%m/%Y} a las {appointment.appointment_time:%H:%M} '
+        f'con {veterinarian}.\n'
+        f'Motivo: {appointment.reason}\n\n'
+        f'Si no puede asistir, por favor avísenos para liberar el horario.\n\n'
+        f'Veterinaria Pochita'
+    )
+    return EmailMessage(
+        subject=f'Recordatorio: cita de {appointment.pet.name} el {appointment.appointment_date:%d/%m/%Y}',
+        body=body,
+        to=[appointment.client.email]
+    )
+
+
+def send_due_reminders(now=None, batch_size=500, connection=None):
+    """
+    Envía los recordatorios pendientes por lotes de `batch_size` y los marca como enviados.
+    Las citas de clientes sin correo se marcan igual para no reintentarlas en cada ejecución.
+    Retorna un diccionario con los recordatorios enviados, omitidos y el tiempo empleado.
+    """
+    started = time_module.perf_counter()
+    now = timezone.localtime(now)
+    connection = connection or get_connection()
+    sent = skipped = 0
+
+    queryset = due_reminders(now).select_related('client', 'pet', 'veterinarian').only(
+        'id', 'appointment_date', 'appointment_time', 'reason',
+        'client__first_name', 'client__last_name', 'client__email',
+        'pet__name', 'veterinarian__first_name', 'veterinarian__last_name'
+    )
+
+    connection.open()
+    try:
+        while True:
+            # Cada lote se marca al enviarse, por lo que el siguiente vuelve a leer desde el inicio sin OFFSET
+            batch = list(queryset[:batch_size])
+            if not batch:
+                break
+
+            messages = [build_reminder(appointment) for appointment in batch if appointment.client.email]
+            if messages:
+                connection.send_messages(messages)
+            sent += len(messages)
+            skipped += len(batch) - len(messages)
+
+            # update() no emite señales; confirmed_24h no aparece en el calendario ni en el índice
+            Appointment.objects.filter(
+                pk__in=[appointment.pk for appointment in batch],
+                confirmed_24h=False
+            ).update(confirmed_24h=True, confirmation_date=now, updated_at=now)
+    finally:
+        connection.close()
+
+    return {
+        'sent': sent,
+        'skipped': skipped,
+        'elapsed': time_module.perf_counter() - started,
+    }
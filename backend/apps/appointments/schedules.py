@@ -0,0 +1,39 @@
+"""
+Horarios semanales: expansión de turnos {día_semana: [(inicio, fin), ...]} en bloques.
+Lo usan la generación masiva de TimeSlot y los bloques virtuales de AvailabilityRule.
+"""
+
+from datetime import datetime, time, timedelta
+
+
+# Horario semanal por defecto (0 = lunes): mañanas de lunes a sábado, tardes de lunes a viernes
+DEFAULT_WEEKLY_TEMPLATE = {
+    0: [(time(9, 0), time(13, 0)), (time(15, 0), time(19, 0))],
+    1: [(time(9, 0), time(13, 0)), (time(15, 0), time(19, 0))],
+    2: [(time(9, 0), time(13, 0)), (time(15, 0), time(19, 0))],
+    3: [(time(9, 0), time(13, 0)), (time(15, 0), time(19, 0))],
+    4: [(time(9, 0), time(13, 0)), (time(15, 0), time(19, 0))],
+    5: [(time(9, 0), time(13, 0))],
+}
+
+
+def expand_weekly_template(template, start_date, days, slot_minutes=60, holidays=()):
+    """
+    Expande un horario semanal {día_semana: [(inicio, fin), ...]} en bloques
+    (fecha, hora_inicio, hora_fin) para `days` días desde `start_date`.
+    Los feriados se omiten y los bloques que no caben completos en el turno se descartan.
+    """
+    slot_length = timedelta(minutes=slot_minutes)
+    holidays = set(holidays)
+
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        if day in holidays:
+            continue
+
+        for shift_start, shift_end in template.get(day.weekday(), ()):
+            current = datetime.combine(day, shift_start)
+            shift_close = datetime.combine(day, shift_end)
+            while current + slot_length <= shift_close:
+                yield day, current.time(), (current + slot_length).time()
+                current += slot_length
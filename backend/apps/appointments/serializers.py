@@ -1,6 +1,28 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import TimeSlot, Appointment, WaitingList
+from .models import TimeSlot, Appointment, WaitingList, AvailabilityRule, AvailabilityException
 from apps.pets.serializers import PetSerializer
+from .services import claim_time_slot, slot_conflict_error
+from .virtual_slots import find_time_slot, materialize_time_slot, parse_virtual_slot_id
+
+
+class TimeSlotField(serializers.PrimaryKeyRelatedField):
+    """
+    Id de bloque de tiempo. Acepta también ids de bloques virtuales (negativos),
+    que quedan como VirtualSlot al validar y se guardan recién al reservarlos.
+    """
+    
+    def to_internal_value(self, data):
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if parse_virtual_slot_id(pk) is None:
+            return super().to_internal_value(data)
+        try:
+            return find_time_slot(pk)
+        except TimeSlot.DoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
 
 
 class TimeSlotSerializer(serializers.ModelSerializer):
@@ -41,6 +63,76 @@ class TimeSlotCreateSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class AvailabilityRuleSerializer(serializers.ModelSerializer):
+    """Serializer para horarios recurrentes"""
+    veterinarian_name = serializers.CharField(source='veterinarian.get_full_name', read_only=True)
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+    
+    class Meta:
+        model = AvailabilityRule
+        fields = (
+            'id', 'veterinarian', 'veterinarian_name', 'weekday', 'weekday_display',
+            'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until',
+            'is_active', 'created_at', 'updated_at'
+        )
+        read_only_fields = ('id', 'created_at', 'updated_at')
+    
+    def validate(self, attrs):
+        veterinarian = attrs.get('veterinarian', getattr(self.instance, 'veterinarian', None))
+        if veterinarian and veterinarian.role != 'VETERINARIO':
+            raise serializers.ValidationError({
+                "veterinarian": "El usuario debe tener rol de VETERINARIO."
+            })
+        
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time and end_time <= start_time:
+            raise serializers.ValidationError({
+                "end_time": "La hora de fin debe ser posterior a la hora de inicio."
+            })
+        
+        if attrs.get('slot_minutes', getattr(self.instance, 'slot_minutes', 60)) < 5:
+            raise serializers.ValidationError({
+                "slot_minutes": "Los bloques deben durar al menos 5 minutos."
+            })
+        
+        valid_from = attrs.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_until = attrs.get('valid_until', getattr(self.instance, 'valid_until', None))
+        if valid_from and valid_until and valid_until < valid_from:
+            raise serializers.ValidationError({
+                "valid_until": "La vigencia debe terminar después de comenzar."
+            })
+        
+        return attrs
+
+
+class AvailabilityExceptionSerializer(serializers.ModelSerializer):
+    """Serializer para excepciones de horario (feriados, vacaciones, tramos bloqueados)"""
+    veterinarian_name = serializers.CharField(source='veterinarian.get_full_name', read_only=True)
+    
+    class Meta:
+        model = AvailabilityException
+        fields = (
+            'id', 'veterinarian', 'veterinarian_name', 'date',
+            'start_time', 'end_time', 'reason', 'created_at'
+        )
+        read_only_fields = ('id', 'created_at')
+    
+    def validate(self, attrs):
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if (start_time is None) != (end_time is None):
+            raise serializers.ValidationError({
+                "end_time": "Indique ambas horas o ninguna (día completo)."
+            })
+        if start_time and end_time <= start_time:
+            raise serializers.ValidationError({
+                "end_time": "La hora de fin debe ser posterior a la hora de inicio."
+            })
+        
+        return attrs
+
+
 class AppointmentSerializer(serializers.ModelSerializer):
     """Serializer para citas"""
     pet_name = serializers.CharField(source='pet.name', read_only=True)
@@ -54,15 +146,17 @@ class AppointmentSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'pet', 'pet_name', 'pet_details', 'client', 'client_name',
             'veterinarian', 'veterinarian_name', 'time_slot',
-            'appointment_date', 'appointment_time', 'reason', 'status', 'status_display',
+            'appointment_date', 'appointment_time', 'starts_at', 'ends_at', 'reason', 'status', 'status_display',
             'confirmed_24h', 'confirmation_date', 'notes', 'receptionist_notes',
             'rescheduled_from', 'created_by', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'starts_at', 'ends_at', 'created_at', 'updated_at')
 
 
 class AppointmentCreateSerializer(serializers.ModelSerializer):
     """Serializer para crear citas"""
+    # Sin validador de unicidad: el bloque se resuelve al reservarlo en create(), con respuesta de alternativas
+    time_slot = TimeSlotField(queryset=TimeSlot.objects.all(), required=False, allow_null=True)
     
     class Meta:
         model = Appointment
@@ -94,25 +188,12 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
                 "pet": "La mascota no pertenece al cliente seleccionado."
             })
         
-        # Validar que el time_slot esté disponible (si se proporciona)
+        # Validar que el time_slot esté disponible (si se proporciona).
+        # Es solo una verificación temprana: la reserva real se hace de forma atómica en create()
         time_slot = attrs.get('time_slot')
         if time_slot:
-            # Refrescar desde la BD para obtener el estado más reciente
-            time_slot.refresh_from_db()
             if not time_slot.is_available:
-                # Buscar veterinarios alternativos disponibles en ese mismo horario
-                alternative_vets = self._find_alternative_veterinarians(
-                    time_slot.date,
-                    time_slot.start_time,
-                    time_slot.veterinarian
-                )
-                error_data = {
-                    "time_slot": ["Este bloque de tiempo ya no está disponible."]
-                }
-                # Si hay alternativas, agregarlas al error
-                if alternative_vets:
-                    error_data["alternative_veterinarians"] = alternative_vets
-                raise serializers.ValidationError(error_data)
+                raise serializers.ValidationError(slot_conflict_error(time_slot))
             
             # Validar y asegurar que la fecha de la cita coincida con la fecha del time_slot
             appointment_date = attrs.get('appointment_date')
@@ -126,37 +207,16 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         
         return attrs
     
-    def _find_alternative_veterinarians(self, date, time, excluded_vet):
-        """Buscar veterinarios alternativos disponibles en el mismo horario"""
-        from apps.users.models import User
-        
-        # Buscar todos los veterinarios activos excepto el excluido
-        alternative_vets = User.objects.filter(
-            role='VETERINARIO',
-            is_active=True
-        ).exclude(id=excluded_vet.id if excluded_vet else None)
+    def create(self, validated_data):
+        time_slot = validated_data.get('time_slot')
         
-        alternatives = []
-        for vet in alternative_vets:
-            # Buscar slots disponibles para este veterinario en la misma fecha y hora
-            from .models import TimeSlot
-            available_slots = TimeSlot.objects.filter(
-                veterinarian=vet,
-                date=date,
-                start_time=time,
-                is_available=True
-            )
-            
-            if available_slots.exists():
-                slot = available_slots.first()
-                alternatives.append({
-                    'id': vet.id,
-                    'name': vet.get_full_name(),
-                    'email': vet.email,
-                    'time_slot_id': slot.id
-                })
-        
-        return alternatives
+        # Materializar y reservar el bloque y crear la cita en una sola transacción
+        with transaction.atomic():
+            if time_slot:
+                time_slot = validated_data['time_slot'] = materialize_time_slot(time_slot)
+            if time_slot and not claim_time_slot(time_slot):
+                raise serializers.ValidationError(slot_conflict_error(time_slot))
+            return super().create(validated_data)
 
 
 class AppointmentUpdateSerializer(serializers.ModelSerializer):
@@ -191,9 +251,9 @@ class WaitingListSerializer(serializers.ModelSerializer):
             'id', 'client', 'client_name', 'pet', 'pet_name',
             'preferred_veterinarian', 'veterinarian_name', 'reason',
             'notes', 'is_active', 'contacted', 'contact_date',
-            'priority', 'created_at', 'updated_at'
+            'offered_time_slot', 'priority', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'offered_time_slot', 'created_at', 'updated_at')
 
 
 class WaitingListCreateSerializer(serializers.ModelSerializer):
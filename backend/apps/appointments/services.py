@@ -0,0 +1,590 @@
+"""
+Servicios de agenda: armado del calendario mensual a partir de los bloques
+de tiempo (guardados y virtuales) y sus citas asociadas, generación masiva de
+bloques, búsqueda de horarios alternativos, reserva atómica de bloques,
+reprogramación de citas y oferta de bloques liberados a la lista de espera.
+"""
+
+import time as time_module
+from datetime import date, datetime, timedelta
+from functools import partial
+from calendar import monthrange
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import TimeSlot, Appointment, WaitingList, AvailabilityRule, AvailabilityException, local_datetime
+from . import calendar_cache, slot_events
+from .availability import availability_index, apply_on_commit
+from .waiting_list import waiting_queue, remove_on_commit as remove_from_queue_on_commit
+from .schedules import DEFAULT_WEEKLY_TEMPLATE, expand_weekly_template
+from .virtual_slots import expand_virtual_slots, materialize_time_slot
+
+
+# Campos reutilizados para formatear igual que TimeSlotSerializer sin instanciarlo por bloque
+_time_field = serializers.TimeField()
+_datetime_field = serializers.DateTimeField()
+
+
+def month_bounds(year, month):
+    """Retorna el primer y último día del mes"""
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def serialize_time_slot(slot, veterinarian_name):
+    """Representación equivalente a TimeSlotSerializer para un bloque"""
+    return {
+        'id': slot.id,
+        'veterinarian': slot.veterinarian_id,
+        'veterinarian_name': veterinarian_name,
+        'date': slot.date.isoformat(),
+        'start_time': _time_field.to_representation(slot.start_time),
+        'end_time': _time_field.to_representation(slot.end_time),
+        'is_available': slot.is_available,
+        'created_at': _datetime_field.to_representation(slot.created_at),
+        'updated_at': _datetime_field.to_representation(slot.updated_at),
+    }
+
+
+def _serialize_occupied_slot(slot):
+    """Bloque ocupado con la información de su cita (si la tiene)"""
+    data = {
+        'time_slot_id': slot.id,
+        'start_time': slot.start_time.strftime('%H:%M'),
+        'end_time': slot.end_time.strftime('%H:%M'),
+    }
+    appointment = getattr(slot, 'appointment', None)
+    if appointment is None:
+        # El slot está marcado como no disponible pero no tiene cita
+        data['reason'] = 'No disponible'
+        return data
+
+    data.update({
+        'appointment_id': appointment.id,
+        'pet_name': appointment.pet.name,
+        'client_name': appointment.client.get_full_name(),
+        'status': appointment.status
+    })
+    return data
+
+
+def _calendar_order(slot):
+    """Orden del calendario: veterinarios como User.Meta.ordering, luego fecha y hora"""
+    return (-slot.veterinarian.created_at.timestamp(), slot.veterinarian_id, slot.date, slot.start_time)
+
+
+def build_monthly_calendar(year, month, veterinarian_id=None):
+    """
+    Arma el calendario mensual (HU002).
+    Trae todos los bloques guardados del mes junto a su veterinario, cita, mascota
+    y cliente en una sola consulta, les suma los bloques virtuales de los horarios
+    recurrentes y los agrupa en memoria por veterinario y fecha.
+    """
+    first_day, last_day = month_bounds(year, month)
+
+    time_slots = TimeSlot.objects.filter(
+        date__gte=first_day,
+        date__lte=last_day,
+        veterinarian__role='VETERINARIO'
+    )
+    if veterinarian_id:
+        time_slots = time_slots.filter(veterinarian_id=veterinarian_id)
+    else:
+        time_slots = time_slots.filter(veterinarian__is_active=True)
+
+    # Mismo orden de veterinarios que User.Meta.ordering, luego por fecha y hora
+    time_slots = time_slots.select_related(
+        'veterinarian',
+        'appointment__pet',
+        'appointment__client'
+    ).order_by('-veterinarian__created_at', 'veterinarian_id', 'date', 'start_time')
+    time_slots = list(time_slots)
+
+    virtual_slots = expand_virtual_slots(
+        first_day,
+        last_day,
+        [veterinarian_id] if veterinarian_id else None,
+        materialized={(slot.veterinarian_id, slot.date, slot.start_time) for slot in time_slots}
+    )
+    if virtual_slots:
+        time_slots = sorted(time_slots + virtual_slots, key=_calendar_order)
+
+    calendar_data = []
+    current_key = None
+    current_day = None
+    vet_names = {}
+
+    for slot in time_slots:
+        vet_id = slot.veterinarian_id
+        if vet_id not in vet_names:
+            vet_names[vet_id] = slot.veterinarian.get_full_name()
+
+        key = (vet_id, slot.date)
+        if key != current_key:
+            current_key = key
+            current_day = {
+                'veterinarian_id': vet_id,
+                'veterinarian_name': vet_names[vet_id],
+                'date': slot.date.isoformat(),
+                'available_slots': [],
+                'occupied_slots': []
+            }
+            calendar_data.append(current_day)
+
+        if slot.is_available:
+            current_day['available_slots'].append(serialize_time_slot(slot, vet_names[vet_id]))
+        else:
+            current_day['occupied_slots'].append(_serialize_occupied_slot(slot))
+
+    return calendar_data
+
+
+def _offer_generated_slots(veterinarians, start_date, end_date, slot_ids):
+    """Ofrece a la lista de espera los bloques recién generados que siguen libres"""
+    if not len(waiting_queue):
+        return
+    time_slots = TimeSlot.objects.filter(
+        veterinarian__in=veterinarians,
+        date__gte=max(start_date, timezone.localdate()),
+        date__lte=end_date,
+        is_available=True
+    )
+    # Filtrar en Python: un pk__in con miles de ids excede el límite de parámetros de SQLite
+    offer_time_slots(slot for slot in time_slots if slot.pk in slot_ids)
+
+
+def generate_time_slots(veterinarians, start_date, days, template=None, templates=None,
+                        slot_minutes=60, holidays=(), batch_size=1000):
+    """
+    Genera bloques de tiempo para varios veterinarios en bloque.
+    `templates` permite un horario distinto por id de veterinario; si no, se usa `template`.
+    Los bloques existentes se detectan con una sola consulta por
+    (veterinario, fecha, hora de inicio) y los nuevos se insertan con bulk_create.
+    Retorna un diccionario con los bloques creados (los nuevos que quedaron
+    guardados, incluidos los que otra petición creó en paralelo), los ya
+    existentes y el tiempo empleado.
+    """
+    started = time_module.perf_counter()
+    template = template or DEFAULT_WEEKLY_TEMPLATE
+    templates = templates or {}
+    veterinarians = list(veterinarians)
+    end_date = start_date + timedelta(days=days - 1)
+
+    existing_keys = set(
+        TimeSlot.objects.filter(
+            veterinarian__in=veterinarians,
+            date__gte=start_date,
+            date__lte=end_date
+        ).values_list('veterinarian_id', 'date', 'start_time')
+    )
+
+    new_slots = []
+    existing = 0
+    for vet in veterinarians:
+        vet_template = templates.get(vet.id, template)
+        for day, start_time, end_time in expand_weekly_template(
+            vet_template, start_date, days, slot_minutes, holidays
+        ):
+            if (vet.id, day, start_time) in existing_keys:
+                existing += 1
+                continue
+            slot = TimeSlot(
+                veterinarian=vet,
+                date=day,
+                start_time=start_time,
+                end_time=end_time,
+                is_available=True
+            )
+            slot.sync_bounds()
+            new_slots.append(slot)
+
+    # ignore_conflicts cubre bloques creados en paralelo entre la consulta y la inserción
+    TimeSlot.objects.bulk_create(new_slots, batch_size=batch_size, ignore_conflicts=True)
+
+    # Releer los bloques guardados: ignore_conflicts omite en silencio los que ya existían
+    # y los objetos en memoria no tienen id, así el índice recibe el estado real de cada fila
+    new_keys = {(slot.veterinarian_id, slot.date, slot.start_time) for slot in new_slots}
+    saved = []
+    if new_keys:
+        saved = [
+            row for row in TimeSlot.objects.filter(
+                veterinarian__in=veterinarians,
+                date__gte=start_date,
+                date__lte=end_date
+            ).values_list('id', 'veterinarian_id', 'date', 'start_time', 'is_available')
+            if row[1:4] in new_keys
+        ]
+
+    # bulk_create no emite post_save: invalidar el caché del calendario y actualizar el índice manualmente
+    affected_months = {(veterinarian_id, day.replace(day=1)) for _, veterinarian_id, day, _, _ in saved}
+    for veterinarian_id, month_start in affected_months:
+        calendar_cache.invalidate_month(veterinarian_id, month_start)
+        transaction.on_commit(partial(slot_events.publish_reset, veterinarian_id, month_start))
+    apply_on_commit(row[1:] for row in saved)
+    if saved:
+        slot_ids = {row[0] for row in saved}
+        transaction.on_commit(lambda: _offer_generated_slots(veterinarians, start_date, end_date, slot_ids))
+
+    return {
+        'created': len(saved),
+        'existing': existing,
+        'elapsed': time_module.perf_counter() - started,
+    }
+
+
+def create_availability_rules(veterinarians, start_date, template=None, templates=None,
+                              slot_minutes=60, holidays=()):
+    """
+    Alternativa a generate_time_slots: guarda el horario semanal como reglas
+    recurrentes (AvailabilityRule) vigentes desde `start_date`, sin materializar
+    bloques. Los feriados se guardan como excepciones de día completo.
+    Los turnos que ya existen con la misma duración se omiten.
+    Retorna un diccionario con las reglas y excepciones creadas.
+    """
+    template = template or DEFAULT_WEEKLY_TEMPLATE
+    templates = templates or {}
+    veterinarians = list(veterinarians)
+
+    existing_rules = set(
+        AvailabilityRule.objects.filter(
+            veterinarian__in=veterinarians,
+            is_active=True
+        ).values_list('veterinarian_id', 'weekday', 'start_time', 'end_time', 'slot_minutes')
+    )
+    existing_exceptions = set(
+        AvailabilityException.objects.filter(
+            veterinarian__in=veterinarians,
+            date__in=holidays,
+            start_time__isnull=True
+        ).values_list('veterinarian_id', 'date')
+    )
+
+    rules = []
+    exceptions = []
+    for vet in veterinarians:
+        for weekday, shifts in templates.get(vet.id, template).items():
+            for start_time, end_time in shifts:
+                if (vet.id, weekday, start_time, end_time, slot_minutes) in existing_rules:
+                    continue
+                rules.append(AvailabilityRule(
+                    veterinarian=vet,
+                    weekday=weekday,
+                    start_time=start_time,
+                    end_time=end_time,
+                    slot_minutes=slot_minutes,
+                    valid_from=start_date
+                ))
+        for holiday in holidays:
+            if (vet.id, holiday) not in existing_exceptions:
+                exceptions.append(AvailabilityException(veterinarian=vet, date=holiday, reason='Feriado'))
+
+    AvailabilityRule.objects.bulk_create(rules)
+    AvailabilityException.objects.bulk_create(exceptions)
+
+    # bulk_create no emite post_save: invalidar el calendario y el índice manualmente
+    transaction.on_commit(calendar_cache.invalidate_all)
+    transaction.on_commit(availability_index.invalidate)
+
+    return {'rules': len(rules), 'exceptions': len(exceptions)}
+
+
+def _available_slots():
+    """Bloques libres de veterinarios activos, con el veterinario precargado"""
+    return TimeSlot.objects.filter(
+        is_available=True,
+        veterinarian__role='VETERINARIO',
+        veterinarian__is_active=True
+    ).select_related('veterinarian')
+
+
+def find_alternative_veterinarians(date, time, excluded_vet=None):
+    """
+    Buscar veterinarios alternativos disponibles en el mismo horario.
+    Consulta los bloques de todos los veterinarios a la vez (nada si el índice no
+    encuentra bloques libres) y devuelve el primer bloque libre de cada uno.
+    """
+    time_slots = _available_slots().filter(starts_at=local_datetime(date, time))
+    if excluded_vet:
+        time_slots = time_slots.exclude(veterinarian=excluded_vet)
+
+    veterinarian_ids = None
+    if availability_index.covers(date):
+        # El índice descarta a los veterinarios sin bloque libre sin consultar la base de datos;
+        # la consulta final confirma la disponibilidad y trae los datos del bloque
+        veterinarian_ids = availability_index.veterinarians_free_at(date, time)
+        if not veterinarian_ids:
+            return []
+        time_slots = time_slots.filter(veterinarian_id__in=veterinarian_ids)
+    time_slots = time_slots.order_by('-veterinarian__created_at', 'veterinarian_id', 'id')
+
+    excluded_id = getattr(excluded_vet, 'pk', excluded_vet)
+    virtual_slots = [
+        slot for slot in expand_virtual_slots(date, date, veterinarian_ids)
+        if slot.start_time == time and slot.veterinarian_id != excluded_id
+    ]
+    time_slots = list(time_slots)
+    if virtual_slots:
+        time_slots = sorted(time_slots + virtual_slots, key=_calendar_order)
+
+    alternatives = []
+    seen = set()
+    for slot in time_slots:
+        if slot.veterinarian_id in seen:
+            continue
+        seen.add(slot.veterinarian_id)
+        alternatives.append({
+            'id': slot.veterinarian_id,
+            'name': slot.veterinarian.get_full_name(),
+            'email': slot.veterinarian.email,
+            'time_slot_id': slot.id
+        })
+
+    return alternatives
+
+
+def find_nearest_available_slots(date, time, veterinarian=None, days=3, hours=None, limit=5, exclude_slot=None):
+    """
+    Buscar los bloques libres (guardados o virtuales) más cercanos a (date, time).
+    Busca dentro de ±`days` días (o ±`hours` horas en el mismo día si se indica),
+    sin ofrecer días pasados, y ordena por cercanía al horario solicitado.
+    Si se indica `veterinarian` solo se buscan bloques de ese veterinario.
+    """
+    target = datetime.combine(date, time)
+    today = timezone.localdate()
+
+    if hours is not None:
+        window = timedelta(hours=hours)
+        first_day = last_day = date
+        earliest = max(target - window, datetime.combine(date, datetime.min.time()))
+        latest = min(target + window, datetime.combine(date, datetime.max.time()))
+    else:
+        first_day, last_day = date - timedelta(days=days), date + timedelta(days=days)
+        earliest = datetime.combine(first_day, datetime.min.time())
+        latest = datetime.combine(last_day, datetime.max.time())
+    first_day = max(first_day, today)
+    earliest = max(earliest, datetime.combine(today, datetime.min.time()))
+
+    # Un solo rango sobre starts_at (índice parcial de bloques libres)
+    time_slots = _available_slots().filter(
+        starts_at__gte=timezone.make_aware(earliest),
+        starts_at__lte=timezone.make_aware(latest)
+    )
+    if veterinarian:
+        time_slots = time_slots.filter(veterinarian=veterinarian)
+    if exclude_slot:
+        time_slots = time_slots.exclude(pk=exclude_slot.pk)
+
+    virtual_slots = []
+    if last_day >= today:
+        virtual_slots = [
+            slot for slot in expand_virtual_slots(
+                first_day,
+                last_day,
+                [veterinarian.pk] if veterinarian else None
+            )
+            if earliest <= datetime.combine(slot.date, slot.start_time) <= latest
+        ]
+
+    # Ante la misma distancia se prefieren los bloques guardados (los virtuales tienen id negativo)
+    nearest = sorted(
+        list(time_slots) + virtual_slots,
+        key=lambda slot: (abs(datetime.combine(slot.date, slot.start_time) - target), slot.id < 0, abs(slot.id))
+    )[:limit]
+
+    return [
+        {
+            'time_slot_id': slot.id,
+            'veterinarian_id': slot.veterinarian_id,
+            'veterinarian_name': slot.veterinarian.get_full_name(),
+            'date': slot.date.isoformat(),
+            'start_time': slot.start_time.strftime('%H:%M'),
+            'end_time': slot.end_time.strftime('%H:%M')
+        }
+        for slot in nearest
+    ]
+
+
+def slot_conflict_error(time_slot):
+    """Respuesta estructurada cuando un bloque ya fue tomado, con horarios alternativos"""
+    return {
+        'error': 'Este horario ya no está disponible con el veterinario seleccionado.',
+        'time_slot': ['Este bloque de tiempo ya no está disponible.'],
+        'alternative_veterinarians': find_alternative_veterinarians(
+            time_slot.date,
+            time_slot.start_time,
+            time_slot.veterinarian_id
+        ),
+        'nearest_available_slots': find_nearest_available_slots(
+            time_slot.date,
+            time_slot.start_time,
+            exclude_slot=time_slot
+        )
+    }
+
+
+def claim_time_slot(time_slot):
+    """
+    Reservar un bloque con un único UPDATE ... WHERE is_available.
+    La base de datos serializa las escrituras sobre la fila, por lo que entre
+    reservas concurrentes solo una obtiene filas afectadas. Debe llamarse dentro
+    de transaction.atomic() junto con la escritura de la cita para que un fallo
+    posterior devuelva el bloque.
+    Retorna True si el bloque quedó reservado para quien llama.
+    """
+    claimed = TimeSlot.objects.filter(
+        pk=time_slot.pk,
+        is_available=True
+    ).update(is_available=False, updated_at=timezone.now())
+    if not claimed:
+        return False
+
+    time_slot.is_available = False
+    # Las citas canceladas conservan su bloque; soltarlo para respetar el OneToOne
+    Appointment.objects.filter(time_slot=time_slot, status='CANCELADA').update(time_slot=None)
+
+    # update() no emite post_save: invalidar el calendario y el índice al confirmar la transacción
+    veterinarian_id, day = time_slot.veterinarian_id, time_slot.date
+    transaction.on_commit(lambda: calendar_cache.invalidate_month(veterinarian_id, day))
+    apply_on_commit([(veterinarian_id, day, time_slot.start_time, False)])
+    return True
+
+
+def reschedule_appointment(appointment, new_date, new_time, veterinarian, time_slot=None, note=''):
+    """
+    Reprograma una cita como un único intercambio atómico: bloquea la fila de la
+    cita, reserva el bloque nuevo con claim_time_slot (materializándolo si es
+    virtual), libera el anterior y guarda la cita en la misma transacción.
+    Si el bloque nuevo ya fue tomado no se modifica nada y se lanza
+    ValidationError con horarios alternativos; también si la cita ya fue
+    cancelada o atendida (aunque haya ocurrido en paralelo).
+    Retorna el bloque liberado (None si la cita no tenía bloque o lo conserva).
+    """
+    with transaction.atomic():
+        # Releer estado y bloque con la fila bloqueada: una cancelación u otra
+        # reprogramación de la misma cita pudo confirmarse después de leerla
+        locked = Appointment.objects.select_for_update().only(
+            'status', 'time_slot_id', 'receptionist_notes'
+        ).get(pk=appointment.pk)
+        appointment.status = locked.status
+        if locked.status in ('CANCELADA', 'ATENDIDA'):
+            raise serializers.ValidationError({
+                'error': f'No se puede reprogramar una cita {locked.get_status_display().lower()}.'
+            })
+        if locked.time_slot_id != appointment.time_slot_id:
+            appointment.time_slot = TimeSlot.objects.filter(pk=locked.time_slot_id).first()
+        old_slot = appointment.time_slot
+        if time_slot is not None:
+            # Un bloque virtual se guarda recién aquí: si la reprogramación falla no queda materializado
+            time_slot = materialize_time_slot(time_slot)
+        keeps_slot = time_slot is not None and time_slot.pk == locked.time_slot_id
+
+        if time_slot is not None and not keeps_slot and not claim_time_slot(time_slot):
+            raise serializers.ValidationError(slot_conflict_error(time_slot))
+
+        released = None
+        if old_slot is not None and not keeps_slot:
+            old_slot.is_available = True
+            old_slot.save(update_fields=['is_available', 'updated_at'])
+            released = old_slot
+
+        appointment.appointment_date = new_date
+        appointment.appointment_time = new_time
+        appointment.veterinarian = veterinarian
+        appointment.time_slot = time_slot
+        appointment.status = 'REPROGRAMADA'
+        appointment.receptionist_notes = (locked.receptionist_notes or '') + note
+        # Solo los campos de la reprogramación: el resto de la instancia puede estar desactualizado
+        appointment.save(update_fields=[
+            'appointment_date', 'appointment_time', 'veterinarian', 'time_slot',
+            'status', 'receptionist_notes', 'updated_at'
+        ])
+
+    return released
+
+
+def _is_future(time_slot):
+    now = timezone.localtime()
+    return (time_slot.date, time_slot.start_time) > (now.date(), now.time())
+
+
+def offer_time_slot(time_slot, auto_assign=None):
+    """
+    Ofrece un bloque liberado a la mejor entrada de la lista de espera para su
+    veterinario (la que lo prefiere o no tiene preferencia, por prioridad y antigüedad).
+    La entrada queda contactada con el bloque ofrecido; con WAITING_LIST_AUTO_ASSIGN
+    además se reserva el bloque y se crea la cita, todo en una transacción.
+    Retorna (entrada, cita o None), o None si no hubo a quién ofrecerlo.
+    """
+    if auto_assign is None:
+        auto_assign = settings.WAITING_LIST_AUTO_ASSIGN
+    if not time_slot.is_available or not _is_future(time_slot):
+        return None
+
+    veterinarian_id = time_slot.veterinarian_id
+    while True:
+        candidates = waiting_queue.best(veterinarian_id)
+        if not candidates:
+            return None
+
+        with transaction.atomic():
+            now = timezone.now()
+            # UPDATE condicional: solo se ofrece si la entrada sigue esperando este veterinario
+            offered = WaitingList.objects.filter(
+                Q(preferred_veterinarian_id=veterinarian_id) | Q(preferred_veterinarian__isnull=True),
+                pk=candidates[0],
+                is_active=True,
+                contacted=False
+            ).update(contacted=True, contact_date=now, offered_time_slot=time_slot, updated_at=now)
+            if not offered:
+                # La cola estaba desactualizada respecto de otro proceso: reconstruir y reintentar
+                waiting_queue.invalidate()
+                continue
+
+            entry = WaitingList.objects.select_related('client', 'pet', 'preferred_veterinarian').get(pk=candidates[0])
+            appointment = None
+            if auto_assign:
+                if not claim_time_slot(time_slot):
+                    # Alguien reservó el bloque entretanto: deshacer la oferta
+                    transaction.set_rollback(True)
+                    return None
+                appointment = Appointment.objects.create(
+                    pet=entry.pet,
+                    client=entry.client,
+                    veterinarian_id=veterinarian_id,
+                    time_slot=time_slot,
+                    appointment_date=time_slot.date,
+                    appointment_time=time_slot.start_time,
+                    reason=entry.reason,
+                    receptionist_notes='Asignada automáticamente desde la lista de espera'
+                )
+                WaitingList.objects.filter(pk=entry.pk).update(is_active=False)
+                entry.is_active = False
+
+            remove_from_queue_on_commit([entry.pk])
+        return entry, appointment
+
+
+def waiting_list_candidates(veterinarian_id, limit=5):
+    """Siguientes entradas de la lista de espera para un bloque del veterinario, en orden de atención"""
+    ids = waiting_queue.best(veterinarian_id, limit)
+    entries = WaitingList.objects.select_related('client', 'pet', 'preferred_veterinarian').in_bulk(ids)
+    return [entries[entry_id] for entry_id in ids if entry_id in entries]
+
+
+def offer_time_slots(time_slots, auto_assign=None):
+    """
+    Ofrece varios bloques liberados o creados, en orden cronológico.
+    Se detiene en cuanto la lista de espera queda vacía.
+    Retorna la lista de (entrada, cita o None) ofrecidas.
+    """
+    offers = []
+    for time_slot in sorted(time_slots, key=lambda slot: (slot.date, slot.start_time, slot.veterinarian_id)):
+        if not len(waiting_queue):
+            break
+        offer = offer_time_slot(time_slot, auto_assign)
+        if offer:
+            offers.append(offer)
+    return offers
@@ -0,0 +1,140 @@
+"""
+Señales de la app de citas: mantienen el caché del calendario mensual, el
+índice de disponibilidad y la cola de la lista de espera al día, y publican
+los cambios de bloques en vivo, cuando se escriben bloques de tiempo, citas o
+entradas de la lista de espera.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.pets.models import Pet
+from .models import TimeSlot, Appointment, WaitingList, AvailabilityRule, AvailabilityException
+from . import calendar_cache
+from .availability import availability_index, apply_on_commit
+from . import waiting_list
+from . import slot_events
+
+
+def _scope(instance):
+    """(veterinario, fecha) del calendario afectado por la instancia"""
+    # Leer de __dict__ para no disparar consultas sobre campos diferidos (.only/.defer)
+    values = instance.__dict__
+    date_field = 'date' if isinstance(instance, TimeSlot) else 'appointment_date'
+    return values.get('veterinarian_id'), values.get(date_field)
+
+
+def _invalidate(instance):
+    scopes = {getattr(instance, '_calendar_scope', None), _scope(instance)} - {None}
+    instance._calendar_scope = _scope(instance)
+    
+    def invalidate():
+        for veterinarian_id, day in scopes:
+            if veterinarian_id and day:
+                calendar_cache.invalidate_month(veterinarian_id, day)
+    
+    # Invalidar al confirmar la transacción para no recachear un estado aún no visible
+    transaction.on_commit(invalidate)
+
+
+def _slot_key(instance):
+    """(veterinario, fecha, hora de inicio) del bloque en el índice de disponibilidad"""
+    values = instance.__dict__
+    return values.get('veterinarian_id'), values.get('date'), values.get('start_time')
+
+
+@receiver(post_init, sender=TimeSlot)
+@receiver(post_init, sender=Appointment)
+def remember_calendar_scope(sender, instance, **kwargs):
+    # Recordar el mes original para invalidarlo también si la instancia se mueve
+    instance._calendar_scope = _scope(instance)
+    if sender is TimeSlot:
+        instance._availability_key = instance._slot_event_key = _slot_key(instance)
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_calendar(sender, instance, **kwargs):
+    # Appointment.save también guarda su time_slot, lo que dispara esta señal para el bloque
+    _invalidate(instance)
+
+
+@receiver(post_save, sender=TimeSlot)
+def update_availability_index(sender, instance, **kwargs):
+    old_key, new_key = instance._availability_key, _slot_key(instance)
+    instance._availability_key = new_key
+    
+    changes = []
+    if old_key != new_key and None not in old_key:
+        # El bloque cambió de veterinario, fecha u hora: apagar la posición anterior
+        changes.append((*old_key, False))
+    changes.append((*new_key, instance.is_available))
+    apply_on_commit(changes)
+
+
+@receiver(post_save, sender=TimeSlot)
+def publish_slot_change(sender, instance, **kwargs):
+    old_key = instance._slot_event_key
+    instance._slot_event_key = _slot_key(instance)
+    if old_key != instance._slot_event_key and None not in old_key:
+        # El bloque se movió: quitarlo de su posición anterior
+        veterinarian_id, day, start_time = old_key
+        moved = TimeSlot(pk=instance.pk, veterinarian_id=veterinarian_id, date=day, start_time=start_time)
+        slot_events.publish_on_commit(veterinarian_id, day, slot_events.slot_delta(moved, deleted=True))
+    slot_events.publish_on_commit(instance.veterinarian_id, instance.date, slot_events.slot_delta(instance))
+
+
+@receiver(post_delete, sender=TimeSlot)
+def publish_slot_deletion(sender, instance, **kwargs):
+    slot_events.publish_on_commit(instance.veterinarian_id, instance.date, slot_events.slot_delta(instance, deleted=True))
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_change(sender, instance, **kwargs):
+    if instance.time_slot_id:
+        slot_events.publish_on_commit(
+            instance.veterinarian_id, instance.appointment_date, slot_events.appointment_delta(instance)
+        )
+
+
+@receiver(post_delete, sender=TimeSlot)
+def remove_from_availability_index(sender, instance, **kwargs):
+    # Al borrar un bloque puede reaparecer el bloque virtual de su horario recurrente: reconstruir
+    transaction.on_commit(availability_index.invalidate)
+
+
+@receiver(post_save, sender=WaitingList)
+def update_waiting_queue(sender, instance, **kwargs):
+    waiting_list.apply_on_commit([instance])
+
+
+@receiver(post_delete, sender=WaitingList)
+def remove_from_waiting_queue(sender, instance, **kwargs):
+    waiting_list.remove_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=AvailabilityRule)
+@receiver(post_delete, sender=AvailabilityRule)
+@receiver(post_save, sender=AvailabilityException)
+@receiver(post_delete, sender=AvailabilityException)
+def invalidate_recurring_availability(sender, instance, **kwargs):
+    # Un horario recurrente o una excepción cambia los bloques virtuales de muchos meses
+    transaction.on_commit(calendar_cache.invalidate_all)
+    transaction.on_commit(availability_index.invalidate)
+    transaction.on_commit(slot_events.publish_reset_all)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Pet)
+def invalidate_calendar_names(sender, instance, update_fields=None, **kwargs):
+    # Los nombres de veterinarios, clientes y mascotas aparecen en el calendario
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    calendar_cache.invalidate_all()
+    if sender is not Pet:
+        # El índice solo considera veterinarios activos: reconstruirlo si cambia un usuario
+        transaction.on_commit(availability_index.invalidate)
@@ -0,0 +1,205 @@
+"""
+Difusión en vivo de cambios de bloques (Server-Sent Events).
+
+signals.py publica un delta compacto por cada bloque o cita que cambia, al
+confirmarse la transacción. El hub lo reparte en memoria a las conexiones
+abiertas de ese mes (y veterinario), de modo que los clientes descargan el
+calendario una vez y luego aplican los cambios en lugar de volver a pedir el
+mes completo.
+
+Deltas (evento "slot"):
+    {"slot": 45, "vet": 3, "date": "2025-11-03", "start": "09:00:00", "end": "10:00:00", "available": false}
+    {"slot": 45, "vet": 3, "date": "2025-11-03", "start": "09:00:00", "appointment": 12, "status": "PENDIENTE"}
+    {"slot": 45, "vet": 3, "date": "2025-11-03", "start": "09:00:00", "deleted": true}
+El evento "reset" indica que el cliente debe volver a descargar el mes (cambios
+masivos, horarios recurrentes, o una conexión que se atrasó o perdió eventos).
+
+El hub vive en el proceso: con varios procesos cada uno difunde solo los
+cambios que él mismo procesa. Para repartirlos entre procesos habría que
+publicar en un canal compartido (p. ej. Redis pub/sub) y alimentar el hub desde ahí.
+"""
+
+import json
+import queue
+import threading
+import time as time_module
+from collections import deque
+from datetime import date
+
+from django.db import transaction
+from rest_framework.renderers import BaseRenderer
+
+
+class SlotEventHub:
+    """Reparte eventos a los suscriptores de cada (año, mes), filtrando por veterinario"""
+
+    def __init__(self, history=1000, queue_size=500):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        # Prefijo por proceso: un Last-Event-ID de otro proceso o de antes de un reinicio no se reconoce
+        self._epoch = format(time_module.time_ns(), 'x')
+        self._sequence = 0
+        self._history = deque(maxlen=history)
+        self._queue_size = queue_size
+
+    def subscribe(self, year, month, veterinarian_id=None):
+        subscriber = Subscription(self, (year, month), veterinarian_id, self._queue_size)
+        with self._lock:
+            self._subscribers.setdefault(subscriber.month, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.month)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.month]
+
+    def publish(self, veterinarian_id, day, event, data):
+        """Envía un evento a las conexiones del mes de `day` (todas si veterinarian_id es None)"""
+        if not isinstance(day, date):
+            day = date.fromisoformat(str(day))
+        month = (day.year, day.month)
+        with self._lock:
+            self._sequence += 1
+            message = (f'{self._epoch}-{self._sequence}', veterinarian_id, month, event, data)
+            self._history.append(message)
+            subscribers = list(self._subscribers.get(month, ()))
+        for subscriber in subscribers:
+            subscriber.offer(message)
+
+    def replay(self, last_event_id, month, veterinarian_id):
+        """
+        Eventos posteriores a last_event_id para una suscripción que se reconecta,
+        o None si ya no están en el historial (el cliente debe recargar el mes).
+        """
+        epoch, _, sequence = last_event_id.partition('-')
+        with self._lock:
+            if epoch != self._epoch or not sequence.isdigit():
+                return None
+            sequence = int(sequence)
+            oldest = int(self._history[0][0].split('-')[1]) if self._history else self._sequence + 1
+            if sequence < oldest - 1:
+                return None
+            return [
+                message for message in self._history
+                if int(message[0].split('-')[1]) > sequence and _matches(message, month, veterinarian_id)
+            ]
+
+    def months(self):
+        """(año, mes) con conexiones abiertas"""
+        with self._lock:
+            return list(self._subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def _matches(message, month, veterinarian_id):
+    _, message_vet, message_month, _, _ = message
+    return message_month == month and (veterinarian_id is None or message_vet in (None, veterinarian_id))
+
+
+class Subscription:
+    """Conexión abierta: cola acotada de eventos pendientes de enviar"""
+
+    def __init__(self, hub, month, veterinarian_id, queue_size):
+        self.hub = hub
+        self.month = month
+        self.veterinarian_id = veterinarian_id
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def offer(self, message):
+        if not _matches(message, self.month, self.veterinarian_id):
+            return
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # Un cliente lento no frena al resto: se le pedirá recargar el mes
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+slot_event_hub = SlotEventHub()
+
+
+def format_event(event, data, event_id=None):
+    """Mensaje en formato text/event-stream"""
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Permite negociar text/event-stream; los errores se envían como un evento "error" """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return format_event('error', data)
+
+
+def _time(value):
+    return value.strftime('%H:%M:%S') if hasattr(value, 'strftime') else value
+
+
+def slot_delta(time_slot, deleted=False):
+    """Delta de un bloque guardado, eliminado o que cambió de disponibilidad"""
+    data = {
+        'slot': time_slot.pk,
+        'vet': time_slot.veterinarian_id,
+        'date': str(time_slot.date),
+        'start': _time(time_slot.start_time),
+    }
+    if deleted:
+        data['deleted'] = True
+    else:
+        data['end'] = _time(time_slot.end_time)
+        data['available'] = time_slot.is_available
+    return data
+
+
+def appointment_delta(appointment):
+    """Delta del estado de la cita asociada a un bloque"""
+    return {
+        'slot': appointment.time_slot_id,
+        'vet': appointment.veterinarian_id,
+        'date': str(appointment.appointment_date),
+        'start': _time(appointment.appointment_time),
+        'appointment': appointment.pk,
+        'status': appointment.status,
+    }
+
+
+def publish_on_commit(veterinarian_id, day, data):
+    """Publica un delta "slot" cuando se confirma la transacción actual"""
+    if veterinarian_id and day:
+        transaction.on_commit(lambda: slot_event_hub.publish(veterinarian_id, day, 'slot', data))
+
+
+def publish_reset(veterinarian_id, day):
+    """Pide a las conexiones del mes de `day` que recarguen el calendario"""
+    slot_event_hub.publish(veterinarian_id, day, 'reset', {'vet': veterinarian_id, 'month': day.strftime('%Y-%m')})
+
+
+def publish_reset_all():
+    """Pide a todas las conexiones abiertas que recarguen el calendario"""
+    for year, month in slot_event_hub.months():
+        publish_reset(None, date(year, month, 1))
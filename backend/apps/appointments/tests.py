@@ -0,0 +1,352 @@
+from datetime import time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from apps.pets.models import Pet, MedicalRecord
+from veterinaria_pochita.testing import run_in_threads
+from .availability import availability_index
+from .models import TimeSlot, Appointment, AvailabilityRule
+from .services import generate_time_slots, reschedule_appointment
+from .virtual_slots import virtual_slot_id
+
+
+class AppointmentFixtures:
+    """Datos mínimos: recepcionista, cliente con mascota, veterinarios y bloques futuros"""
+
+    def make_users(self, vets=1):
+        self.receptionist = User.objects.create_user('recepcion', 'r@test.cl', 'x', role='RECEPCIONISTA')
+        self.client_user = User.objects.create_user(
+            'cliente', 'c@test.cl', 'x', role='CLIENTE', first_name='Cli', last_name='Ente'
+        )
+        self.pet = Pet.objects.create(name='Firulais', species='PERRO', gender='MACHO', owner=self.client_user)
+        self.vets = [
+            User.objects.create_user(
+                f'vet{i}', f'v{i}@test.cl', 'x', role='VETERINARIO', first_name=f'Vet{i}', last_name='Doc'
+            )
+            for i in range(vets)
+        ]
+        self.day = timezone.localdate() + timedelta(days=7)
+
+    def make_slots(self, vet, hours=range(9, 17), day=None):
+        day = day or self.day
+        return [
+            TimeSlot.objects.create(veterinarian=vet, date=day, start_time=time(hour), end_time=time(hour + 1))
+            for hour in hours
+        ]
+
+    def api(self, user=None):
+        api_client = APIClient()
+        api_client.force_authenticate(user or self.receptionist)
+        return api_client
+
+    def book(self, slot, api_client=None):
+        return (api_client or self.api()).post('/api/appointments/', {
+            'pet': self.pet.id,
+            'client': self.client_user.id,
+            'veterinarian': slot.veterinarian_id,
+            'time_slot': slot.id,
+            'appointment_date': str(slot.date),
+            'appointment_time': str(slot.start_time),
+            'reason': 'Control',
+        }, format='json', HTTP_HOST='localhost')
+
+    def reschedule(self, appointment, slot, api_client=None):
+        return (api_client or self.api()).post(f'/api/appointments/{appointment.pk}/reschedule/', {
+            'new_date': str(slot.date),
+            'new_time': str(slot.start_time),
+            'new_time_slot': slot.id,
+        }, format='json', HTTP_HOST='localhost')
+
+    def cancel(self, appointment, api_client=None):
+        return (api_client or self.api()).post(
+            f'/api/appointments/{appointment.pk}/cancel/', format='json', HTTP_HOST='localhost'
+        )
+
+
+class MonthlyCalendarQueryTests(AppointmentFixtures, TestCase):
+    """El calendario mensual ejecuta las mismas consultas sin importar veterinarios ni citas"""
+
+    def setUp(self):
+        self.make_users(vets=5)
+
+    def add_bookings(self, vets):
+        for vet in vets:
+            slots = self.make_slots(vet)
+            for slot in slots[::2]:
+                Appointment.objects.create(
+                    pet=self.pet, client=self.client_user, veterinarian=vet, time_slot=slot,
+                    appointment_date=slot.date, appointment_time=slot.start_time, reason='Control'
+                )
+
+    def get_calendar(self, queries):
+        url = f'/api/appointments/calendar/monthly/?year={self.day.year}&month={self.day.month}'
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = APIClient().get(url, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_constant_queries_as_vets_and_bookings_grow(self):
+        self.add_bookings(self.vets[:1])
+        self.get_calendar(2)
+        self.add_bookings(self.vets[1:])
+        self.get_calendar(2)
+
+
+class DashboardQueryTests(AppointmentFixtures, TestCase):
+    """El panel ejecuta las mismas consultas para cada rol sin importar la cantidad de datos"""
+
+    # Consultas por rol; el presupuesto de ('GET', 'dashboard_api') en settings.py es el máximo
+    queries = {'CLIENTE': 4, 'VETERINARIO': 4, 'RECEPCIONISTA': 4}
+
+    def setUp(self):
+        self.make_users(vets=2)
+        self.add_data(pets=0, appointments=1, records=1)
+
+    def add_data(self, pets, appointments, records):
+        all_pets = [self.pet] + [
+            Pet.objects.create(name=f'Mascota{i}', species='GATO', gender='HEMBRA', owner=self.client_user)
+            for i in range(pets)
+        ]
+        # Continuar después de las citas ya creadas para no repetir bloques
+        first = Appointment.objects.count()
+        for i in range(first, first + appointments):
+            vet = self.vets[i % len(self.vets)]
+            day = self.day + timedelta(days=i // 8)
+            slot = TimeSlot.objects.create(
+                veterinarian=vet, date=day, start_time=time(9 + i % 8), end_time=time(10 + i % 8)
+            )
+            Appointment.objects.create(
+                pet=all_pets[i % len(all_pets)], client=self.client_user, veterinarian=vet, time_slot=slot,
+                appointment_date=day, appointment_time=slot.start_time, reason='Control',
+                status='CONFIRMADA' if i % 3 else 'PENDIENTE'
+            )
+        for i in range(records):
+            MedicalRecord.objects.create(
+                pet=all_pets[i % len(all_pets)], veterinarian=self.vets[i % len(self.vets)],
+                reason='Control', diagnosis='Sano', treatment='Ninguno'
+            )
+
+    def get_dashboard(self, user):
+        with self.assertNumQueries(self.queries[user.role]):
+            response = self.api(user).get('/api/dashboard/', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_constant_queries_for_every_role(self):
+        users = [self.client_user, self.vets[0], self.receptionist]
+        for user in users:
+            with self.subTest(role=user.role, size='chico'):
+                self.get_dashboard(user)
+
+        self.add_data(pets=6, appointments=20, records=30)
+        for user in users:
+            with self.subTest(role=user.role, size='grande'):
+                data = self.get_dashboard(user)
+                self.assertTrue(data['upcoming_appointments'])
+                self.assertTrue(data['recent_medical_records'])
+
+
+class AvailabilityIndexTests(AppointmentFixtures, TestCase):
+    """El índice se mantiene al día sin reconstruirse tras cada cambio de bloques"""
+
+    def setUp(self):
+        cache.clear()
+        self.make_users()
+        self.slots = self.make_slots(self.vets[0])
+        availability_index.rebuild()
+
+    def apply(self, action):
+        """Ejecuta `action` confirmando su transacción y comprueba el índice contra la base de datos"""
+        with self.captureOnCommitCallbacks(execute=True):
+            result = action()
+        with mock.patch.object(availability_index, 'rebuild', wraps=availability_index.rebuild) as rebuild:
+            self.assertEqual(availability_index.verify(), [])
+            self.assertFalse(rebuild.called, 'el índice se invalidó en lugar de actualizarse')
+        return result
+
+    def free_times(self, day=None):
+        return availability_index.free_times(self.vets[0].id, day or self.day)
+
+    def test_index_follows_booking_cancel_reschedule_and_generation(self):
+        self.assertEqual(self.free_times(), [time(hour) for hour in range(9, 17)])
+
+        self.assertEqual(self.apply(lambda: self.book(self.slots[0])).status_code, 201)
+        self.assertNotIn(time(9), self.free_times())
+        appointment = Appointment.objects.get(time_slot=self.slots[0])
+
+        self.assertEqual(self.apply(lambda: self.reschedule(appointment, self.slots[1])).status_code, 200)
+        self.assertIn(time(9), self.free_times())
+        self.assertNotIn(time(10), self.free_times())
+
+        self.assertEqual(self.apply(lambda: self.cancel(appointment)).status_code, 200)
+        self.assertEqual(self.free_times(), [time(hour) for hour in range(9, 17)])
+
+        # Una semana completa, incluido el día que ya tenía bloques
+        result = self.apply(lambda: generate_time_slots(self.vets, self.day, 7))
+        self.assertGreater(result['created'], 0)
+        for offset in range(7):
+            day = self.day + timedelta(days=offset)
+            self.assertEqual(
+                self.free_times(day),
+                sorted(TimeSlot.objects.filter(date=day).values_list('start_time', flat=True))
+            )
+
+    def test_generation_uses_saved_rows_not_skipped_ones(self):
+        vet = self.vets[0]
+        monday = self.day + timedelta(days=7 - self.day.weekday())
+        bulk_create = TimeSlot.objects.bulk_create
+
+        def racing_bulk_create(slots, **kwargs):
+            # Otra petición crea y reserva el bloque de las 9:00 entre la lectura y la inserción
+            TimeSlot.objects.create(
+                veterinarian=vet, date=monday, start_time=time(9), end_time=time(10), is_available=False
+            )
+            return bulk_create(slots, **kwargs)
+
+        with mock.patch.object(TimeSlot.objects, 'bulk_create', side_effect=racing_bulk_create):
+            self.apply(lambda: generate_time_slots([vet], monday, 1))
+        self.assertEqual(self.free_times(monday), [time(hour) for hour in (10, 11, 12, 15, 16, 17, 18)])
+
+
+class VirtualSlotBookingTests(AppointmentFixtures, TestCase):
+    """Un bloque virtual solo se guarda como TimeSlot al reservarlo con éxito"""
+
+    def setUp(self):
+        self.make_users()
+        vet = self.vets[0]
+        AvailabilityRule.objects.create(
+            veterinarian=vet, weekday=self.day.weekday(), start_time=time(9), end_time=time(12)
+        )
+        self.virtual = TimeSlot(veterinarian=vet, date=self.day, start_time=time(10), end_time=time(11))
+        self.virtual.id = virtual_slot_id(vet.id, self.day, time(10))
+
+    def test_booking_materializes_virtual_slot(self):
+        response = self.book(self.virtual)
+        self.assertEqual(response.status_code, 201, response.content)
+        slot = TimeSlot.objects.get()
+        self.assertEqual((slot.date, slot.start_time, slot.is_available), (self.day, time(10), False))
+        self.assertEqual(Appointment.objects.get().time_slot_id, slot.id)
+
+    def test_invalid_booking_writes_no_slot(self):
+        other = User.objects.create_user('otro', 'o@test.cl', 'x', role='CLIENTE')
+        self.pet.owner = other
+        self.pet.save()
+        response = self.book(self.virtual)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pet', response.json())
+        self.assertFalse(TimeSlot.objects.exists())
+
+    def test_rejected_reschedule_writes_no_slot(self):
+        slot = self.make_slots(self.vets[0], hours=[15])[0]
+        self.assertEqual(self.book(slot).status_code, 201)
+        appointment = Appointment.objects.get(time_slot=slot)
+        self.assertEqual(self.cancel(appointment).status_code, 200)
+        self.assertEqual(self.reschedule(appointment, self.virtual).status_code, 400)
+        self.assertEqual(list(TimeSlot.objects.values_list('id', flat=True)), [slot.id])
+
+
+class ConcurrentBookingTests(AppointmentFixtures, TransactionTestCase):
+    """Reservas simultáneas del mismo bloque: exactamente una gana"""
+
+    threads = 8
+
+    def setUp(self):
+        self.make_users()
+        self.slot = self.make_slots(self.vets[0], hours=[10])[0]
+
+    def test_one_booking_wins_contested_slot(self):
+        results = run_in_threads([lambda: self.book(self.slot) for _ in range(self.threads)])
+        codes = sorted(response.status_code for response in results)
+        self.assertEqual(codes, [201] + [400] * (self.threads - 1))
+        for response in results:
+            if response.status_code == 400:
+                self.assertIn('time_slot', response.json())
+        self.assertEqual(Appointment.objects.filter(time_slot=self.slot).count(), 1)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertFalse(TimeSlot.objects.get(pk=self.slot.pk).is_available)
+
+
+class RescheduleTests(AppointmentFixtures, TestCase):
+
+    def setUp(self):
+        self.make_users()
+        self.slots = self.make_slots(self.vets[0])
+        response = self.book(self.slots[0])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.appointment = Appointment.objects.get(time_slot=self.slots[0])
+
+    def test_reschedule_moves_slot(self):
+        response = self.reschedule(self.appointment, self.slots[1])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'REPROGRAMADA')
+        self.assertEqual(self.appointment.time_slot_id, self.slots[1].id)
+        self.assertTrue(TimeSlot.objects.get(pk=self.slots[0].pk).is_available)
+        self.assertFalse(TimeSlot.objects.get(pk=self.slots[1].pk).is_available)
+
+    def test_cancelled_appointment_is_not_rescheduled(self):
+        self.assertEqual(self.cancel(self.appointment).status_code, 200)
+        response = self.reschedule(self.appointment, self.slots[1])
+        self.assertEqual(response.status_code, 400)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'CANCELADA')
+        self.assertTrue(TimeSlot.objects.get(pk=self.slots[1].pk).is_available)
+
+    def test_cancel_committed_after_read_is_not_overwritten(self):
+        # La instancia se leyó antes de que otra petición cancelara la cita
+        stale = Appointment.objects.select_related('time_slot').get(pk=self.appointment.pk)
+        Appointment.objects.filter(pk=self.appointment.pk).update(status='CANCELADA')
+        with self.assertRaises(serializers.ValidationError):
+            reschedule_appointment(stale, self.slots[1].date, self.slots[1].start_time,
+                                   self.vets[0], time_slot=self.slots[1])
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'CANCELADA')
+        self.assertEqual(self.appointment.time_slot_id, self.slots[0].id)
+        self.assertTrue(TimeSlot.objects.get(pk=self.slots[1].pk).is_available)
+
+
+class ConcurrentRescheduleTests(AppointmentFixtures, TransactionTestCase):
+
+    def setUp(self):
+        self.make_users()
+        self.slots = self.make_slots(self.vets[0])
+        self.assertEqual(self.book(self.slots[0]).status_code, 201)
+        self.appointment = Appointment.objects.get(time_slot=self.slots[0])
+
+    def assert_slots_consistent(self):
+        """Solo el bloque de la cita vigente está ocupado"""
+        self.appointment.refresh_from_db()
+        taken = set(TimeSlot.objects.filter(is_available=False).values_list('id', flat=True))
+        if self.appointment.status == 'CANCELADA':
+            self.assertEqual(taken, set())
+        else:
+            self.assertEqual(taken, {self.appointment.time_slot_id})
+            slot = self.appointment.time_slot
+            self.assertEqual(
+                (self.appointment.appointment_date, self.appointment.appointment_time),
+                (slot.date, slot.start_time)
+            )
+
+    def test_parallel_reschedules_leave_one_slot_taken(self):
+        targets = [lambda slot=slot: self.reschedule(self.appointment, slot).status_code for slot in self.slots[1:]]
+        results = run_in_threads(targets)
+        self.assertEqual(results, [200] * len(targets))
+        self.assert_slots_consistent()
+        self.assertEqual(self.appointment.status, 'REPROGRAMADA')
+
+    def test_parallel_cancel_and_reschedules(self):
+        targets = [lambda slot=slot: self.reschedule(self.appointment, slot).status_code for slot in self.slots[1:5]]
+        targets.append(lambda: self.cancel(self.appointment).status_code)
+        results = run_in_threads(targets)
+        self.assertEqual(results[-1], 200)
+        self.assertTrue(all(code in (200, 400) for code in results[:-1]), results)
+        self.assert_slots_consistent()
+        # La cancelación nunca queda sobrescrita: la cita termina cancelada
+        self.assertEqual(self.appointment.status, 'CANCELADA')
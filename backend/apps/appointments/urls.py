@@ -2,16 +2,22 @@ from django.urls import path
 from .views import (
     TimeSlotListCreateView,
     TimeSlotDetailView,
+    AvailabilityRuleListCreateView,
+    AvailabilityRuleDetailView,
+    AvailabilityExceptionListCreateView,
+    AvailabilityExceptionDetailView,
     AppointmentListCreateView,
     AppointmentDetailView,
     MonthlyCalendarView,
+    CalendarStreamView,
     RescheduleAppointmentView,
     CancelAppointmentView,
     AttendAppointmentView,
     WaitingListListCreateView,
     WaitingListDetailView,
     VeterinarianAvailabilityView,
-    VeterinarianAvailabilityPublicView
+    VeterinarianAvailabilityPublicView,
+    AvailableDaysView
 )
 
 app_name = 'appointments'
@@ -21,6 +27,12 @@ urlpatterns = [
     path('timeslots/', TimeSlotListCreateView.as_view(), name='timeslot_list_create'),
     path('timeslots/<int:pk>/', TimeSlotDetailView.as_view(), name='timeslot_detail'),
     
+    # Horarios recurrentes (bloques virtuales) y sus excepciones
+    path('rules/', AvailabilityRuleListCreateView.as_view(), name='availability_rule_list_create'),
+    path('rules/<int:pk>/', AvailabilityRuleDetailView.as_view(), name='availability_rule_detail'),
+    path('rules/exceptions/', AvailabilityExceptionListCreateView.as_view(), name='availability_exception_list_create'),
+    path('rules/exceptions/<int:pk>/', AvailabilityExceptionDetailView.as_view(), name='availability_exception_detail'),
+    
     # Gestión de citas
     path('', AppointmentListCreateView.as_view(), name='appointment_list_create'),
     path('<int:pk>/', AppointmentDetailView.as_view(), name='appointment_detail'),
@@ -30,10 +42,12 @@ urlpatterns = [
     
     # HU002: Calendario mensual
     path('calendar/monthly/', MonthlyCalendarView.as_view(), name='monthly_calendar'),
+    path('calendar/stream/', CalendarStreamView.as_view(), name='calendar_stream'),
     
     # Disponibilidad de veterinarios
     path('veterinarian/<int:veterinarian_id>/availability/', VeterinarianAvailabilityView.as_view(), name='veterinarian_availability'),
     path('availability/public/', VeterinarianAvailabilityPublicView.as_view(), name='veterinarian_availability_public'),
+    path('availability/days/', AvailableDaysView.as_view(), name='available_days'),
     
     # Lista de espera
     path('waiting-list/', WaitingListListCreateView.as_view(), name='waiting_list_list_create'),
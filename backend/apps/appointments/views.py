@@ -2,29 +2,67 @@ from rest_framework import generics, permissions, status, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q
-from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Q, Count
+from datetime import datetime, time, timedelta
 from calendar import monthrange
+import time as time_module
 
-from .models import TimeSlot, Appointment, WaitingList
+from .models import TimeSlot, Appointment, WaitingList, AvailabilityRule, AvailabilityException, local_datetime
 from .serializers import (
     TimeSlotSerializer, TimeSlotCreateSerializer,
+    AvailabilityRuleSerializer, AvailabilityExceptionSerializer,
     AppointmentSerializer, AppointmentCreateSerializer,
     AppointmentUpdateSerializer, AppointmentRescheduleSerializer,
     WaitingListSerializer, WaitingListCreateSerializer,
     CalendarSerializer
 )
+from .services import (
+    build_monthly_calendar, serialize_time_slot,
+    offer_time_slot, waiting_list_candidates, reschedule_appointment
+)
+from .virtual_slots import expand_virtual_slots, find_time_slot
+from .availability import availability_index
+from .slot_events import slot_event_hub, format_event, EventStreamRenderer
+from .compact_calendar import CompactCalendarRenderer, build_compact_calendar
+from . import calendar_cache
 from apps.users.models import User
+from apps.pets.models import Pet, MedicalRecord
+from apps.pets.serializers import PetSerializer, DashboardMedicalRecordSerializer
+from veterinaria_pochita.conditional import conditional_response
+from veterinaria_pochita.pagination import KeysetPagination
+
+
+def _offer_data(offer):
+    """Entrada de la lista de espera a la que se ofreció un bloque liberado (y la cita si se asignó)"""
+    if not offer:
+        return None
+    entry, appointment = offer
+    return {
+        'entry': WaitingListSerializer(entry).data,
+        'appointment_id': appointment.id if appointment else None
+    }
 
 
 class TimeSlotListCreateView(generics.ListCreateAPIView):
     """Vista para listar y crear bloques de tiempo"""
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter, DjangoFilterBackend]
-    ordering_fields = ['date', 'start_time']
-    filterset_fields = ['veterinarian', 'date', 'is_available']
+    ordering_fields = ['date', 'start_time', 'starts_at']
+    # starts_at__gte / starts_at__lt: bloques de un rango horario (p. ej. la semana de un veterinario)
+    filterset_fields = {
+        'veterinarian': ['exact'],
+        'date': ['exact'],
+        'is_available': ['exact'],
+        'starts_at': ['gte', 'lt'],
+    }
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -32,23 +70,79 @@ class TimeSlotListCreateView(generics.ListCreateAPIView):
         return TimeSlotSerializer
     
     def get_queryset(self):
-        return TimeSlot.objects.all()
+        return TimeSlot.objects.select_related('veterinarian')
+    
+    def perform_create(self, serializer):
+        time_slot = serializer.save()
+        # Un bloque nuevo se ofrece a la lista de espera
+        offer_time_slot(time_slot)
 
 
 class TimeSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Vista para ver, actualizar y eliminar bloques de tiempo"""
-    queryset = TimeSlot.objects.all()
+    queryset = TimeSlot.objects.select_related('veterinarian')
     serializer_class = TimeSlotSerializer
     permission_classes = [permissions.IsAuthenticated]
+    
+    def perform_update(self, serializer):
+        was_available = serializer.instance.is_available
+        time_slot = serializer.save()
+        # Un bloque que se desbloquea se ofrece a la lista de espera
+        if time_slot.is_available and not was_available:
+            offer_time_slot(time_slot)
+
+
+class AvailabilityRuleListCreateView(generics.ListCreateAPIView):
+    """Vista para listar y crear horarios recurrentes"""
+    serializer_class = AvailabilityRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['veterinarian', 'weekday', 'is_active']
+    
+    def get_queryset(self):
+        return AvailabilityRule.objects.select_related('veterinarian')
+
+
+class AvailabilityRuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Vista para ver, actualizar y eliminar horarios recurrentes"""
+    queryset = AvailabilityRule.objects.select_related('veterinarian')
+    serializer_class = AvailabilityRuleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class AvailabilityExceptionListCreateView(generics.ListCreateAPIView):
+    """Vista para listar y crear excepciones de horario"""
+    serializer_class = AvailabilityExceptionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['veterinarian', 'date']
+    
+    def get_queryset(self):
+        return AvailabilityException.objects.select_related('veterinarian')
+
+
+class AvailabilityExceptionDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Vista para ver, actualizar y eliminar excepciones de horario"""
+    queryset = AvailabilityException.objects.select_related('veterinarian')
+    serializer_class = AvailabilityExceptionSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
 
 class AppointmentListCreateView(generics.ListCreateAPIView):
     """Vista para listar y crear citas"""
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     search_fields = ['pet__name', 'client__first_name', 'client__last_name', 'reason']
-    ordering_fields = ['appointment_date', 'appointment_time', 'created_at']
-    filterset_fields = ['status', 'veterinarian', 'client', 'appointment_date']
+    ordering_fields = ['appointment_date', 'appointment_time', 'starts_at', 'created_at']
+    # starts_at__gte / starts_at__lt: citas de un rango horario sobre appt_vet_starts_idx
+    filterset_fields = {
+        'status': ['exact'],
+        'veterinarian': ['exact'],
+        'client': ['exact'],
+        'appointment_date': ['exact'],
+        'starts_at': ['gte', 'lt'],
+    }
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -60,14 +154,14 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
         
         # Los clientes solo ven sus propias citas
         if user.role == 'CLIENTE':
-            return Appointment.objects.filter(client=user)
+            return Appointment.objects.select_related('pet__owner', 'client', 'veterinarian').filter(client=user)
         
         # Los veterinarios ven sus citas asignadas
         if user.role == 'VETERINARIO':
-            return Appointment.objects.filter(veterinarian=user)
+            return Appointment.objects.select_related('pet__owner', 'client', 'veterinarian').filter(veterinarian=user)
         
         # Los recepcionistas ven todas las citas
-        return Appointment.objects.all()
+        return Appointment.objects.select_related('pet__owner', 'client', 'veterinarian')
     
     def perform_create(self, serializer):
         # Los veterinarios NO pueden crear citas
@@ -76,62 +170,10 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
                 detail='Los veterinarios no pueden crear citas. Solo pueden ver su agenda asignada.'
             )
         
-        # Verificar disponibilidad del slot ANTES de crear la cita
-        time_slot = serializer.validated_data.get('time_slot')
-        veterinarian = serializer.validated_data.get('veterinarian')
-        appointment_date = serializer.validated_data.get('appointment_date')
-        appointment_time = serializer.validated_data.get('appointment_time')
-        
-        if time_slot:
-            # Verificar si el slot sigue disponible (race condition protection)
-            time_slot.refresh_from_db()
-            if not time_slot.is_available:
-                # Buscar veterinarios alternativos disponibles en ese mismo horario
-                alternative_vets = self._find_alternative_veterinarians(
-                    appointment_date, 
-                    appointment_time, 
-                    veterinarian
-                )
-                
-                error_response = {
-                    'error': 'Este horario ya no está disponible con el veterinario seleccionado.',
-                    'time_slot': ['Este bloque de tiempo ya no está disponible.'],
-                    'alternative_veterinarians': alternative_vets
-                }
-                from rest_framework.exceptions import ValidationError
-                raise ValidationError(error_response)
-        
+        # La reserva del bloque es atómica en AppointmentCreateSerializer.create();
+        # si otro cliente lo tomó primero se responde con horarios alternativos
         # Establecer quién creó la cita
         serializer.save(created_by=self.request.user)
-    
-    def _find_alternative_veterinarians(self, date, time, excluded_vet):
-        """Buscar veterinarios alternativos disponibles en el mismo horario"""
-        # Buscar todos los veterinarios activos excepto el excluido
-        alternative_vets = User.objects.filter(
-            role='VETERINARIO',
-            is_active=True
-        ).exclude(id=excluded_vet.id if excluded_vet else None)
-        
-        alternatives = []
-        for vet in alternative_vets:
-            # Buscar slots disponibles para este veterinario en la misma fecha y hora
-            available_slots = TimeSlot.objects.filter(
-                veterinarian=vet,
-                date=date,
-                start_time=time,
-                is_available=True
-            )
-            
-            if available_slots.exists():
-                slot = available_slots.first()
-                alternatives.append({
-                    'id': vet.id,
-                    'name': vet.get_full_name(),
-                    'email': vet.email,
-                    'time_slot_id': slot.id
-                })
-        
-        return alternatives
 
 
 class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -148,14 +190,14 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         
         # Los clientes solo pueden acceder a sus propias citas
         if user.role == 'CLIENTE':
-            return Appointment.objects.filter(client=user)
+            return Appointment.objects.select_related('pet__owner', 'client', 'veterinarian').filter(client=user)
         
         # Los veterinarios solo pueden acceder a sus citas
         if user.role == 'VETERINARIO':
-            return Appointment.objects.filter(veterinarian=user)
+            return Appointment.objects.select_related('pet__owner', 'client', 'veterinarian').filter(veterinarian=user)
         
         # Los recepcionistas pueden acceder a todas
-        return Appointment.objects.all()
+        return Appointment.objects.select_related('pet__owner', 'client', 'veterinarian')
 
 
 class MonthlyCalendarView(APIView):
@@ -164,6 +206,8 @@ class MonthlyCalendarView(APIView):
     Muestra bloques de atención disponibles y ocupados para cada veterinario
     """
     permission_classes = [permissions.AllowAny]  # Público para permitir búsqueda sin autenticación
+    # ?format=compact entrega el calendario como grillas por día (ver compact_calendar.py)
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CompactCalendarRenderer]
     
     def get(self, request):
         # Los veterinarios NO pueden acceder al calendario de agendamiento (solo si está autenticado)
@@ -185,71 +229,38 @@ class MonthlyCalendarView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obtener primer y último día del mes
-        first_day = datetime(year, month, 1).date()
-        last_day_num = monthrange(year, month)[1]
-        last_day = datetime(year, month, last_day_num).date()
-        
-        # Filtrar veterinarios
         if veterinarian_id:
-            veterinarians = User.objects.filter(id=veterinarian_id, role='VETERINARIO')
-        else:
-            veterinarians = User.objects.filter(role='VETERINARIO', is_active=True)
-        
-        calendar_data = []
+            try:
+                veterinarian_id = int(veterinarian_id)
+            except ValueError:
+                return Response(
+                    {'error': 'veterinarian_id inválido'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
-        for vet in veterinarians:
-            # Obtener bloques de tiempo del veterinario para el mes
-            time_slots = TimeSlot.objects.filter(
-                veterinarian=vet,
-                date__gte=first_day,
-                date__lte=last_day
-            ).order_by('date', 'start_time')
-            
-            # Agrupar por fecha
-            dates_dict = {}
-            for slot in time_slots:
-                date_str = slot.date.isoformat()
-                if date_str not in dates_dict:
-                    dates_dict[date_str] = {
-                        'date': slot.date,
-                        'available_slots': [],
-                        'occupied_slots': []
-                    }
-                
-                if slot.is_available:
-                    dates_dict[date_str]['available_slots'].append(slot)
-                else:
-                    # Obtener información de la cita
-                    try:
-                        appointment = Appointment.objects.get(time_slot=slot)
-                        dates_dict[date_str]['occupied_slots'].append({
-                            'time_slot_id': slot.id,
-                            'start_time': slot.start_time.strftime('%H:%M'),
-                            'end_time': slot.end_time.strftime('%H:%M'),
-                            'appointment_id': appointment.id,
-                            'pet_name': appointment.pet.name,
-                            'client_name': appointment.client.get_full_name(),
-                            'status': appointment.status
-                        })
-                    except Appointment.DoesNotExist:
-                        # El slot está marcado como no disponible pero no tiene cita
-                        dates_dict[date_str]['occupied_slots'].append({
-                            'time_slot_id': slot.id,
-                            'start_time': slot.start_time.strftime('%H:%M'),
-                            'end_time': slot.end_time.strftime('%H:%M'),
-                            'reason': 'No disponible'
-                        })
-            
-            # Añadir al calendario
-            for date_str, date_data in dates_dict.items():
-                calendar_data.append({
-                    'veterinarian_id': vet.id,
-                    'veterinarian_name': vet.get_full_name(),
-                    'date': date_str,  # Usar date_str (ya en formato ISO) en lugar del objeto date
-                    'available_slots': TimeSlotSerializer(date_data['available_slots'], many=True).data,
-                    'occupied_slots': date_data['occupied_slots']
-                })
+        # 304 si el cliente ya tiene la versión actual del mes
+        version = calendar_cache.month_version(year, month, veterinarian_id)
+        return conditional_response(
+            request,
+            version,
+            lambda: self._calendar_response(year, month, veterinarian_id),
+            last_modified=version / 1e9
+        )
+    
+    def _calendar_response(self, year, month, veterinarian_id):
+        if self.request.accepted_renderer.format == 'compact':
+            calendar_data = calendar_cache.get_month('compact', year, month, veterinarian_id)
+            if calendar_data is None:
+                calendar_data = build_compact_calendar(year, month, veterinarian_id)
+                calendar_cache.set_month('compact', year, month, veterinarian_id, calendar_data)
+            return Response(calendar_data, status=status.HTTP_200_OK)
+        
+        # Servir desde caché; se invalida al escribir bloques o citas del mes
+        calendar_data = calendar_cache.get_month('monthly', year, month, veterinarian_id)
+        if calendar_data is None:
+            # Todos los bloques del mes con su cita, mascota y cliente en una sola consulta
+            calendar_data = build_monthly_calendar(year, month, veterinarian_id)
+            calendar_cache.set_month('monthly', year, month, veterinarian_id, calendar_data)
         
         return Response({
             'year': year,
@@ -258,6 +269,69 @@ class MonthlyCalendarView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class CalendarStreamView(APIView):
+    """
+    Stream (Server-Sent Events) de cambios de bloques de un mes.
+    El cliente descarga el calendario mensual una vez y aplica los deltas "slot";
+    ante un evento "reset" vuelve a descargar el mes.
+    """
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    
+    def get(self, request):
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            month = int(request.query_params.get('month', timezone.now().month))
+            veterinarian_id = request.query_params.get('veterinarian_id')
+            veterinarian_id = int(veterinarian_id) if veterinarian_id else None
+        except ValueError:
+            return Response(
+                {'error': 'Parámetros inválidos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if month < 1 or month > 12:
+            return Response(
+                {'error': 'El mes debe estar entre 1 y 12'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        subscription = slot_event_hub.subscribe(year, month, veterinarian_id)
+        last_event_id = request.META.get('HTTP_LAST_EVENT_ID')
+        
+        def stream():
+            try:
+                yield f'retry: {settings.SLOT_STREAM_RETRY_MS}\n\n'.encode()
+                if last_event_id:
+                    # Reconexión: reenviar lo perdido o pedir recargar el mes
+                    missed = slot_event_hub.replay(last_event_id, (year, month), veterinarian_id)
+                    if missed is None:
+                        yield format_event('reset', {'vet': veterinarian_id, 'month': f'{year}-{month:02d}'})
+                    for event_id, _, _, event, data in missed or ():
+                        yield format_event(event, data, event_id)
+                
+                deadline = time_module.monotonic() + settings.SLOT_STREAM_MAX_SECONDS
+                while time_module.monotonic() < deadline:
+                    message = subscription.get(timeout=settings.SLOT_STREAM_KEEPALIVE_SECONDS)
+                    if subscription.overflowed:
+                        # Cliente atrasado: descartar lo pendiente y pedir recargar el mes
+                        yield format_event('reset', {'vet': veterinarian_id, 'month': f'{year}-{month:02d}'})
+                        break
+                    if message is None:
+                        yield b': keepalive\n\n'
+                        continue
+                    event_id, _, _, event, data = message
+                    yield format_event(event, data, event_id)
+            finally:
+                subscription.close()
+        
+        # Al cumplirse SLOT_STREAM_MAX_SECONDS la conexión se cierra y EventSource se reconecta
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class RescheduleAppointmentView(APIView):
     """
     HU006: Vista para reprogramar citas
@@ -266,9 +340,11 @@ class RescheduleAppointmentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, pk):
-        # Obtener la cita a reprogramar
+        # Obtener la cita a reprogramar junto con lo que se usa en la respuesta
         try:
-            appointment = Appointment.objects.get(pk=pk)
+            appointment = Appointment.objects.select_related(
+                'pet__owner', 'client', 'veterinarian', 'time_slot'
+            ).get(pk=pk)
         except Appointment.DoesNotExist:
             return Response(
                 {'error': 'Cita no encontrada'},
@@ -277,7 +353,7 @@ class RescheduleAppointmentView(APIView):
         
         # Verificar permisos
         user = request.user
-        if user.role == 'CLIENTE' and appointment.client != user:
+        if user.role == 'CLIENTE' and appointment.client_id != user.id:
             return Response(
                 {'error': 'No tiene permiso para reprogramar esta cita'},
                 status=status.HTTP_403_FORBIDDEN
@@ -295,31 +371,21 @@ class RescheduleAppointmentView(APIView):
         new_slot_id = serializer.validated_data.get('new_time_slot')
         reason = serializer.validated_data.get('reason', '')
         
-        # Liberar el time_slot anterior si existe
-        if appointment.time_slot:
-            old_slot = appointment.time_slot
-            old_slot.is_available = True
-            old_slot.save()
-        
-        # Asignar nuevo time_slot si se proporciona
+        # Nuevo time_slot si se proporciona; la fecha, hora y veterinario pasan a ser los del bloque
         new_time_slot = None
+        new_veterinarian = appointment.veterinarian
         if new_slot_id:
             try:
-                new_time_slot = TimeSlot.objects.get(pk=new_slot_id)
-                if not new_time_slot.is_available:
-                    return Response(
-                        {'error': 'El nuevo bloque de tiempo no está disponible'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                new_time_slot = find_time_slot(new_slot_id)
             except TimeSlot.DoesNotExist:
                 return Response(
                     {'error': 'Bloque de tiempo no encontrado'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-        
-        # Asignar nuevo veterinario si se proporciona
-        new_veterinarian = appointment.veterinarian
-        if new_vet_id:
+            new_date, new_time = new_time_slot.date, new_time_slot.start_time
+            new_veterinarian = new_time_slot.veterinarian
+        elif new_vet_id:
+            # Asignar nuevo veterinario si se proporciona
             try:
                 new_veterinarian = User.objects.get(pk=new_vet_id, role='VETERINARIO')
             except User.DoesNotExist:
@@ -335,26 +401,26 @@ class RescheduleAppointmentView(APIView):
             'veterinarian': appointment.veterinarian.get_full_name() if appointment.veterinarian else 'N/A'
         }
         
-        # Actualizar la cita
-        appointment.appointment_date = new_date
-        appointment.appointment_time = new_time
-        appointment.veterinarian = new_veterinarian
-        appointment.time_slot = new_time_slot
-        appointment.status = 'REPROGRAMADA'
-        
         # Agregar nota sobre la reprogramación
         reprogramming_note = f"\nReprogramada el {timezone.now().strftime('%d/%m/%Y %H:%M')}"
         reprogramming_note += f"\nDesde: {old_appointment_data['date']} {old_appointment_data['time']} - Dr. {old_appointment_data['veterinarian']}"
-        reprogramming_note += f"\nHacia: {new_date} {new_time} - Dr. {new_veterinarian.get_full_name()}"
+        reprogramming_note += f"\nHacia: {new_date} {new_time} - Dr. {new_veterinarian.get_full_name() if new_veterinarian else 'N/A'}"
         if reason:
             reprogramming_note += f"\nMotivo: {reason}"
         
-        if appointment.receptionist_notes:
-            appointment.receptionist_notes += reprogramming_note
-        else:
-            appointment.receptionist_notes = reprogramming_note
+        # Reservar el bloque nuevo, liberar el anterior y guardar la cita en una sola transacción
+        # (si el bloque ya fue tomado responde 400 con horarios alternativos sin tocar la cita)
+        released_slot = reschedule_appointment(
+            appointment,
+            new_date,
+            new_time,
+            new_veterinarian,
+            time_slot=new_time_slot,
+            note=reprogramming_note
+        )
         
-        appointment.save()
+        # Ofrecer el bloque anterior a la lista de espera
+        offer = offer_time_slot(released_slot) if released_slot else None
         
         # Serializar y devolver
         response_serializer = AppointmentSerializer(appointment)
@@ -376,7 +442,8 @@ class RescheduleAppointmentView(APIView):
             'appointment': response_serializer.data,
             'client': client_info,
             'pet': pet_info,
-            'old_data': old_appointment_data
+            'old_data': old_appointment_data,
+            'waiting_list_offer': _offer_data(offer)
         }, status=status.HTTP_200_OK)
 
 
@@ -401,38 +468,38 @@ class CancelAppointmentView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Liberar el time_slot si existe
-        if appointment.time_slot:
-            slot = appointment.time_slot
-            slot.is_available = True
-            slot.save()
+        with transaction.atomic():
+            # Releer estado y bloque con la fila bloqueada: una reprogramación pudo confirmarse entretanto
+            locked = Appointment.objects.select_for_update().only(
+                'status', 'time_slot_id', 'receptionist_notes'
+            ).get(pk=pk)
+            if locked.time_slot_id != appointment.time_slot_id:
+                appointment.refresh_from_db(fields=['time_slot', 'veterinarian', 'appointment_date', 'appointment_time'])
             
-            veterinarian_name = appointment.veterinarian.get_full_name() if appointment.veterinarian else 'el veterinario'
-            freed_slot_info = {
-                'message': f'Se ha liberado un horario de {veterinarian_name}',
-                'date': slot.date,
-                'time': f"{slot.start_time} - {slot.end_time}",
-                'veterinarian_id': appointment.veterinarian.id if appointment.veterinarian else None
-            }
-        else:
-            freed_slot_info = None
-        
-        # Cambiar estado de la cita
-        appointment.status = 'CANCELADA'
-        cancellation_note = f"\nCancelada el {timezone.now().strftime('%d/%m/%Y %H:%M')} por {user.get_full_name()}"
-        
-        if appointment.receptionist_notes:
-            appointment.receptionist_notes += cancellation_note
-        else:
-            appointment.receptionist_notes = cancellation_note
-        
-        appointment.save()
+            # Liberar el time_slot si existe
+            slot = appointment.time_slot if locked.status != 'CANCELADA' else None
+            if slot:
+                veterinarian_name = appointment.veterinarian.get_full_name() if appointment.veterinarian else 'el veterinario'
+                freed_slot_info = {
+                    'message': f'Se ha liberado un horario de {veterinarian_name}',
+                    'date': slot.date,
+                    'time': f"{slot.start_time} - {slot.end_time}",
+                    'veterinarian_id': appointment.veterinarian.id if appointment.veterinarian else None
+                }
+                slot.is_available = True
+                slot.save()
+            else:
+                freed_slot_info = None
+            
+            # Cambiar estado de la cita
+            appointment.status = 'CANCELADA'
+            cancellation_note = f"\nCancelada el {timezone.now().strftime('%d/%m/%Y %H:%M')} por {user.get_full_name()}"
+            appointment.receptionist_notes = (locked.receptionist_notes or '') + cancellation_note
+            appointment.save(update_fields=['status', 'receptionist_notes', 'updated_at'])
         
-        # Buscar en lista de espera
-        waiting_list_entries = WaitingList.objects.filter(
-            is_active=True,
-            contacted=False
-        ).order_by('priority', 'created_at')[:5]
+        # Ofrecer el bloque liberado a la lista de espera y mostrar los siguientes candidatos
+        offer = offer_time_slot(slot) if slot else None
+        waiting_list_entries = waiting_list_candidates(appointment.veterinarian_id)
         
         # Información del cliente y mascota para el mensaje
         client_info = {
@@ -451,8 +518,9 @@ class CancelAppointmentView(APIView):
             'client': client_info,
             'pet': pet_info,
             'freed_slot': freed_slot_info,
-            'waiting_list_count': waiting_list_entries.count(),
-            'waiting_list_clients': WaitingListSerializer(waiting_list_entries, many=True).data
+            'waiting_list_count': len(waiting_list_entries),
+            'waiting_list_clients': WaitingListSerializer(waiting_list_entries, many=True).data,
+            'waiting_list_offer': _offer_data(offer)
         }, status=status.HTTP_200_OK)
 
 
@@ -516,15 +584,15 @@ class WaitingListListCreateView(generics.ListCreateAPIView):
         
         # Los clientes solo ven sus propias entradas
         if user.role == 'CLIENTE':
-            return WaitingList.objects.filter(client=user)
+            return WaitingList.objects.select_related('client', 'pet', 'preferred_veterinarian').filter(client=user)
         
         # Recepcionistas y veterinarios ven todas
-        return WaitingList.objects.filter(is_active=True)
+        return WaitingList.objects.select_related('client', 'pet', 'preferred_veterinarian').filter(is_active=True)
 
 
 class WaitingListDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Vista para ver, actualizar y eliminar entradas de lista de espera"""
-    queryset = WaitingList.objects.all()
+    queryset = WaitingList.objects.select_related('client', 'pet', 'preferred_veterinarian')
     serializer_class = WaitingListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -558,20 +626,64 @@ class VeterinarianAvailabilityPublicView(APIView):
             )
         
         try:
-            veterinarian = User.objects.get(id=veterinarian_id, role='VETERINARIO', is_active=True)
-        except User.DoesNotExist:
+            veterinarian_id = int(veterinarian_id)
+        except ValueError:
             return Response(
-                {'error': 'Veterinario no encontrado'},
-                status=status.HTTP_404_NOT_FOUND
+                {'error': 'veterinarian_id inválido'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obtener bloques de tiempo disponibles
-        time_slots = TimeSlot.objects.filter(
+        # 304 si el cliente ya tiene la versión actual del mes
+        version = calendar_cache.month_version(year, month, veterinarian_id)
+        return conditional_response(
+            request,
+            version,
+            lambda: self._calendar_response(veterinarian_id, first_day, last_day),
+            last_modified=version / 1e9
+        )
+    
+    def _calendar_response(self, veterinarian_id, first_day, last_day):
+        # Servir desde caché; se invalida al escribir bloques o citas del mes
+        calendar_data = calendar_cache.get_month('public', first_day.year, first_day.month, veterinarian_id)
+        if calendar_data is None:
+            try:
+                veterinarian = User.objects.get(id=veterinarian_id, role='VETERINARIO', is_active=True)
+            except User.DoesNotExist:
+                return Response(
+                    {'error': 'Veterinario no encontrado'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            calendar_data = self._build_calendar(veterinarian, first_day, last_day)
+            calendar_cache.set_month('public', first_day.year, first_day.month, veterinarian_id, calendar_data)
+        
+        return Response({
+            'calendar': calendar_data
+        }, status=status.HTTP_200_OK)
+    
+    def _build_calendar(self, veterinarian, first_day, last_day):
+        """Arma el calendario de disponibilidad del veterinario para el rango dado"""
+        # Solo se listan días con bloques libres: si el índice no encuentra ninguno, no consultar
+        covered = availability_index.covers(first_day) and availability_index.covers(last_day)
+        if covered and not availability_index.free_days(first_day.year, first_day.month, veterinarian.id):
+            return []
+        
+        # Obtener bloques de tiempo (los ocupados solo se usan para ocultar sus bloques virtuales)
+        time_slots = list(TimeSlot.objects.filter(
             veterinarian=veterinarian,
             date__gte=first_day,
-            date__lte=last_day,
-            is_available=True
-        ).order_by('date', 'start_time')
+            date__lte=last_day
+        ).order_by('date', 'start_time'))
+        virtual_slots = expand_virtual_slots(
+            first_day,
+            last_day,
+            [veterinarian.id],
+            materialized={(slot.veterinarian_id, slot.date, slot.start_time) for slot in time_slots}
+        )
+        time_slots = sorted(
+            [slot for slot in time_slots if slot.is_available] + virtual_slots,
+            key=lambda slot: (slot.date, slot.start_time)
+        )
         
         # Agrupar por fecha
         dates_dict = {}
@@ -588,8 +700,8 @@ class VeterinarianAvailabilityPublicView(APIView):
         # Obtener citas ocupadas
         appointments = Appointment.objects.filter(
             veterinarian=veterinarian,
-            appointment_date__gte=first_day,
-            appointment_date__lte=last_day,
+            starts_at__gte=local_datetime(first_day, time.min),
+            starts_at__lt=local_datetime(last_day + timedelta(days=1), time.min),
             status__in=['CONFIRMADA', 'PENDIENTE']
         )
         
@@ -602,19 +714,21 @@ class VeterinarianAvailabilityPublicView(APIView):
                     'status': appointment.status
                 })
         
+        veterinarian_name = veterinarian.get_full_name()
         calendar_data = []
         for date_str, date_data in dates_dict.items():
             calendar_data.append({
                 'veterinarian_id': veterinarian.id,
-                'veterinarian_name': veterinarian.get_full_name(),
+                'veterinarian_name': veterinarian_name,
                 'date': date_data['date'].isoformat(),
-                'available_slots': TimeSlotSerializer(date_data['available_slots'], many=True).data,
+                'available_slots': [
+                    serialize_time_slot(slot, veterinarian_name)
+                    for slot in date_data['available_slots']
+                ],
                 'occupied_slots': date_data['occupied_slots']
             })
         
-        return Response({
-            'calendar': calendar_data
-        }, status=status.HTTP_200_OK)
+        return calendar_data
 
 
 class VeterinarianAvailabilityView(APIView):
@@ -643,21 +757,142 @@ class VeterinarianAvailabilityView(APIView):
         else:
             target_date = timezone.now().date()
         
-        # Obtener bloques disponibles
-        available_slots = TimeSlot.objects.filter(
-            veterinarian=veterinarian,
-            date=target_date,
-            is_available=True
-        ).order_by('start_time')
+        # Obtener bloques disponibles, guardados y virtuales
+        # (sin consultar si el índice indica que el día está completo)
+        available_slots = []
+        if not availability_index.covers(target_date) or availability_index.free_times(veterinarian.id, target_date):
+            time_slots = list(TimeSlot.objects.filter(veterinarian=veterinarian, date=target_date))
+            virtual_slots = expand_virtual_slots(
+                target_date,
+                target_date,
+                [veterinarian.id],
+                materialized={(slot.veterinarian_id, slot.date, slot.start_time) for slot in time_slots}
+            )
+            available_slots = sorted(
+                [slot for slot in time_slots if slot.is_available] + virtual_slots,
+                key=lambda slot: slot.start_time
+            )
+        veterinarian_name = veterinarian.get_full_name()
         
-        serializer = TimeSlotSerializer(available_slots, many=True)
+        # Próximo bloque libre desde la fecha consultada (o desde ahora si es hoy)
+        moment = max(datetime.combine(target_date, datetime.min.time()), timezone.localtime().replace(tzinfo=None))
+        next_available = availability_index.first_free_after(veterinarian.id, moment)
         
         return Response({
             'veterinarian': {
                 'id': veterinarian.id,
-                'name': veterinarian.get_full_name()
+                'name': veterinarian_name
             },
             'date': target_date,
-            'available_slots': serializer.data
+            'available_slots': [serialize_time_slot(slot, veterinarian_name) for slot in available_slots],
+            'next_available': {
+                'date': next_available[0],
+                'start_time': next_available[1].strftime('%H:%M')
+            } if next_available else None
         }, status=status.HTTP_200_OK)
 
+
+class AvailableDaysView(APIView):
+    """
+    Vista pública con los días del mes (desde hoy) que tienen bloques libres,
+    de un veterinario o de cualquiera. Se responde desde el índice de disponibilidad.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            month = int(request.query_params.get('month', timezone.now().month))
+            veterinarian_id = request.query_params.get('veterinarian_id')
+            veterinarian_id = int(veterinarian_id) if veterinarian_id else None
+        except ValueError:
+            return Response(
+                {'error': 'Parámetros inválidos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if month < 1 or month > 12:
+            return Response(
+                {'error': 'El mes debe estar entre 1 y 12'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'year': year,
+            'month': month,
+            'veterinarian_id': veterinarian_id,
+            'days': availability_index.free_days(year, month, veterinarian_id)
+        }, status=status.HTTP_200_OK)
+
+
+
+
+class DashboardView(APIView):
+    """
+    Vista agregada para el panel principal según el rol del usuario.
+    Devuelve mascotas, próximas citas, fichas médicas recientes y estadísticas
+    en una sola respuesta, con una cantidad fija de consultas.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    upcoming_limit = 5
+    records_limit = 50
+    
+    def get(self, request):
+        user = request.user
+        today = timezone.localdate()
+        
+        # Filtrar según el rol (mismas reglas que las vistas de listado)
+        if user.role == 'CLIENTE':
+            pets = Pet.objects.filter(owner=user, is_active=True)
+            appointments = Appointment.objects.filter(client=user)
+            records = MedicalRecord.objects.filter(pet__owner=user)
+        elif user.role == 'VETERINARIO':
+            pets = Pet.objects.filter(is_active=True)
+            appointments = Appointment.objects.filter(veterinarian=user)
+            records = MedicalRecord.objects.filter(veterinarian=user)
+        else:
+            pets = Pet.objects.filter(is_active=True)
+            appointments = Appointment.objects.all()
+            records = MedicalRecord.objects.all()
+        
+        # Los veterinarios ven solo sus citas confirmadas; el resto, todas las no canceladas
+        if user.role == 'VETERINARIO':
+            upcoming = appointments.filter(status='CONFIRMADA')
+        else:
+            upcoming = appointments.exclude(status='CANCELADA')
+        today_start = local_datetime(today, time.min)
+        tomorrow_start = local_datetime(today + timedelta(days=1), time.min)
+        upcoming = upcoming.filter(
+            starts_at__gte=today_start
+        ).select_related(
+            'pet__owner', 'client', 'veterinarian'
+        ).order_by('starts_at')[:self.upcoming_limit]
+        
+        recent_records = records.select_related(
+            'pet__owner', 'veterinarian'
+        ).order_by('-visit_date')[:self.records_limit]
+        
+        appointment_stats = appointments.aggregate(
+            today=Count('id', filter=Q(starts_at__gte=today_start, starts_at__lt=tomorrow_start)),
+            pending=Count('id', filter=Q(status='PENDIENTE'))
+        )
+        
+        # Los clientes reciben sus mascotas; el personal solo el total
+        pets_data = []
+        if user.role == 'CLIENTE':
+            pets_data = PetSerializer(pets.select_related('owner'), many=True).data
+            pets_count = len(pets_data)
+        else:
+            pets_count = pets.count()
+        
+        return Response({
+            'role': user.role,
+            'pets': pets_data,
+            'upcoming_appointments': AppointmentSerializer(upcoming, many=True).data,
+            'recent_medical_records': DashboardMedicalRecordSerializer(recent_records, many=True).data,
+            'stats': {
+                'today_appointments': appointment_stats['today'],
+                'pending_appointments': appointment_stats['pending'],
+                'pets': pets_count
+            }
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,174 @@
+"""
+Bloques virtuales calculados desde los horarios recurrentes (AvailabilityRule).
+
+Un bloque virtual es un horario libre que aún no existe como TimeSlot. Se
+identifica con un id negativo que codifica (veterinario, fecha, hora de inicio)
+para que los clientes puedan reservarlo igual que un bloque guardado:
+find_time_slot() lo busca sin escribir nada y, ya dentro de la transacción que
+lo reserva, materialize_time_slot() lo guarda como TimeSlot.
+Un TimeSlot existente siempre tiene prioridad sobre el bloque virtual del
+mismo horario.
+"""
+
+from collections import defaultdict
+from datetime import date, time
+
+from django.db.models import Q
+
+from .models import TimeSlot, AvailabilityRule, AvailabilityException
+from .schedules import expand_weekly_template
+
+
+# id virtual = -(veterinario * 10^12 + AAAAMMDD * 10^4 + HHMM); cabe en un entero seguro de JavaScript
+_VETERINARIAN_FACTOR = 10 ** 12
+_DATE_FACTOR = 10 ** 4
+
+
+def virtual_slot_id(veterinarian_id, day, start_time):
+    """Id negativo que identifica un bloque virtual"""
+    day_number = day.year * 10000 + day.month * 100 + day.day
+    time_number = start_time.hour * 100 + start_time.minute
+    return -(veterinarian_id * _VETERINARIAN_FACTOR + day_number * _DATE_FACTOR + time_number)
+
+
+def parse_virtual_slot_id(pk):
+    """(veterinario, fecha, hora de inicio) de un id virtual, o None si no lo es"""
+    if pk >= 0:
+        return None
+    veterinarian_id, rest = divmod(-pk, _VETERINARIAN_FACTOR)
+    day_number, time_number = divmod(rest, _DATE_FACTOR)
+    try:
+        return (
+            veterinarian_id,
+            date(day_number // 10000, day_number // 100 % 100, day_number % 100),
+            time(time_number // 100, time_number % 100)
+        )
+    except ValueError:
+        return None
+
+
+class VirtualSlot:
+    """Bloque libre calculado desde un horario recurrente, con los mismos atributos de lectura que TimeSlot"""
+    is_available = True
+    is_virtual = True
+    created_at = None
+    updated_at = None
+
+    def __init__(self, veterinarian, date, start_time, end_time):
+        self.veterinarian = veterinarian
+        self.veterinarian_id = veterinarian.id
+        self.date = date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.id = self.pk = virtual_slot_id(veterinarian.id, date, start_time)
+
+
+def expand_virtual_slots(first_day, last_day, veterinarian_ids=None, materialized=None):
+    """
+    Bloques virtuales de veterinarios activos entre first_day y last_day.
+    `materialized` es el conjunto de (veterinario, fecha, hora de inicio) que ya
+    existen como TimeSlot; si no se indica se consulta cuando hay bloques virtuales.
+    Sin horarios recurrentes cuesta una sola consulta.
+    Retorna los bloques ordenados por fecha, hora y veterinario.
+    """
+    rules = AvailabilityRule.objects.filter(
+        is_active=True,
+        veterinarian__role='VETERINARIO',
+        veterinarian__is_active=True
+    ).filter(
+        Q(valid_from__isnull=True) | Q(valid_from__lte=last_day),
+        Q(valid_until__isnull=True) | Q(valid_until__gte=first_day)
+    ).select_related('veterinarian')
+    if veterinarian_ids is not None:
+        rules = rules.filter(veterinarian_id__in=veterinarian_ids)
+    rules = list(rules)
+    if not rules:
+        return []
+
+    exceptions = defaultdict(list)
+    for exception in AvailabilityException.objects.filter(
+        veterinarian_id__in={rule.veterinarian_id for rule in rules},
+        date__gte=first_day,
+        date__lte=last_day
+    ):
+        exceptions[(exception.veterinarian_id, exception.date)].append(exception)
+
+    slots = {}
+    for rule in rules:
+        rule_start = max(first_day, rule.valid_from or first_day)
+        rule_end = min(last_day, rule.valid_until or last_day)
+        if rule_start > rule_end:
+            continue
+        for day, start_time, end_time in expand_weekly_template(
+            {rule.weekday: [(rule.start_time, rule.end_time)]},
+            rule_start,
+            (rule_end - rule_start).days + 1,
+            rule.slot_minutes
+        ):
+            key = (rule.veterinarian_id, day, start_time)
+            if key in slots:
+                continue
+            if any(exception.covers(start_time, end_time) for exception in exceptions[(rule.veterinarian_id, day)]):
+                continue
+            slots[key] = VirtualSlot(rule.veterinarian, day, start_time, end_time)
+
+    if materialized is None and slots:
+        materialized = TimeSlot.objects.filter(
+            veterinarian_id__in={rule.veterinarian_id for rule in rules},
+            date__gte=first_day,
+            date__lte=last_day
+        ).values_list('veterinarian_id', 'date', 'start_time')
+    for key in set(materialized or ()):
+        slots.pop(key, None)
+
+    return sorted(slots.values(), key=lambda slot: (slot.date, slot.start_time, slot.veterinarian_id))
+
+
+def find_time_slot(pk):
+    """
+    TimeSlot correspondiente a un id de bloque, sin escribir en la base de datos.
+    Para un id virtual retorna el TimeSlot guardado del mismo horario o, si no
+    existe, el VirtualSlot (si el horario recurrente sigue vigente).
+    Lanza TimeSlot.DoesNotExist si el bloque no existe.
+    """
+    key = parse_virtual_slot_id(pk)
+    if key is None:
+        return TimeSlot.objects.select_related('veterinarian').get(pk=pk)
+
+    veterinarian_id, day, start_time = key
+    existing = TimeSlot.objects.filter(
+        veterinarian_id=veterinarian_id,
+        date=day,
+        start_time=start_time
+    ).select_related('veterinarian').first()
+    if existing:
+        return existing
+
+    virtual = next(
+        (slot for slot in expand_virtual_slots(day, day, [veterinarian_id], materialized=())
+         if slot.start_time == start_time),
+        None
+    )
+    if virtual is None:
+        raise TimeSlot.DoesNotExist('El bloque virtual no corresponde a un horario vigente.')
+    return virtual
+
+
+def materialize_time_slot(time_slot):
+    """
+    Guarda un VirtualSlot como TimeSlot libre para que la reserva use el mismo
+    camino que un bloque guardado; los TimeSlot se retornan sin cambios. Debe
+    llamarse dentro de la transacción que reserva el bloque: si la reserva falla
+    no queda un bloque materializado.
+    """
+    if not getattr(time_slot, 'is_virtual', False):
+        return time_slot
+
+    # get_or_create tolera que otra petición materialice el mismo bloque en paralelo
+    materialized, _ = TimeSlot.objects.get_or_create(
+        veterinarian_id=time_slot.veterinarian_id,
+        date=time_slot.date,
+        start_time=time_slot.start_time,
+        defaults={'end_time': time_slot.end_time, 'is_available': True}
+    )
+    return materialized
@@ -0,0 +1,179 @@
+"""
+Cola de prioridad en memoria de la lista de espera.
+
+Por cada veterinario preferido (y una cola general para las entradas sin
+preferencia) guarda un heap de (prioridad, fecha de creación, id) con las
+entradas activas y sin contactar. Cuando se libera un bloque, la mejor entrada
+se obtiene comparando el tope de la cola del veterinario con el de la cola
+general, sin recorrer la tabla WaitingList.
+
+Igual que el índice de disponibilidad, se arma de forma perezosa en el primer
+uso, signals.py lo mantiene al día al confirmar cada transacción y una versión
+compartida en el caché fuerza la reconstrucción cuando otro proceso modifica
+la lista. Las entradas que cambian se reemplazan sin sacarlas del heap: una
+entrada del heap es válida solo si coincide con la registrada en `_entries`.
+
+La cola es orientativa: la oferta de un bloque se confirma con un UPDATE
+condicional sobre la entrada (offer_time_slot en services.py).
+"""
+
+import heapq
+import threading
+import time as time_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import WaitingList
+
+
+VERSION_KEY = 'waiting_list:version'
+
+
+def _waiting(entry):
+    """True si la entrada debe estar en la cola (activa y sin contactar)"""
+    return entry.is_active and not entry.contacted
+
+
+class WaitingQueue:
+    """Heaps de entradas de la lista de espera por veterinario preferido"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._heaps = {}
+        self._entries = {}
+        self._version = None
+        self._built_at = None
+
+    # Construcción y frescura
+
+    def _shared_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time_module.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def rebuild(self):
+        """Reconstruye las colas desde WaitingList"""
+        with self._lock:
+            version = self._shared_version()
+            heaps, entries = {}, {}
+            rows = WaitingList.objects.filter(is_active=True, contacted=False).values_list(
+                'id', 'preferred_veterinarian_id', 'priority', 'created_at'
+            )
+            for entry_id, veterinarian_id, priority, created_at in rows.iterator(chunk_size=5000):
+                key = (priority, created_at, entry_id)
+                entries[entry_id] = (veterinarian_id, key)
+                heaps.setdefault(veterinarian_id, []).append(key)
+            for heap in heaps.values():
+                heapq.heapify(heap)
+            self._heaps = heaps
+            self._entries = entries
+            self._version = version
+            self._built_at = time_module.monotonic()
+
+    def invalidate(self):
+        """Marca las colas para reconstruirlas en el próximo uso (en todos los procesos)"""
+        with self._lock:
+            self._built_at = None
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                pass
+
+    def _ensure_fresh(self):
+        if (
+            self._built_at is None
+            or time_module.monotonic() - self._built_at > settings.WAITING_LIST_QUEUE_MAX_AGE
+            or self._shared_version() != self._version
+        ):
+            self.rebuild()
+
+    def apply(self, changes):
+        """
+        Aplica cambios confirmados: iterable de (id, veterinario preferido, prioridad,
+        fecha de creación, en espera). Si otro proceso modificó la lista desde la
+        última sincronización, las colas se reconstruyen en el próximo uso.
+        """
+        with self._lock:
+            try:
+                version = cache.incr(VERSION_KEY)
+            except ValueError:
+                version = None
+
+            if self._built_at is None or version is None or version != self._version + 1:
+                self._built_at = None
+                return
+
+            self._version = version
+            for entry_id, veterinarian_id, priority, created_at, waiting in changes:
+                if not waiting:
+                    self._entries.pop(entry_id, None)
+                    continue
+                key = (priority, created_at, entry_id)
+                if self._entries.get(entry_id) == (veterinarian_id, key):
+                    continue
+                self._entries[entry_id] = (veterinarian_id, key)
+                heapq.heappush(self._heaps.setdefault(veterinarian_id, []), key)
+
+    # Consultas
+
+    def _pop_valid(self, veterinarian_id):
+        """Saca el tope válido del heap del veterinario, descartando entradas reemplazadas"""
+        heap = self._heaps.get(veterinarian_id)
+        while heap:
+            key = heapq.heappop(heap)
+            if self._entries.get(key[2]) == (veterinarian_id, key):
+                return key
+        return None
+
+    def best(self, veterinarian_id, count=1):
+        """
+        Ids de las `count` mejores entradas para un bloque del veterinario: las que
+        lo prefieren y las que no tienen preferencia, por (prioridad, antigüedad).
+        """
+        with self._lock:
+            self._ensure_fresh()
+            queues = [veterinarian_id, None] if veterinarian_id is not None else [None]
+            taken = {queue: [] for queue in queues}
+            heads = {queue: self._pop_valid(queue) for queue in queues}
+            result = []
+            while len(result) < count:
+                available = [(key, queue) for queue, key in heads.items() if key is not None]
+                if not available:
+                    break
+                key, queue = min(available)
+                result.append(key[2])
+                taken[queue].append(key)
+                heads[queue] = self._pop_valid(queue)
+
+            # Devolver al heap lo que se sacó para mirar
+            for queue, keys in taken.items():
+                for key in keys + ([heads[queue]] if heads[queue] else []):
+                    heapq.heappush(self._heaps[queue], key)
+        return result
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._entries)
+
+
+waiting_queue = WaitingQueue()
+
+
+def apply_on_commit(entries):
+    """Actualiza la cola con las entradas indicadas cuando se confirma la transacción actual"""
+    changes = [
+        (entry.id, entry.preferred_veterinarian_id, entry.priority, entry.created_at, _waiting(entry))
+        for entry in entries
+    ]
+    transaction.on_commit(lambda: waiting_queue.apply(changes))
+
+
+def remove_on_commit(entry_ids):
+    """Quita entradas de la cola cuando se confirma la transacción actual"""
+    changes = [(entry_id, None, None, None, False) for entry_id in entry_ids]
+    transaction.on_commit(lambda: waiting_queue.apply(changes))
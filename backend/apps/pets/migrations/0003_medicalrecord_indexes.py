@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0002_preregisteredpet'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pet',
+            name='species',
+            field=models.CharField(choices=[('PERRO', 'Perro'), ('GATO', 'Gato')], max_length=20, verbose_name='Especie'),
+        ),
+        migrations.AlterField(
+            model_name='preregisteredpet',
+            name='species',
+            field=models.CharField(choices=[('PERRO', 'Perro'), ('GATO', 'Gato')], max_length=20, verbose_name='Especie'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['pet', '-visit_date'], name='medrecord_pet_visit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['veterinarian', '-visit_date'], name='medrecord_vet_visit_idx'),
+        ),
+    ]
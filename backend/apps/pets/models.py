@@ -195,6 +195,11 @@ class MedicalRecord(models.Model):
         verbose_name = 'Ficha Médica'
         verbose_name_plural = 'Fichas Médicas'
         ordering = ['-visit_date']
+        indexes = [
+            # Historial de una mascota y fichas de un veterinario, más recientes primero
+            models.Index(fields=['pet', '-visit_date'], name='medrecord_pet_visit_idx'),
+            models.Index(fields=['veterinarian', '-visit_date'], name='medrecord_vet_visit_idx'),
+        ]
     
     def __str__(self):
         return f"Ficha de {self.pet.name} - {self.visit_date.strftime('%d/%m/%Y')}"
@@ -107,6 +107,14 @@ class MedicalRecordSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'visit_date', 'created_at', 'updated_at')
 
 
+class DashboardMedicalRecordSerializer(MedicalRecordSerializer):
+    """Ficha médica con el nombre del dueño, para el panel principal"""
+    owner_name = serializers.CharField(source='pet.owner.get_full_name', read_only=True)
+    
+    class Meta(MedicalRecordSerializer.Meta):
+        fields = MedicalRecordSerializer.Meta.fields + ('owner_name',)
+
+
 class MedicalRecordCreateSerializer(serializers.ModelSerializer):
     """Serializer para crear fichas médicas"""
     
@@ -2,6 +2,8 @@ from rest_framework import generics, permissions, filters, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count, Max
+from functools import partial
 from .models import Pet, MedicalRecord, PreRegisteredPet
 from .serializers import (
     PetSerializer, 
@@ -10,6 +12,8 @@ from .serializers import (
     MedicalRecordCreateSerializer,
     PreRegisteredPetSerializer
 )
+from veterinaria_pochita.conditional import conditional_response
+from veterinaria_pochita.pagination import KeysetPagination
 
 
 class PetListCreateView(generics.ListCreateAPIView):
@@ -30,10 +34,10 @@ class PetListCreateView(generics.ListCreateAPIView):
         
         # Los clientes solo ven sus propias mascotas
         if user.role == 'CLIENTE':
-            return Pet.objects.filter(owner=user, is_active=True)
+            return Pet.objects.select_related('owner').filter(owner=user, is_active=True)
         
         # Recepcionistas y veterinarios ven todas las mascotas
-        return Pet.objects.filter(is_active=True)
+        return Pet.objects.select_related('owner').filter(is_active=True)
     
     def perform_create(self, serializer):
         # Asignar el owner automáticamente al usuario autenticado
@@ -51,14 +55,15 @@ class PetDetailView(generics.RetrieveUpdateDestroyAPIView):
         
         # Los clientes solo pueden acceder a sus propias mascotas
         if user.role == 'CLIENTE':
-            return Pet.objects.filter(owner=user)
+            return Pet.objects.select_related('owner').filter(owner=user)
         
         # Recepcionistas y veterinarios pueden acceder a todas
-        return Pet.objects.all()
+        return Pet.objects.select_related('owner')
 
 
 class MedicalRecordListCreateView(generics.ListCreateAPIView):
     """Vista para listar y crear fichas médicas"""
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     search_fields = ['pet__name', 'reason', 'diagnosis']
@@ -75,14 +80,14 @@ class MedicalRecordListCreateView(generics.ListCreateAPIView):
         
         # Los clientes solo ven las fichas de sus mascotas
         if user.role == 'CLIENTE':
-            return MedicalRecord.objects.filter(pet__owner=user)
+            return MedicalRecord.objects.select_related('pet', 'veterinarian').filter(pet__owner=user)
         
         # Veterinarios ven las fichas que han creado
         if user.role == 'VETERINARIO':
-            return MedicalRecord.objects.filter(veterinarian=user)
+            return MedicalRecord.objects.select_related('pet', 'veterinarian').filter(veterinarian=user)
         
         # Recepcionistas ven todas
-        return MedicalRecord.objects.all()
+        return MedicalRecord.objects.select_related('pet', 'veterinarian')
 
 
 class MedicalRecordDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -95,18 +100,19 @@ class MedicalRecordDetailView(generics.RetrieveUpdateDestroyAPIView):
         
         # Los clientes solo pueden ver fichas de sus mascotas
         if user.role == 'CLIENTE':
-            return MedicalRecord.objects.filter(pet__owner=user)
+            return MedicalRecord.objects.select_related('pet', 'veterinarian').filter(pet__owner=user)
         
         # Veterinarios solo pueden ver/editar sus propias fichas
         if user.role == 'VETERINARIO':
-            return MedicalRecord.objects.filter(veterinarian=user)
+            return MedicalRecord.objects.select_related('pet', 'veterinarian').filter(veterinarian=user)
         
         # Recepcionistas pueden ver todas
-        return MedicalRecord.objects.all()
+        return MedicalRecord.objects.select_related('pet', 'veterinarian')
 
 
 class PetMedicalHistoryView(generics.ListAPIView):
     """Vista para obtener el historial médico completo de una mascota"""
+    pagination_class = KeysetPagination
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -116,9 +122,16 @@ class PetMedicalHistoryView(generics.ListAPIView):
         
         # Verificar permisos de acceso
         if user.role == 'CLIENTE':
-            return MedicalRecord.objects.filter(pet_id=pet_id, pet__owner=user)
+            return MedicalRecord.objects.select_related('pet', 'veterinarian').filter(pet_id=pet_id, pet__owner=user)
         
-        return MedicalRecord.objects.filter(pet_id=pet_id)
+        return MedicalRecord.objects.select_related('pet', 'veterinarian').filter(pet_id=pet_id)
+    
+    def list(self, request, *args, **kwargs):
+        # 304 si no cambió ninguna ficha ni el nombre de la mascota o de sus veterinarios
+        version = self.get_queryset().aggregate(
+            Max('updated_at'), Max('pet__updated_at'), Max('veterinarian__updated_at'), Count('id')
+        )
+        return conditional_response(request, version, partial(super().list, request, *args, **kwargs), private=True)
 
 
 class PreRegisterPetView(generics.CreateAPIView):
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Product, ProductReservation, Sale, SaleItem
+from .models import Product, ProductReservation, Sale, SaleItem, StockMovement
+from .inventory import apply_movements
 
 
 @admin.register(Product)
@@ -7,7 +8,8 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'min_stock', 'is_low_stock', 'is_active')
     list_filter = ('category', 'is_active')
     search_fields = ('name', 'sku', 'barcode')
-    readonly_fields = ('created_at', 'updated_at')
+    # El stock se modifica con movimientos de inventario
+    readonly_fields = ('stock', 'created_at', 'updated_at')
     
     fieldsets = (
         ('Información Básica', {
@@ -32,6 +34,26 @@ class ProductAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kind', 'quantity', 'sale', 'reservation', 'created_by', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name', 'product__sku', 'note')
+    fields = ('product', 'kind', 'quantity', 'note')
+    
+    # Libro de solo inserción: los movimientos no se editan ni se eliminan
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def save_model(self, request, obj, form, change):
+        # Registrar el movimiento y aplicarlo al stock del producto
+        obj.created_by = request.user
+        apply_movements([obj])
+
+
 @admin.register(ProductReservation)
 class ProductReservationAdmin(admin.ModelAdmin):
     list_display = ('client', 'product', 'quantity', 'status', 'priority', 'reserved_at')
@@ -54,6 +76,12 @@ class SaleAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     inlines = [SaleItemInline]
     
+    def get_readonly_fields(self, request, obj=None):
+        # El total ya sumado a SalesTotal no se edita (para corregirlo, eliminar la venta)
+        if obj is not None:
+            return self.readonly_fields + ('total_amount',)
+        return self.readonly_fields
+    
     fieldsets = (
         ('Información de la Venta', {
             'fields': ('client', 'receptionist', 'payment_method')
@@ -5,4 +5,7 @@ class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.products'
     verbose_name = 'Productos'
-
+    
+    def ready(self):
+        # Registrar señales de totales de ventas e invalidación de estadísticas
+        from . import signals  # noqa: F401
@@ -0,0 +1,89 @@
+"""
+Inventario: libro de movimientos (StockMovement) y stock materializado.
+
+Cada cambio de stock se registra como movimientos de solo inserción y se aplica
+a Product.stock en la misma transacción con un UPDATE atómico por producto
+(stock = stock + suma de sus movimientos; condicional si resta). Los movimientos
+se insertan primero y los UPDATE van al final, en orden de id: la fila del
+producto queda bloqueada solo desde su UPDATE hasta el commit, por lo que las
+ventas simultáneas del mismo producto se serializan el menor tiempo posible y
+no se interbloquean. Una venta con varias líneas del mismo producto hace un
+solo UPDATE para ese producto.
+
+rebuild_stock() recalcula Product.stock desde el libro con una sola consulta
+agregada (comando rebuild_stock).
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Product, StockMovement
+from . import stats
+
+
+def apply_movements(movements, error_field='stock'):
+    """
+    Registra `movements` (StockMovement sin guardar) con bulk_create y suma sus
+    cantidades al stock de cada producto. Si una salida dejaría un stock negativo
+    se lanza ValidationError en `error_field` y no se registra nada.
+    Retorna {id del producto: variación aplicada}.
+    """
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.product_id] += movement.quantity
+
+    # Sin savepoint: dentro de una venta, un error revierte la transacción completa
+    with transaction.atomic(savepoint=False):
+        StockMovement.objects.bulk_create(movements)
+
+        now = timezone.now()
+        for product_id in sorted(deltas):
+            delta = deltas[product_id]
+            if not delta:
+                continue
+            products = Product.objects.filter(pk=product_id)
+            if delta < 0:
+                products = products.filter(stock__gte=-delta)
+            if not products.update(stock=F('stock') + delta, updated_at=now):
+                product = Product.objects.only('name', 'stock').get(pk=product_id)
+                raise serializers.ValidationError({
+                    error_field: [f"Stock insuficiente para {product.name}. Disponible: {product.stock}"]
+                })
+
+    # update() no emite señales: el stock bajo de las estadísticas puede haber cambiado
+    stats.invalidate()
+    return dict(deltas)
+
+
+def rebuild_stock(dry_run=False, batch_size=500):
+    """
+    Recalcula Product.stock como la suma de sus movimientos, con una sola consulta
+    agregada sobre el libro. Retorna {id del producto: (stock guardado, stock según
+    el libro)} de los productos que no coincidían; con dry_run solo los informa.
+    """
+    with transaction.atomic():
+        # Bloquear los productos evita que una venta se confirme entre la suma y la corrección
+        stored = dict(Product.objects.select_for_update().values_list('id', 'stock'))
+        totals = dict(
+            StockMovement.objects.order_by().values_list('product_id').annotate(total=Sum('quantity'))
+        )
+        drift = {
+            product_id: (stock, totals.get(product_id, 0))
+            for product_id, stock in stored.items()
+            if stock != totals.get(product_id, 0)
+        }
+
+        if drift and not dry_run:
+            now = timezone.now()
+            Product.objects.bulk_update(
+                [Product(pk=product_id, stock=total, updated_at=now) for product_id, (_, total) in drift.items()],
+                ['stock', 'updated_at'],
+                batch_size=batch_size
+            )
+            stats.invalidate()
+
+    return drift
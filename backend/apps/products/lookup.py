@@ -0,0 +1,124 @@
+"""
+Búsqueda exacta de productos por código de barras o SKU (lector del mostrador).
+
+Guarda en memoria, por proceso, un LRU acotado de PRODUCT_LOOKUP_CACHE_SIZE
+códigos con una foto del producto (id, nombre, categoría, precio, SKU y código
+de barras), incluidos los códigos sin producto para que un código desconocido
+escaneado varias veces no vuelva a consultar la base de datos. Un acierto no
+hace consultas. La foto no incluye el stock: cambia con cada venta y el
+caché se vaciaría en cada una; la venta valida el stock de todas formas.
+
+signals.py vacía el LRU al confirmarse cualquier cambio de productos. Una
+versión compartida en el caché detecta los cambios hechos por otros procesos;
+se lee como máximo una vez cada PRODUCT_LOOKUP_VERSION_INTERVAL segundos y no
+en cada acierto, que así no paga el acceso al caché (con locmem, un lock y un
+pickle por llamada). PRODUCT_LOOKUP_MAX_AGE limita la antigüedad cuando el
+caché no se comparte entre procesos (locmem).
+"""
+
+import threading
+import time as time_module
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Product
+
+
+VERSION_KEY = 'product_lookup:version'
+
+SNAPSHOT_FIELDS = ('id', 'name', 'category', 'price', 'sku', 'barcode')
+
+
+def load_snapshot(code):
+    """Foto del producto activo cuyo código de barras (o si no, SKU) es `code`, o None"""
+    rows = list(
+        Product.objects.filter(Q(barcode=code) | Q(sku=code), is_active=True)
+        .order_by('pk').values(*SNAPSHOT_FIELDS)
+    )
+    if not rows:
+        return None
+    snapshot = next((row for row in rows if row['barcode'] == code), rows[0])
+    # Mismo formato que ProductSerializer
+    snapshot['price'] = str(snapshot['price'])
+    return snapshot
+
+
+class ProductLookupCache:
+    """LRU de fotos de productos por código escaneado"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._built_at = None
+        self._checked_at = None
+
+    def _shared_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time_module.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _ensure_fresh(self):
+        now = time_module.monotonic()
+        if self._built_at is None or now - self._built_at > settings.PRODUCT_LOOKUP_MAX_AGE:
+            self._entries.clear()
+            self._version = self._shared_version()
+            self._built_at = self._checked_at = now
+            return
+
+        # Cambios de otros procesos: revisar la versión compartida solo una vez por intervalo
+        if now - self._checked_at >= settings.PRODUCT_LOOKUP_VERSION_INTERVAL:
+            self._checked_at = now
+            version = self._shared_version()
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+                self._built_at = now
+
+    def get(self, code):
+        """Foto del producto con el código `code` (None si no existe), desde el LRU si está"""
+        with self._lock:
+            self._ensure_fresh()
+            if code in self._entries:
+                self._entries.move_to_end(code)
+                return self._entries[code]
+            version = self._version
+
+        snapshot = load_snapshot(code)
+
+        with self._lock:
+            # Si el LRU se vació durante la consulta, la foto puede ser anterior al cambio
+            if self._version == version:
+                self._entries[code] = snapshot
+                if len(self._entries) > settings.PRODUCT_LOOKUP_CACHE_SIZE:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self):
+        """Vacía el LRU (en todos los procesos)"""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._built_at = None
+            self._checked_at = None
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+product_lookup = ProductLookupCache()
+
+
+def invalidate():
+    """Vacía el LRU al confirmarse la transacción actual"""
+    transaction.on_commit(product_lookup.invalidate)
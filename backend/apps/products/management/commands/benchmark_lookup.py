@@ -0,0 +1,100 @@
+"""
+Comando de Django para medir la búsqueda de productos por código escaneado
+Ejecutar con: python manage.py benchmark_lookup [--products 10000] [--repeat 2000]
+
+Crea productos temporales (SKU "BENCH-LOOKUP-*") con código de barras, mide la
+latencia de product_lookup.get() con el LRU vacío (consulta a la base de
+datos) y con el código ya en el LRU, y la de GET /api/products/lookup/ en ambos
+casos junto a la búsqueda anterior con ?search= (icontains). Luego elimina los
+productos creados.
+"""
+
+import random
+import statistics
+import time as time_module
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from apps.products.lookup import product_lookup
+from apps.products.models import Product
+
+
+PREFIX = 'BENCH-LOOKUP-'
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return statistics.median(timings), p99
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de la búsqueda por código de barras con y sin el LRU en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Productos temporales a crear')
+        parser.add_argument('--repeat', type=int, default=2000, help='Búsquedas por caso')
+
+    def _measure(self, label, call, codes, before=None):
+        timings = []
+        for code in codes:
+            if before:
+                before()
+            started = time_module.perf_counter()
+            call(code)
+            timings.append((time_module.perf_counter() - started) * 1000)
+        median, p99 = _summary(timings)
+        self.stdout.write(f'{label:<45} {median:>9.3f}ms {p99:>9.3f}ms')
+
+    def handle(self, *args, **options):
+        if Product.objects.filter(sku__startswith=PREFIX).exists():
+            raise CommandError('Ya existen productos de benchmark; elimínelos antes de medir')
+        if options['products'] > settings.PRODUCT_LOOKUP_CACHE_SIZE:
+            self.stdout.write(
+                f'Aviso: más productos que PRODUCT_LOOKUP_CACHE_SIZE ({settings.PRODUCT_LOOKUP_CACHE_SIZE}); '
+                'los aciertos se miden sobre una muestra que cabe en el LRU'
+            )
+
+        rng = random.Random(42)
+        Product.objects.bulk_create([
+            Product(name=f'Producto lookup {i}', category='OTRO', price=Decimal('1990'),
+                    sku=f'{PREFIX}{i}', barcode=f'990{i:010d}')
+            for i in range(options['products'])
+        ], batch_size=5000)
+
+        try:
+            barcodes = list(Product.objects.filter(sku__startswith=PREFIX).values_list('barcode', flat=True))
+            hits = rng.sample(barcodes, min(len(barcodes), settings.PRODUCT_LOOKUP_CACHE_SIZE, options['repeat']))
+            codes = [rng.choice(hits) for _ in range(options['repeat'])]
+            api_client = APIClient()
+            api_client.force_authenticate(User(username='bench_lookup', role='RECEPCIONISTA'))
+            host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+
+            def api(code):
+                response = api_client.get('/api/products/lookup/', {'code': code}, HTTP_HOST=host)
+                if response.status_code != 200:
+                    raise CommandError(f'/api/products/lookup/ respondió {response.status_code}')
+
+            def search(code):
+                api_client.get('/api/products/', {'search': code}, HTTP_HOST=host)
+
+            self.stdout.write(f'\n{"caso":<45} {"mediana":>11} {"p99":>11}')
+            self._measure('lookup() sin LRU (consulta)', product_lookup.get, codes, before=product_lookup.invalidate)
+            for code in hits:
+                product_lookup.get(code)
+            self._measure('lookup() en LRU', product_lookup.get, codes)
+            self._measure('lookup() código desconocido en LRU', product_lookup.get, ['000'] * len(codes))
+
+            api_codes = codes[:max(1, len(codes) // 10)]
+            self._measure('GET /api/products/lookup/ sin LRU', api, api_codes, before=product_lookup.invalidate)
+            for code in hits:
+                product_lookup.get(code)
+            self._measure('GET /api/products/lookup/ en LRU', api, api_codes)
+            self._measure('GET /api/products/?search= (anterior)', search, api_codes[:50])
+        finally:
+            Product.objects.filter(sku__startswith=PREFIX).delete()
+            product_lookup.invalidate()
@@ -0,0 +1,54 @@
+"""
+Comando de Django para expirar reservas vencidas y asignar stock a las pendientes
+Ejecutar con: python manage.py process_reservations [--no-notify] [--json] [--loop --interval 300]
+
+Primero marca EXPIRADA las reservas abiertas vencidas (devolviendo su stock
+apartado) y luego reparte el stock disponible entre las reservas PENDIENTE en
+orden de prioridad y antigüedad. Las reservas asignadas quedan CONFIRMADA y sus
+clientes reciben un correo (salvo con --no-notify). --json escribe además una
+línea JSON por asignación, para otros sistemas de notificación. --backend
+permite probar con otro backend de correo, por ejemplo
+django.core.mail.backends.locmem.EmailBackend.
+"""
+
+import json
+import time as time_module
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from apps.products.reservations import notify_allocations, process_reservations
+
+
+class Command(BaseCommand):
+    help = 'Expira las reservas vencidas y asigna el stock disponible a las reservas pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-notify', action='store_true', help='No enviar correos a los clientes')
+        parser.add_argument('--json', action='store_true', help='Escribir una línea JSON por asignación')
+        parser.add_argument('--loop', action='store_true', help='Seguir revisando en lugar de terminar')
+        parser.add_argument('--interval', type=int, default=300, help='Segundos entre revisiones con --loop')
+        parser.add_argument('--backend', help='Backend de correo (por defecto EMAIL_BACKEND)')
+
+    def _run(self, options):
+        result = process_reservations()
+        allocations = result['allocations']
+        units = sum(allocation['quantity'] for allocation in allocations)
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["expired"]} reservas expiradas ({result["released"]} unidades liberadas), '
+            f'{len(allocations)} reservas asignadas ({units} unidades) en {result["elapsed"]:.2f}s'
+        ))
+
+        if options['json']:
+            for allocation in allocations:
+                self.stdout.write(json.dumps(allocation))
+
+        if allocations and not options['no_notify']:
+            notified = notify_allocations(allocations, connection=get_connection(options['backend']))
+            self.stdout.write(f'{notified["sent"]} avisos enviados, {notified["skipped"]} clientes sin correo')
+
+    def handle(self, *args, **options):
+        self._run(options)
+        while options['loop']:
+            time_module.sleep(options['interval'])
+            self._run(options)
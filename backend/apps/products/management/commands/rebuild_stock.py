@@ -0,0 +1,38 @@
+"""
+Comando de Django para recalcular el stock de los productos desde el libro de movimientos
+Ejecutar con: python manage.py rebuild_stock [--check]
+
+Suma los movimientos de inventario de todos los productos en una sola consulta
+y corrige Product.stock donde no coincide. Con --check solo informa las
+diferencias (termina con código 1 si las hay, apto para monitoreo).
+"""
+
+import time as time_module
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.inventory import rebuild_stock
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el stock de los productos a partir de sus movimientos de inventario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Solo informar diferencias, sin corregirlas')
+
+    def handle(self, *args, **options):
+        started = time_module.perf_counter()
+        drift = rebuild_stock(dry_run=options['check'])
+        elapsed = time_module.perf_counter() - started
+
+        names = dict(Product.objects.filter(pk__in=drift).values_list('id', 'name'))
+        for product_id, (stored, total) in sorted(drift.items()):
+            self.stdout.write(f'  {names.get(product_id, product_id)}: stock {stored}, según movimientos {total}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(f'El stock coincide con los movimientos ({elapsed:.2f}s)'))
+        elif options['check']:
+            raise CommandError(f'{len(drift)} productos no coinciden con sus movimientos')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(drift)} productos corregidos en {elapsed:.2f}s'))
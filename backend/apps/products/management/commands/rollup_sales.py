@@ -0,0 +1,40 @@
+"""
+Comando de Django para agregar las ventas nuevas a los resúmenes diarios y mensuales
+Ejecutar con: python manage.py rollup_sales [--batch-size 5000] [--loop --interval 60] [--rebuild]
+
+Solo procesa las ventas posteriores a la marca guardada, por lo que puede
+ejecutarse con cron tan seguido como se quiera. Con --rebuild vacía los
+resúmenes y los recalcula desde todas las ventas (por ejemplo, tras corregir
+ventas antiguas o costos de productos).
+"""
+
+import time as time_module
+
+from django.core.management.base import BaseCommand
+
+from apps.products import reports
+
+
+class Command(BaseCommand):
+    help = 'Agrega las ventas nuevas a los resúmenes de ventas por día y por mes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Ventas por transacción')
+        parser.add_argument('--rebuild', action='store_true', help='Recalcular los resúmenes desde cero')
+        parser.add_argument('--loop', action='store_true', help='Seguir revisando en lugar de terminar')
+        parser.add_argument('--interval', type=int, default=60, help='Segundos entre revisiones con --loop')
+
+    def _run(self, batch_size, rebuild=False):
+        started = time_module.perf_counter()
+        processed = reports.rebuild(batch_size) if rebuild else reports.catch_up(batch_size)
+        elapsed = time_module.perf_counter() - started
+        if processed:
+            self.stdout.write(self.style.SUCCESS(f'{processed} ventas agregadas en {elapsed:.2f}s'))
+        else:
+            self.stdout.write('No hay ventas nuevas')
+
+    def handle(self, *args, **options):
+        self._run(options['batch_size'], options['rebuild'])
+        while options['loop']:
+            time_module.sleep(options['interval'])
+            self._run(options['batch_size'])
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def opening_balances(apps, schema_editor):
+    """Un ajuste por producto con su stock actual, para que el libro cuadre con Product.stock"""
+    Product = apps.get_model('products', 'Product')
+    StockMovement = apps.get_model('products', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(product_id=product_id, kind='AJUSTE', quantity=stock, note='Saldo inicial')
+            for product_id, stock in Product.objects.exclude(stock=0).values_list('id', 'stock')
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('VENTA', 'Venta'), ('REPOSICION', 'Reposición'), ('AJUSTE', 'Ajuste'), ('RESERVA', 'Reserva')], max_length=20, verbose_name='Tipo')),
+                ('quantity', models.IntegerField(verbose_name='Cantidad')),
+                ('note', models.CharField(blank=True, default='', max_length=200, verbose_name='Nota')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL, verbose_name='Registrado por')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product', verbose_name='Producto')),
+                ('reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='products.productreservation', verbose_name='Reserva')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='products.sale', verbose_name='Venta')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['product', '-id'], name='stock_movement_product_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:29
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def seed_totals(apps, schema_editor):
+    """Crea las filas de totales; la primera parte con las ventas existentes"""
+    Sale = apps.get_model('products', 'Sale')
+    SalesTotal = apps.get_model('products', 'SalesTotal')
+    existing = Sale.objects.aggregate(count=Count('id'), revenue=Sum('total_amount'))
+    SalesTotal.objects.bulk_create([
+        SalesTotal(slot=0, sale_count=existing['count'], revenue=existing['revenue'] or 0),
+        *[SalesTotal(slot=slot) for slot in range(1, 8)],
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_stock_movements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesTotal',
+            fields=[
+                ('slot', models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name='Fila')),
+                ('sale_count', models.BigIntegerField(default=0, verbose_name='Ventas')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Recaudación')),
+            ],
+            options={
+                'verbose_name': 'Total de Ventas',
+                'verbose_name_plural': 'Totales de Ventas',
+            },
+        ),
+        migrations.RunPython(seed_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_sales_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_sale_id', models.BigIntegerField(default=0, verbose_name='Última venta agregada')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Marca de Resúmenes de Ventas',
+                'verbose_name_plural': 'Marcas de Resúmenes de Ventas',
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('ALIMENTO', 'Alimento'), ('MEDICAMENTO', 'Medicamento'), ('ACCESORIO', 'Accesorio'), ('HIGIENE', 'Higiene'), ('JUGUETE', 'Juguete'), ('OTRO', 'Otro')], max_length=20, verbose_name='Categoría')),
+                ('payment_method', models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('TARJETA', 'Tarjeta'), ('TRANSFERENCIA', 'Transferencia')], max_length=20, verbose_name='Método de pago')),
+                ('units', models.IntegerField(default=0, verbose_name='Unidades')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Recaudación')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Costo')),
+                ('month', models.DateField(verbose_name='Mes')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual de Ventas',
+                'verbose_name_plural': 'Resúmenes Mensuales de Ventas',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('ALIMENTO', 'Alimento'), ('MEDICAMENTO', 'Medicamento'), ('ACCESORIO', 'Accesorio'), ('HIGIENE', 'Higiene'), ('JUGUETE', 'Juguete'), ('OTRO', 'Otro')], max_length=20, verbose_name='Categoría')),
+                ('payment_method', models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('TARJETA', 'Tarjeta'), ('TRANSFERENCIA', 'Transferencia')], max_length=20, verbose_name='Método de pago')),
+                ('units', models.IntegerField(default=0, verbose_name='Unidades')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Recaudación')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Costo')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Ventas',
+                'verbose_name_plural': 'Resúmenes Diarios de Ventas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlysalesrollup',
+            constraint=models.UniqueConstraint(fields=('month', 'product', 'category', 'payment_method'), name='monthly_sales_rollup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'product', 'category', 'payment_method'), name='daily_sales_rollup_key'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_barcode_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productreservation',
+            name='status',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONTACTADO', 'Contactado'), ('CONFIRMADA', 'Confirmada'), ('COMPLETADA', 'Completada'), ('CANCELADA', 'Cancelada'), ('EXPIRADA', 'Expirada')], default='PENDIENTE', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AddIndex(
+            model_name='productreservation',
+            index=models.Index(condition=models.Q(('status__in', ['PENDIENTE', 'CONTACTADO', 'CONFIRMADA'])), fields=['expires_at'], name='reservation_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_reservation_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='reservation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sale_items', to='products.productreservation', verbose_name='Reserva'),
+        ),
+    ]
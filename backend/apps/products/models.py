@@ -36,7 +36,7 @@ class Product(models.Model):
         verbose_name='Costo'
     )
     
-    # Inventario
+    # Inventario: stock es la suma de los movimientos (StockMovement), mantenida por inventory.py
     stock = models.IntegerField(default=0, verbose_name='Stock')
     min_stock = models.IntegerField(default=5, verbose_name='Stock mínimo')
     
@@ -71,6 +71,10 @@ class Product(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['name']
+        indexes = [
+            # Búsqueda exacta al escanear en el mostrador (el SKU ya tiene índice por ser único)
+            models.Index(fields=['barcode'], name='product_barcode_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - ${self.price}"
@@ -90,8 +94,12 @@ class ProductReservation(models.Model):
         ('CONFIRMADA', 'Confirmada'),
         ('COMPLETADA', 'Completada'),
         ('CANCELADA', 'Cancelada'),
+        ('EXPIRADA', 'Expirada'),
     )
     
+    # Estados que vencen al pasar expires_at (reservations.expire_reservations)
+    OPEN_STATUSES = ('PENDIENTE', 'CONTACTADO', 'CONFIRMADA')
+    
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
@@ -140,6 +148,16 @@ class ProductReservation(models.Model):
         verbose_name = 'Reserva de Producto'
         verbose_name_plural = 'Reservas de Productos'
         ordering = ['priority', 'created_at']
+        indexes = [
+            # Reservas por estado en orden de prioridad (pendientes, estadísticas)
+            models.Index(fields=['status', 'priority', 'created_at'], name='reservation_status_idx'),
+            # Reservas abiertas por vencer (barrido de expiración)
+            models.Index(
+                fields=['expires_at'],
+                name='reservation_expires_idx',
+                condition=models.Q(status__in=['PENDIENTE', 'CONTACTADO', 'CONFIRMADA'])
+            ),
+        ]
     
     def __str__(self):
         return f"{self.client.get_full_name()} - {self.product.name} ({self.quantity})"
@@ -192,6 +210,11 @@ class Sale(models.Model):
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
         ordering = ['-created_at']
+        indexes = [
+            # Listado de ventas y compras de un cliente, más recientes primero
+            models.Index(fields=['-created_at'], name='sale_created_idx'),
+            models.Index(fields=['client', '-created_at'], name='sale_client_created_idx'),
+        ]
     
     def __str__(self):
         client_name = self.client.get_full_name() if self.client else 'Cliente genérico'
@@ -215,6 +238,16 @@ class SaleItem(models.Model):
         verbose_name='Producto'
     )
     
+    # Reserva retirada con este item: su stock apartado pasa a la venta
+    reservation = models.ForeignKey(
+        ProductReservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sale_items',
+        verbose_name='Reserva'
+    )
+    
     quantity = models.IntegerField(default=1, verbose_name='Cantidad')
     unit_price = models.DecimalField(
         max_digits=10,
@@ -239,3 +272,160 @@ class SaleItem(models.Model):
         self.subtotal = self.unit_price * self.quantity
         super().save(*args, **kwargs)
 
+
+
+class SalesTotal(models.Model):
+    """
+    Totales acumulados de ventas (cantidad y recaudación), mantenidos por signals.py.
+    Se reparten en SLOTS filas según el id de la venta para que las ventas
+    simultáneas no compitan por la misma fila; el total es la suma de todas.
+    """
+    
+    SLOTS = 8
+    
+    slot = models.PositiveSmallIntegerField(primary_key=True, verbose_name='Fila')
+    sale_count = models.BigIntegerField(default=0, verbose_name='Ventas')
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='Recaudación')
+    
+    class Meta:
+        verbose_name = 'Total de Ventas'
+        verbose_name_plural = 'Totales de Ventas'
+    
+    def __str__(self):
+        return f"Fila {self.slot}: {self.sale_count} ventas, ${self.revenue}"
+
+
+class SalesRollup(models.Model):
+    """
+    Ventas agregadas por período × producto × categoría × método de pago.
+    Las mantiene el comando rollup_sales (reports.py) a partir de Sale y SaleItem.
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Producto'
+    )
+    # Categoría del producto al agregar la venta (el producto puede cambiarla después)
+    category = models.CharField(max_length=20, choices=Product.CATEGORY_CHOICES, verbose_name='Categoría')
+    payment_method = models.CharField(max_length=20, choices=Sale.PAYMENT_METHOD_CHOICES, verbose_name='Método de pago')
+    
+    units = models.IntegerField(default=0, verbose_name='Unidades')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Recaudación')
+    # Costo de las unidades vendidas según Product.cost al agregarlas (0 si no tiene costo)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Costo')
+    
+    class Meta:
+        abstract = True
+
+
+class DailySalesRollup(SalesRollup):
+    """Ventas agregadas por día"""
+    
+    day = models.DateField(verbose_name='Día')
+    
+    class Meta:
+        verbose_name = 'Resumen Diario de Ventas'
+        verbose_name_plural = 'Resúmenes Diarios de Ventas'
+        constraints = [
+            # También sirve de índice para los rangos de fechas del reporte
+            models.UniqueConstraint(
+                fields=['day', 'product', 'category', 'payment_method'],
+                name='daily_sales_rollup_key'
+            ),
+        ]
+
+
+class MonthlySalesRollup(SalesRollup):
+    """Ventas agregadas por mes (month es el primer día del mes)"""
+    
+    month = models.DateField(verbose_name='Mes')
+    
+    class Meta:
+        verbose_name = 'Resumen Mensual de Ventas'
+        verbose_name_plural = 'Resúmenes Mensuales de Ventas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'product', 'category', 'payment_method'],
+                name='monthly_sales_rollup_key'
+            ),
+        ]
+
+
+class SalesRollupWatermark(models.Model):
+    """Última venta incluida en los resúmenes (una sola fila)"""
+    
+    last_sale_id = models.BigIntegerField(default=0, verbose_name='Última venta agregada')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
+    
+    class Meta:
+        verbose_name = 'Marca de Resúmenes de Ventas'
+        verbose_name_plural = 'Marcas de Resúmenes de Ventas'
+    
+    def __str__(self):
+        return f"Hasta la venta #{self.last_sale_id}"
+
+
+class StockMovement(models.Model):
+    """
+    Movimiento de inventario (libro de solo inserción). La cantidad es positiva
+    para entradas y negativa para salidas; Product.stock es su suma por producto.
+    """
+    
+    KIND_CHOICES = (
+        ('VENTA', 'Venta'),
+        ('REPOSICION', 'Reposición'),
+        ('AJUSTE', 'Ajuste'),
+        ('RESERVA', 'Reserva'),
+    )
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name='Producto'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Tipo')
+    quantity = models.IntegerField(verbose_name='Cantidad')
+    
+    # Origen del movimiento
+    sale = models.ForeignKey(
+        Sale,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        verbose_name='Venta'
+    )
+    reservation = models.ForeignKey(
+        ProductReservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        verbose_name='Reserva'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        verbose_name='Registrado por'
+    )
+    note = models.CharField(max_length=200, blank=True, default='', verbose_name='Nota')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha')
+    
+    class Meta:
+        verbose_name = 'Movimiento de Inventario'
+        verbose_name_plural = 'Movimientos de Inventario'
+        ordering = ['-id']
+        indexes = [
+            # Historial de un producto, más recientes primero
+            models.Index(fields=['product', '-id'], name='stock_movement_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} {self.quantity:+d} ({self.get_kind_display()})"
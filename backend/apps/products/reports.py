@@ -0,0 +1,277 @@
+"""
+Resúmenes de ventas por día y por mes (DailySalesRollup, MonthlySalesRollup).
+
+catch_up() agrega por lotes las ventas posteriores a la marca
+(SalesRollupWatermark): suma sus items a la fila de cada (período, producto,
+categoría, método de pago) y avanza la marca en la misma transacción. Todas las
+escrituras de los resúmenes bloquean la fila de la marca, así que el comando y
+las eliminaciones de ventas no se pisan. Solo se agregan ventas con más de
+SALES_ROLLUP_LAG_SECONDS de antigüedad: los ids se asignan al insertar, y una
+venta reciente con id menor podría confirmarse después que otra con id mayor y
+quedar bajo la marca sin agregar.
+
+sales_report() responde un rango de fechas así:
+- los meses completos, desde el resumen mensual;
+- los días de los extremos, desde el diario;
+- las ventas posteriores a la marca, directamente desde SaleItem.
+Las ventas posteriores a la marca son pocas si el comando rollup_sales corre con
+frecuencia, y el resultado siempre incluye las últimas ventas.
+
+El costo usa Product.cost al momento de agregar la venta (0 si el producto no
+tiene costo); el margen es recaudación menos costo.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import takewhile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import Product, Sale, SaleItem, DailySalesRollup, MonthlySalesRollup, SalesRollupWatermark
+
+
+GROUPS = ('day', 'month', 'product', 'category', 'payment_method')
+
+# Posición de cada agrupación en las claves (día, producto, categoría, método de pago)
+_KEY_INDEX = {'day': 0, 'month': 0, 'product': 1, 'category': 2, 'payment_method': 3}
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _watermark(lock=False):
+    queryset = SalesRollupWatermark.objects.select_for_update() if lock else SalesRollupWatermark.objects
+    watermark, _ = queryset.get_or_create(pk=1)
+    return watermark
+
+
+def _item_rows(items):
+    """(día local, producto, categoría, método de pago, unidades, recaudación, costo) de cada item"""
+    rows = items.values_list(
+        'sale__created_at', 'sale__payment_method', 'product_id', 'product__category',
+        'product__cost', 'quantity', 'subtotal'
+    )
+    for created_at, payment_method, product_id, category, unit_cost, quantity, subtotal in rows:
+        cost = (unit_cost or Decimal(0)) * quantity
+        yield timezone.localdate(created_at), product_id, category, payment_method, quantity, subtotal, cost
+
+
+def _add(model, period_field, totals):
+    """Suma `totals` {(período, producto, categoría, método): [unidades, recaudación, costo]} a las filas del resumen"""
+    existing = {
+        (getattr(row, period_field), row.product_id, row.category, row.payment_method): row
+        for row in model.objects.filter(**{
+            f'{period_field}__in': {key[0] for key in totals},
+            'product_id__in': {key[1] for key in totals},
+        })
+    }
+
+    new_rows, changed = [], []
+    for key, (units, revenue, cost) in totals.items():
+        row = existing.get(key)
+        if row is None:
+            period, product_id, category, payment_method = key
+            new_rows.append(model(
+                product_id=product_id, category=category, payment_method=payment_method,
+                units=units, revenue=revenue, cost=cost, **{period_field: period}
+            ))
+        else:
+            row.units += units
+            row.revenue += revenue
+            row.cost += cost
+            changed.append(row)
+
+    model.objects.bulk_create(new_rows, batch_size=1000)
+    model.objects.bulk_update(changed, ['units', 'revenue', 'cost'], batch_size=1000)
+
+
+def _apply(rows, sign=1):
+    """Suma (o resta, con sign=-1) filas de _item_rows a los resúmenes diario y mensual"""
+    daily = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    monthly = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for day, product_id, category, payment_method, units, revenue, cost in rows:
+        for totals, period in ((daily, day), (monthly, _month(day))):
+            entry = totals[(period, product_id, category, payment_method)]
+            entry[0] += sign * units
+            entry[1] += sign * revenue
+            entry[2] += sign * cost
+
+    _add(DailySalesRollup, 'day', daily)
+    _add(MonthlySalesRollup, 'month', monthly)
+
+
+def catch_up(batch_size=5000, now=None):
+    """
+    Agrega a los resúmenes las ventas nuevas desde la marca, en lotes de `batch_size`
+    ventas (una transacción por lote). Retorna la cantidad de ventas agregadas.
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.SALES_ROLLUP_LAG_SECONDS)
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark = _watermark(lock=True)
+            sales = list(
+                Sale.objects.filter(pk__gt=watermark.last_sale_id)
+                .order_by('pk').values_list('pk', 'created_at')[:batch_size]
+            )
+            # Detenerse en la primera venta reciente para no saltar ids que aún no se confirman
+            ready = list(takewhile(lambda sale: sale[1] <= cutoff, sales))
+            if not ready:
+                return processed
+
+            first_id, last_id = ready[0][0], ready[-1][0]
+            _apply(_item_rows(SaleItem.objects.filter(sale_id__gte=first_id, sale_id__lte=last_id)))
+            watermark.last_sale_id = last_id
+            watermark.save()
+
+        processed += len(ready)
+        if len(ready) < batch_size:
+            return processed
+
+
+def rebuild(batch_size=5000):
+    """Vacía los resúmenes y los vuelve a calcular desde todas las ventas"""
+    with transaction.atomic():
+        watermark = _watermark(lock=True)
+        DailySalesRollup.objects.all().delete()
+        MonthlySalesRollup.objects.all().delete()
+        watermark.last_sale_id = 0
+        watermark.save()
+    return catch_up(batch_size)
+
+
+def remove_sale(sale):
+    """Descuenta de los resúmenes una venta ya agregada (antes de eliminarla)"""
+    with transaction.atomic():
+        watermark = _watermark(lock=True)
+        if sale.pk <= watermark.last_sale_id:
+            _apply(_item_rows(SaleItem.objects.filter(sale=sale)), sign=-1)
+
+
+def _merge(result, key, units, revenue, cost):
+    entry = result[key]
+    entry[0] += units or 0
+    entry[1] += revenue or 0
+    entry[2] += cost or 0
+
+
+def _rollup_totals(queryset, period_field, group_by, result):
+    """Suma al resultado las filas de un resumen, agrupadas en la base de datos"""
+    totals = {'units': Sum('units'), 'revenue': Sum('revenue'), 'cost': Sum('cost')}
+    if group_by is None:
+        row = queryset.aggregate(**totals)
+        _merge(result, None, row['units'], row['revenue'], row['cost'])
+        return
+
+    field = period_field if group_by in ('day', 'month') else group_by
+    for row in queryset.order_by().values(field).annotate(**totals):
+        key = _month(row[field]) if group_by == 'month' else row[field]
+        _merge(result, key, row['units'], row['revenue'], row['cost'])
+
+
+def sales_report(start, end, group_by=None, product=None, category=None, payment_method=None):
+    """
+    Unidades, recaudación, costo y margen de las ventas entre `start` y `end`
+    (fechas locales, inclusive), en total y agrupadas por `group_by` (uno de GROUPS).
+    """
+    filters = {
+        field: value
+        for field, value in (('product_id', product), ('category', category), ('payment_method', payment_method))
+        if value
+    }
+    last_sale_id = SalesRollupWatermark.objects.filter(pk=1).values_list('last_sale_id', flat=True).first() or 0
+    result = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+
+    # Meses completos del rango desde el resumen mensual (salvo al agrupar por día)
+    first_month = start if start.day == 1 else _next_month(start)
+    end_month = _next_month(end) if _next_month(end) - timedelta(days=1) == end else _month(end)
+    if group_by != 'day' and first_month < end_month:
+        _rollup_totals(
+            MonthlySalesRollup.objects.filter(month__gte=first_month, month__lt=end_month, **filters),
+            'month', group_by, result
+        )
+        days = Q(day__gte=start, day__lt=first_month) | Q(day__gte=end_month, day__lte=end)
+    else:
+        days = Q(day__gte=start, day__lte=end)
+    _rollup_totals(DailySalesRollup.objects.filter(days, **filters), 'day', group_by, result)
+
+    # Ventas aún no agregadas. Son pocas: el rango de fechas se filtra aquí para
+    # que la consulta recorra solo los ids posteriores a la marca
+    pending = SaleItem.objects.filter(sale_id__gt=last_sale_id)
+    if product:
+        pending = pending.filter(product_id=product)
+    if category:
+        pending = pending.filter(product__category=category)
+    if payment_method:
+        pending = pending.filter(sale__payment_method=payment_method)
+    for row in _item_rows(pending):
+        if not start <= row[0] <= end:
+            continue
+        if group_by is None:
+            key = None
+        else:
+            key = row[_KEY_INDEX[group_by]]
+            if group_by == 'month':
+                key = _month(key)
+        _merge(result, key, *row[4:])
+
+    return _report(start, end, group_by, result)
+
+
+def _amounts(units, revenue, cost):
+    # Redondear a centavos: en SQLite las sumas de decimales llegan como float
+    revenue, cost = round(Decimal(revenue), 2), round(Decimal(cost), 2)
+    return {
+        'units': units,
+        'revenue': float(revenue),
+        'cost': float(cost),
+        'margin': float(revenue - cost),
+    }
+
+
+def _report(start, end, group_by, result):
+    """Respuesta del reporte: totales y filas por grupo ordenadas por su clave"""
+    if group_by is None:
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'group_by': None,
+            'totals': _amounts(*result[None]),
+            'rows': [],
+        }
+
+    names = {}
+    if group_by == 'product':
+        names = dict(Product.objects.filter(pk__in=list(result)).values_list('id', 'name'))
+
+    rows = []
+    totals = [0, Decimal(0), Decimal(0)]
+    for key in sorted(result):
+        units, revenue, cost = result[key]
+        totals = [totals[0] + units, totals[1] + revenue, totals[2] + cost]
+        if group_by == 'day':
+            row = {'day': key.isoformat()}
+        elif group_by == 'month':
+            row = {'month': key.strftime('%Y-%m')}
+        elif group_by == 'product':
+            row = {'product': key, 'product_name': names.get(key)}
+        else:
+            row = {group_by: key}
+        rows.append({**row, **_amounts(units, revenue, cost)})
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'totals': _amounts(*totals),
+        'rows': rows,
+    }
@@ -0,0 +1,259 @@
+"""
+Motor de reservas de productos: expiración y asignación de stock.
+
+expire_reservations() marca EXPIRADA, con un solo UPDATE, las reservas abiertas
+(PENDIENTE, CONTACTADO, CONFIRMADA) cuyo expires_at ya pasó, sobre el índice
+parcial reservation_expires_idx, y devuelve al stock lo que tenían apartado.
+
+allocate_stock() reparte el stock disponible entre las reservas PENDIENTE de
+todos los productos en una sola pasada, en orden (prioridad, fecha de creación)
+sobre reservation_status_idx. Por producto el orden es estricto: si la primera
+reserva en la fila no cabe en el stock, las siguientes de ese producto esperan
+(una reserva grande no queda postergada indefinidamente por otras más chicas).
+Las reservas asignadas quedan CONFIRMADA con un plazo de retiro de
+RESERVATION_HOLD_HOURS horas (expires_at), y su stock se aparta con movimientos
+RESERVA negativos en el libro (inventory.apply_movements): un UPDATE por
+producto y un UPDATE por lote de reservas, sin guardar fila por fila.
+
+El stock apartado se mantiene mientras la reserva está CONFIRMADA. Al retirar
+el producto, la venta lleva la reserva en su item (pickup_reservations): en la
+misma transacción el apartado se devuelve con un movimiento RESERVA positivo,
+la venta lo descuenta con su movimiento VENTA y la reserva queda COMPLETADA,
+de modo que las unidades salen del stock una sola vez y nadie más puede
+tomarlas entre medio. Al pasar a cualquier otro estado (cancelación,
+expiración) o al eliminarla el apartado se devuelve al stock (release_holds,
+llamado también desde signals.py).
+
+notify_allocations() avisa por correo a los clientes de las reservas asignadas
+y marca contacted_at.
+"""
+
+import time as time_module
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from .inventory import apply_movements
+from .models import Product, ProductReservation, StockMovement
+from . import stats
+
+
+BATCH_SIZE = 5000
+
+
+def _chunks(values, size=BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def release_holds(reservation_ids, note='Stock liberado'):
+    """
+    Devuelve al stock lo que las reservas tienen apartado (suma negativa de sus
+    movimientos RESERVA). Retorna la cantidad de unidades liberadas.
+    """
+    movements = []
+    for chunk in _chunks(list(reservation_ids)):
+        held = (
+            StockMovement.objects.filter(kind='RESERVA', reservation_id__in=chunk)
+            .order_by().values_list('reservation_id', 'product_id').annotate(total=Sum('quantity'))
+        )
+        movements += [
+            StockMovement(product_id=product_id, reservation_id=reservation_id,
+                          kind='RESERVA', quantity=-total, note=note)
+            for reservation_id, product_id, total in held
+            if total < 0
+        ]
+    if movements:
+        apply_movements(movements)
+    return sum(movement.quantity for movement in movements)
+
+
+def pickup_reservations(sale_items, error_field='items'):
+    """
+    Retiro de reservas en una venta. Bloquea las reservas de los items (deben
+    estar CONFIRMADA y ser del mismo producto), las marca COMPLETADA y retorna
+    los movimientos RESERVA positivos que devuelven su stock apartado, para
+    registrarlos con apply_movements junto con los VENTA de la venta: las
+    unidades apartadas pasan a la venta sin volver a estar disponibles.
+    Debe llamarse dentro de la transacción de la venta. Lanza ValidationError
+    en `error_field` si una reserva no puede retirarse.
+    """
+    reserved = {item.reservation_id: item for item in sale_items if item.reservation_id}
+    if not reserved:
+        return []
+    if len(reserved) < sum(1 for item in sale_items if item.reservation_id):
+        raise serializers.ValidationError({error_field: ['Una reserva solo puede retirarse una vez.']})
+
+    locked = {
+        reservation_id: (status, product_id)
+        for reservation_id, status, product_id in ProductReservation.objects.select_for_update()
+        .filter(pk__in=list(reserved)).values_list('id', 'status', 'product_id')
+    }
+    for reservation_id, item in reserved.items():
+        status, product_id = locked.get(reservation_id, (None, None))
+        if status != 'CONFIRMADA':
+            raise serializers.ValidationError({
+                error_field: [f'La reserva {reservation_id} no está confirmada para retiro.']
+            })
+        if product_id != item.product_id:
+            raise serializers.ValidationError({
+                error_field: [f'La reserva {reservation_id} es de otro producto.']
+            })
+
+    # update() no emite post_save: el apartado no se libera por separado (signals.py)
+    now = timezone.now()
+    ProductReservation.objects.filter(pk__in=list(reserved)).update(status='COMPLETADA', updated_at=now)
+
+    held = (
+        StockMovement.objects.filter(kind='RESERVA', reservation_id__in=list(reserved))
+        .order_by().values_list('reservation_id', 'product_id').annotate(total=Sum('quantity'))
+    )
+    return [
+        StockMovement(product_id=product_id, reservation_id=reservation_id, sale=reserved[reservation_id].sale,
+                      kind='RESERVA', quantity=-total, note='Reserva retirada')
+        for reservation_id, product_id, total in held
+        if total < 0
+    ]
+
+
+def expire_reservations(now=None):
+    """
+    Marca EXPIRADA las reservas abiertas vencidas y libera su stock apartado.
+    Retorna {'expired': reservas expiradas, 'released': unidades devueltas al stock}.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        overdue = ProductReservation.objects.filter(
+            status__in=ProductReservation.OPEN_STATUSES, expires_at__lte=now
+        )
+        # Bloquear las confirmadas: su stock apartado se libera junto con el cambio de estado
+        holding = list(overdue.filter(status='CONFIRMADA').select_for_update().values_list('id', flat=True))
+        expired = overdue.update(status='EXPIRADA', updated_at=now)
+        released = release_holds(holding, note='Reserva expirada')
+        if expired:
+            stats.invalidate()
+    return {'expired': expired, 'released': released}
+
+
+def allocate_stock(now=None):
+    """
+    Asigna el stock disponible a las reservas PENDIENTE en orden (prioridad,
+    fecha de creación). Retorna la lista de asignaciones
+    {'reservation', 'product', 'client', 'quantity'} en el orden en que se hicieron.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        waiting = ProductReservation.objects.filter(status='PENDIENTE')
+        # Bloquear los productos con stock y reservas en espera hasta apartar su stock
+        remaining = dict(
+            Product.objects.select_for_update()
+            .filter(stock__gt=0, pk__in=waiting.values('product_id'))
+            .values_list('id', 'stock')
+        )
+
+        allocations = []
+        blocked = set()
+        rows = (
+            waiting.filter(product__stock__gt=0)
+            .order_by('priority', 'created_at', 'id')
+            .values_list('id', 'product_id', 'client_id', 'quantity')
+        )
+        for reservation_id, product_id, client_id, quantity in rows.iterator(chunk_size=BATCH_SIZE):
+            if product_id in blocked or product_id not in remaining or quantity < 1:
+                continue
+            if quantity > remaining[product_id]:
+                # La primera reserva del producto no cabe: las siguientes esperan su turno
+                blocked.add(product_id)
+            else:
+                remaining[product_id] -= quantity
+                allocations.append({
+                    'reservation': reservation_id,
+                    'product': product_id,
+                    'client': client_id,
+                    'quantity': quantity,
+                })
+                if not remaining[product_id]:
+                    blocked.add(product_id)
+            if len(blocked) == len(remaining):
+                break
+
+        # Bloquear las reservas elegidas; las que dejaron de estar pendientes se omiten
+        still_waiting = set()
+        for chunk in _chunks([allocation['reservation'] for allocation in allocations]):
+            still_waiting.update(
+                waiting.filter(pk__in=chunk).select_for_update().values_list('id', flat=True)
+            )
+        allocations = [allocation for allocation in allocations if allocation['reservation'] in still_waiting]
+        if not allocations:
+            return []
+
+        apply_movements([
+            StockMovement(product_id=allocation['product'], reservation_id=allocation['reservation'],
+                          kind='RESERVA', quantity=-allocation['quantity'], note='Stock apartado')
+            for allocation in allocations
+        ])
+        expires_at = now + timedelta(hours=settings.RESERVATION_HOLD_HOURS)
+        for chunk in _chunks([allocation['reservation'] for allocation in allocations]):
+            ProductReservation.objects.filter(pk__in=chunk).update(
+                status='CONFIRMADA', expires_at=expires_at, updated_at=now
+            )
+    return allocations
+
+
+def build_notification(reservation):
+    """Correo que avisa al cliente que su reserva está lista para retiro"""
+    body = (
+        f'Hola {reservation.client.get_full_name()},\n\n'
+        f'Ya tenemos {reservation.quantity} x {reservation.product.name} apartado para usted. '
+        f'Puede retirarlo hasta el {timezone.localtime(reservation.expires_at):%d/%m/%Y %H:%M}.\n\n'
+        f'Veterinaria Pochita'
+    )
+    return EmailMessage(
+        subject=f'Su reserva de {reservation.product.name} está lista',
+        body=body,
+        to=[reservation.client.email]
+    )
+
+
+def notify_allocations(allocations, batch_size=500, connection=None):
+    """
+    Avisa por correo a los clientes de las reservas asignadas y marca contacted_at.
+    Retorna {'sent': correos enviados, 'skipped': reservas de clientes sin correo}.
+    """
+    now = timezone.now()
+    connection = connection or get_connection()
+    sent = skipped = 0
+
+    connection.open()
+    try:
+        for chunk in _chunks([allocation['reservation'] for allocation in allocations], batch_size):
+            batch = list(
+                ProductReservation.objects.filter(pk__in=chunk).select_related('client', 'product').only(
+                    'id', 'quantity', 'expires_at', 'client__first_name', 'client__last_name',
+                    'client__email', 'product__name'
+                )
+            )
+            messages = [build_notification(reservation) for reservation in batch if reservation.client.email]
+            if messages:
+                connection.send_messages(messages)
+            sent += len(messages)
+            skipped += len(batch) - len(messages)
+            ProductReservation.objects.filter(pk__in=chunk).update(contacted_at=now, updated_at=now)
+    finally:
+        connection.close()
+
+    return {'sent': sent, 'skipped': skipped}
+
+
+def process_reservations(now=None):
+    """Expira las reservas vencidas y asigna el stock disponible (incluido el recién liberado)"""
+    started = time_module.perf_counter()
+    result = expire_reservations(now)
+    result['allocations'] = allocate_stock(now)
+    result['elapsed'] = time_module.perf_counter() - started
+    return result
@@ -1,5 +1,14 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Product, ProductReservation, Sale, SaleItem
+from .models import Product, ProductReservation, Sale, SaleItem, StockMovement
+from .inventory import apply_movements
+from .reservations import pickup_reservations
+
+
+def _request_user(serializer):
+    """Usuario autenticado de la petición (None fuera de una petición)"""
+    request = serializer.context.get('request')
+    return request.user if request and request.user.is_authenticated else None
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -14,6 +23,30 @@ class ProductSerializer(serializers.ModelSerializer):
             'image', 'is_active', 'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
+    
+    def validate_stock(self, value):
+        # Tras crear el producto, el stock solo cambia con movimientos de inventario
+        if self.instance is not None:
+            if value != self.instance.stock:
+                raise serializers.ValidationError(
+                    f"El stock se modifica registrando movimientos en /api/products/{self.instance.pk}/movements/."
+                )
+        elif value < 0:
+            raise serializers.ValidationError("El stock no puede ser negativo.")
+        return value
+    
+    def create(self, validated_data):
+        # El stock inicial queda registrado en el libro como un ajuste
+        stock = validated_data.pop('stock', 0)
+        with transaction.atomic():
+            product = super().create(validated_data)
+            if stock:
+                apply_movements([StockMovement(
+                    product=product, kind='AJUSTE', quantity=stock,
+                    created_by=_request_user(self), note='Stock inicial'
+                )])
+                product.refresh_from_db(fields=['stock', 'updated_at'])
+        return product
 
 
 class ProductReservationSerializer(serializers.ModelSerializer):
@@ -31,15 +64,25 @@ class ProductReservationSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'reserved_at', 'created_at', 'updated_at')
+    
+    def validate_status(self, value):
+        # Completarla a mano devolvería el stock apartado antes de que la venta lo descuente
+        if value == 'COMPLETADA' and (self.instance is None or self.instance.status != 'COMPLETADA'):
+            raise serializers.ValidationError(
+                "La reserva se completa al registrar su retiro en /api/products/sales/ (campo reservation del item)."
+            )
+        return value
 
 
 class SaleItemSerializer(serializers.ModelSerializer):
     """Serializer para items de venta"""
     product_name = serializers.CharField(source='product.name', read_only=True)
+    # Una cantidad cero o negativa sumaría stock con un movimiento VENTA y restaría del total
+    quantity = serializers.IntegerField(min_value=1)
     
     class Meta:
         model = SaleItem
-        fields = ('id', 'product', 'product_name', 'quantity', 'unit_price', 'subtotal')
+        fields = ('id', 'product', 'product_name', 'reservation', 'quantity', 'unit_price', 'subtotal')
         read_only_fields = ('id', 'subtotal')
 
 
@@ -69,30 +112,65 @@ class SaleCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         
-        # Calcular total
-        total = sum(item['unit_price'] * item['quantity'] for item in items_data)
-        validated_data['total_amount'] = total
-        
-        # Crear la venta
-        sale = Sale.objects.create(**validated_data)
-        
-        # Crear los items y actualizar inventario
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
+        # Toda la venta es una unidad: si falta stock de un producto no queda nada a medias
+        with transaction.atomic():
+            # Calcular subtotales y total en la misma pasada
+            sale_items = []
+            total = 0
+            for item_data in items_data:
+                subtotal = item_data['unit_price'] * item_data['quantity']
+                total += subtotal
+                sale_items.append(SaleItem(subtotal=subtotal, **item_data))
             
-            # Verificar stock
-            if product.stock < quantity:
-                raise serializers.ValidationError({
-                    "items": f"Stock insuficiente para {product.name}. Disponible: {product.stock}"
-                })
+            # Crear la venta y sus items
+            sale = Sale.objects.create(total_amount=total, **validated_data)
+            for sale_item in sale_items:
+                sale_item.sale = sale
+            SaleItem.objects.bulk_create(sale_items)
             
-            # Crear item de venta
-            SaleItem.objects.create(sale=sale, **item_data)
+            # Las reservas retiradas entregan su stock apartado a la venta en esta misma transacción
+            pickups = pickup_reservations(sale_items)
             
-            # Actualizar inventario
-            product.stock -= quantity
-            product.save()
+            # Descontar el stock al final: la fila de cada producto queda bloqueada solo hasta el commit
+            user = _request_user(self)
+            apply_movements(pickups + [
+                StockMovement(product=item.product, kind='VENTA', quantity=-item.quantity, sale=sale,
+                              reservation_id=item.reservation_id, created_by=user)
+                for item in sale_items
+            ], error_field='items')
         
         return sale
 
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    """Serializer para movimientos de inventario; por la API solo se registran reposiciones y ajustes"""
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True, default=None)
+    # Stock actual del producto (tras el movimiento, en la respuesta al registrarlo)
+    product_stock = serializers.IntegerField(source='product.stock', read_only=True)
+    
+    class Meta:
+        model = StockMovement
+        fields = (
+            'id', 'product', 'kind', 'kind_display', 'quantity', 'product_stock', 'sale',
+            'reservation', 'created_by', 'created_by_name', 'note', 'created_at'
+        )
+        read_only_fields = ('id', 'product', 'sale', 'reservation', 'created_by', 'created_at')
+    
+    def validate(self, attrs):
+        kind, quantity = attrs['kind'], attrs['quantity']
+        if kind not in ('REPOSICION', 'AJUSTE'):
+            raise serializers.ValidationError({
+                "kind": "Las ventas y reservas registran sus propios movimientos."
+            })
+        if quantity == 0 or (kind == 'REPOSICION' and quantity < 0):
+            raise serializers.ValidationError({
+                "quantity": "La reposición debe ser positiva y el ajuste distinto de cero."
+            })
+        return attrs
+    
+    def create(self, validated_data):
+        movement = StockMovement(**validated_data)
+        apply_movements([movement], error_field='quantity')
+        movement.product.refresh_from_db(fields=['stock', 'updated_at'])
+        return movement
@@ -0,0 +1,59 @@
+"""
+Señales de productos: mantienen los totales acumulados de ventas, descuentan
+de los resúmenes (reports.py) las ventas eliminadas e invalidan las
+estadísticas cacheadas (stats.py) cuando cambian productos, ventas o reservas
+y el caché de búsqueda por código (lookup.py) cuando cambian productos.
+También devuelven al stock lo apartado por una reserva que deja de estar
+CONFIRMADA o se elimina (reservations.py).
+"""
+
+from django.db.models.signals import pre_delete, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Product, ProductReservation, Sale
+from . import lookup, reports, reservations, stats
+
+
+@receiver(post_save, sender=Sale)
+def add_sale_to_totals(sender, instance, created, **kwargs):
+    if created:
+        stats.record_sale(instance)
+        stats.invalidate()
+
+
+@receiver(pre_delete, sender=Sale)
+def remove_sale_from_rollups(sender, instance, **kwargs):
+    # Antes de eliminar: los items de la venta se borran en cascada
+    reports.remove_sale(instance)
+
+
+@receiver(post_delete, sender=Sale)
+def remove_sale_from_totals(sender, instance, **kwargs):
+    stats.record_sale(instance, sign=-1)
+    stats.invalidate()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductReservation)
+@receiver(post_delete, sender=ProductReservation)
+def invalidate_stats(sender, **kwargs):
+    stats.invalidate()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_lookup(sender, **kwargs):
+    lookup.invalidate()
+
+
+@receiver(post_save, sender=ProductReservation)
+def release_reservation_stock(sender, instance, created, **kwargs):
+    if not created and instance.status != 'CONFIRMADA':
+        reservations.release_holds([instance.pk], note=f'Reserva {instance.get_status_display().lower()}')
+
+
+@receiver(pre_delete, sender=ProductReservation)
+def release_deleted_reservation_stock(sender, instance, **kwargs):
+    # Antes de eliminar: los movimientos quedan sin reserva (SET_NULL)
+    reservations.release_holds([instance.pk], note='Reserva eliminada')
@@ -0,0 +1,61 @@
+"""
+Estadísticas de productos (ProductStatsView).
+
+Una consulta por tabla: productos activos y con stock bajo con agregados
+condicionales, ventas y recaudación desde SalesTotal (sumas acumuladas, sin
+recorrer Sale) y reservas pendientes. El resultado se guarda en caché por
+PRODUCT_STATS_CACHE_TIMEOUT segundos y se invalida al confirmarse cualquier
+escritura de productos, stock, ventas o reservas; el plazo corto acota lo que
+puede durar un resultado calculado justo antes de una escritura.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Product, ProductReservation, SalesTotal
+
+
+STATS_KEY = 'products:stats'
+
+
+def product_stats():
+    """Estadísticas de productos, ventas y reservas (desde el caché si están vigentes)"""
+    stats = cache.get(STATS_KEY)
+    if stats is not None:
+        return stats
+
+    products = Product.objects.filter(is_active=True).aggregate(
+        total=Count('id'),
+        low_stock=Count('id', filter=Q(stock__lte=F('min_stock')))
+    )
+    sales = SalesTotal.objects.aggregate(count=Sum('sale_count'), revenue=Sum('revenue'))
+    stats = {
+        'total_products': products['total'],
+        'low_stock_products': products['low_stock'],
+        'total_sales': sales['count'] or 0,
+        'total_revenue': float(sales['revenue'] or 0),
+        'pending_reservations': ProductReservation.objects.filter(status='PENDIENTE').count()
+    }
+    cache.set(STATS_KEY, stats, settings.PRODUCT_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate():
+    """Descarta las estadísticas cacheadas al confirmarse la transacción actual"""
+    transaction.on_commit(lambda: cache.delete(STATS_KEY))
+
+
+def record_sale(sale, sign=1):
+    """Suma (o resta, con sign=-1) una venta a los totales acumulados, en la fila de su id"""
+    slot = sale.pk % SalesTotal.SLOTS
+    amount = Decimal(sale.total_amount) * sign
+    updated = SalesTotal.objects.filter(slot=slot).update(
+        sale_count=F('sale_count') + sign,
+        revenue=F('revenue') + amount
+    )
+    if not updated:
+        SalesTotal.objects.create(slot=slot, sale_count=sign, revenue=amount)
@@ -0,0 +1,209 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from veterinaria_pochita.testing import run_in_threads
+from .inventory import apply_movements, rebuild_stock
+from .lookup import VERSION_KEY, product_lookup
+from .models import Product, ProductReservation, Sale, SaleItem, StockMovement
+from .reservations import allocate_stock
+
+
+class ConcurrentSaleTests(TransactionTestCase):
+    """Ventas simultáneas del mismo producto nunca dejan el stock negativo"""
+
+    threads = 8
+    initial_stock = 10
+
+    def setUp(self):
+        self.receptionist = User.objects.create_user('recepcion', 'r@test.cl', 'x', role='RECEPCIONISTA')
+        self.product = Product.objects.create(
+            name='Collar', category='ACCESORIO', price=Decimal('5000'), stock=self.initial_stock
+        )
+        self.other = Product.objects.create(
+            name='Shampoo', category='HIGIENE', price=Decimal('3000'), stock=self.initial_stock
+        )
+
+    def sell(self, *items):
+        api_client = APIClient()
+        api_client.force_authenticate(self.receptionist)
+        return api_client.post('/api/products/sales/', {
+            'receptionist': self.receptionist.id,
+            'payment_method': 'EFECTIVO',
+            'items': [
+                {'product': product.id, 'quantity': quantity, 'unit_price': str(product.price)}
+                for product, quantity in items
+            ],
+        }, format='json', HTTP_HOST='localhost')
+
+    def assert_stock_matches_sales(self, product):
+        product.refresh_from_db()
+        sold = sum(SaleItem.objects.filter(product=product).values_list('quantity', flat=True))
+        self.assertGreaterEqual(product.stock, 0)
+        self.assertEqual(self.initial_stock - product.stock, sold)
+        self.assertEqual(
+            sum(StockMovement.objects.filter(product=product, kind='VENTA').values_list('quantity', flat=True)),
+            -sold
+        )
+
+    def test_parallel_sales_never_oversell(self):
+        quantity = 3
+        results = run_in_threads([lambda: self.sell((self.product, quantity)) for _ in range(self.threads)])
+        codes = [response.status_code for response in results]
+        self.assertTrue(all(code in (201, 400) for code in codes), codes)
+        for response in results:
+            if response.status_code == 400:
+                # Mismo formato que los errores de campo de DRF: lista de mensajes
+                self.assertEqual(len(response.json()['items']), 1)
+                self.assertIn('Stock insuficiente', response.json()['items'][0])
+
+        succeeded = codes.count(201)
+        self.assertEqual(succeeded, self.initial_stock // quantity)
+        self.assertEqual(Sale.objects.count(), succeeded)
+        self.assert_stock_matches_sales(self.product)
+        self.assertEqual(self.product.stock, self.initial_stock - succeeded * quantity)
+
+    def test_failed_sale_rolls_back_every_item(self):
+        # Cada venta lleva los dos productos; las que no caben no descuentan ninguno
+        results = run_in_threads([
+            lambda: self.sell((self.other, 1), (self.product, 4)) for _ in range(self.threads)
+        ])
+        succeeded = [response.status_code for response in results].count(201)
+        self.assertEqual(succeeded, self.initial_stock // 4)
+        self.assert_stock_matches_sales(self.product)
+        self.assert_stock_matches_sales(self.other)
+        self.assertEqual(self.other.stock, self.initial_stock - succeeded)
+
+
+class SaleValidationTests(TestCase):
+
+    def setUp(self):
+        self.receptionist = User.objects.create_user('recepcion', 'r@test.cl', 'x', role='RECEPCIONISTA')
+        self.product = Product.objects.create(name='Collar', category='ACCESORIO', price=Decimal('5000'), stock=10)
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(self.receptionist)
+
+    def test_non_positive_quantity_is_rejected(self):
+        for quantity in (-3, 0):
+            response = self.api_client.post('/api/products/sales/', {
+                'payment_method': 'EFECTIVO',
+                'items': [{'product': self.product.id, 'quantity': quantity, 'unit_price': '5000'}],
+            }, format='json', HTTP_HOST='localhost')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('quantity', response.json()['items'][0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+
+class ReservationPickupTests(TestCase):
+    """Retirar una reserva descuenta su stock una sola vez"""
+
+    def setUp(self):
+        self.receptionist = User.objects.create_user('recepcion', 'r@test.cl', 'x', role='RECEPCIONISTA')
+        self.client_user = User.objects.create_user('cliente', 'c@test.cl', 'x', role='CLIENTE')
+        self.product = Product.objects.create(name='Collar', category='ACCESORIO', price=Decimal('5000'))
+        apply_movements([StockMovement(product=self.product, kind='AJUSTE', quantity=5)])
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(self.receptionist)
+
+    def reserve(self, quantity):
+        reservation = ProductReservation.objects.create(
+            product=self.product, client=self.client_user, quantity=quantity
+        )
+        allocate_stock()
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'CONFIRMADA')
+        return reservation
+
+    def pick_up(self, reservation, quantity=None):
+        return self.api_client.post('/api/products/sales/', {
+            'client': self.client_user.id,
+            'payment_method': 'EFECTIVO',
+            'items': [{
+                'product': self.product.id,
+                'reservation': reservation.id,
+                'quantity': quantity or reservation.quantity,
+                'unit_price': str(self.product.price),
+            }],
+        }, format='json', HTTP_HOST='localhost')
+
+    def assert_stock(self, expected):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, expected)
+        # El libro de movimientos coincide con el stock guardado
+        self.assertEqual(rebuild_stock(dry_run=True), {})
+
+    def test_pickup_takes_stock_once(self):
+        reservation = self.reserve(2)
+        self.assert_stock(3)
+        response = self.pick_up(reservation)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assert_stock(3)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'COMPLETADA')
+        self.assertEqual(
+            sum(reservation.stock_movements.filter(kind='RESERVA').values_list('quantity', flat=True)), 0
+        )
+
+    def test_pickup_of_last_units(self):
+        # El apartado se llevó todo el stock: el retiro no choca con el stock disponible
+        reservation = self.reserve(5)
+        self.assert_stock(0)
+        self.assertEqual(self.pick_up(reservation).status_code, 201)
+        self.assert_stock(0)
+
+    def test_pickup_of_fewer_units_returns_the_rest(self):
+        reservation = self.reserve(3)
+        self.assertEqual(self.pick_up(reservation, quantity=1).status_code, 201)
+        self.assert_stock(4)
+
+    def test_reservation_is_picked_up_only_once(self):
+        reservation = self.reserve(2)
+        self.assertEqual(self.pick_up(reservation).status_code, 201)
+        response = self.pick_up(reservation)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json())
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assert_stock(3)
+
+    def test_completing_by_hand_is_rejected(self):
+        reservation = self.reserve(2)
+        response = self.api_client.patch(
+            f'/api/products/reservations/{reservation.id}/', {'status': 'COMPLETADA'},
+            format='json', HTTP_HOST='localhost'
+        )
+        self.assertEqual(response.status_code, 400)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'CONFIRMADA')
+        self.assert_stock(3)
+
+
+class ProductLookupCacheTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Collar', category='ACCESORIO', price=Decimal('5000'), barcode='7801234'
+        )
+        product_lookup.invalidate()
+
+    def test_hits_do_not_read_shared_version(self):
+        self.assertEqual(product_lookup.get('7801234')['id'], self.product.id)
+        with mock.patch.object(product_lookup, '_shared_version', wraps=product_lookup._shared_version) as shared:
+            with self.assertNumQueries(0):
+                for _ in range(100):
+                    self.assertEqual(product_lookup.get('7801234')['name'], 'Collar')
+        self.assertFalse(shared.called)
+
+    @override_settings(PRODUCT_LOOKUP_VERSION_INTERVAL=0)
+    def test_change_from_another_process_is_detected(self):
+        self.assertEqual(product_lookup.get('7801234')['name'], 'Collar')
+        # Otro proceso cambia el producto: solo sube la versión compartida
+        Product.objects.filter(pk=self.product.pk).update(name='Collar grande')
+        cache.incr(VERSION_KEY)
+        self.assertEqual(product_lookup.get('7801234')['name'], 'Collar grande')
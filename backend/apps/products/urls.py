@@ -2,12 +2,15 @@ from django.urls import path
 from .views import (
     ProductListCreateView,
     ProductDetailView,
+    StockMovementListCreateView,
+    ProductLookupView,
     LowStockProductsView,
     ProductReservationListCreateView,
     ProductReservationDetailView,
     SaleListCreateView,
     SaleDetailView,
-    ProductStatsView
+    ProductStatsView,
+    SalesReportView
 )
 
 app_name = 'products'
@@ -16,8 +19,11 @@ urlpatterns = [
     # Gestión de productos
     path('', ProductListCreateView.as_view(), name='product_list_create'),
     path('<int:pk>/', ProductDetailView.as_view(), name='product_detail'),
+    path('<int:pk>/movements/', StockMovementListCreateView.as_view(), name='stock_movement_list_create'),
+    path('lookup/', ProductLookupView.as_view(), name='product_lookup'),
     path('low-stock/', LowStockProductsView.as_view(), name='low_stock_products'),
     path('stats/', ProductStatsView.as_view(), name='product_stats'),
+    path('reports/sales/', SalesReportView.as_view(), name='sales_report'),
     
     # Gestión de reservas
     path('reservations/', ProductReservationListCreateView.as_view(), name='reservation_list_create'),
@@ -1,15 +1,27 @@
 from rest_framework import generics, permissions, filters, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count, Max
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import date
+from functools import partial
 
-from .models import Product, ProductReservation, Sale
+from .models import Product, ProductReservation, Sale, StockMovement
 from .serializers import (
     ProductSerializer,
     ProductReservationSerializer,
     SaleSerializer,
-    SaleCreateSerializer
+    SaleCreateSerializer,
+    StockMovementSerializer
 )
+from .stats import product_stats
+from .lookup import product_lookup
+from .reports import GROUPS, sales_report
+from veterinaria_pochita.conditional import conditional_response
+from veterinaria_pochita.pagination import KeysetPagination
 
 
 class ProductListCreateView(generics.ListCreateAPIView):
@@ -21,6 +33,11 @@ class ProductListCreateView(generics.ListCreateAPIView):
     search_fields = ['name', 'description', 'sku', 'barcode']
     ordering_fields = ['name', 'price', 'stock', 'created_at']
     filterset_fields = ['category', 'is_active']
+    
+    def list(self, request, *args, **kwargs):
+        # 304 si ningún producto activo cambió (las ventas también actualizan updated_at)
+        version = self.get_queryset().aggregate(Max('updated_at'), Count('id'))
+        return conditional_response(request, version, partial(super().list, request, *args, **kwargs))
 
 
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -30,6 +47,52 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
+class StockMovementListCreateView(generics.ListCreateAPIView):
+    """Vista para ver el historial de inventario de un producto y registrar reposiciones o ajustes"""
+    serializer_class = StockMovementSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kind']
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Solo el personal ve y modifica el inventario
+        if request.user.role == 'CLIENTE':
+            raise PermissionDenied(detail='No tiene permiso para ver el inventario')
+    
+    def get_queryset(self):
+        return StockMovement.objects.filter(product_id=self.kwargs['pk']).select_related('product', 'created_by')
+    
+    def perform_create(self, serializer):
+        product = get_object_or_404(Product, pk=self.kwargs['pk'])
+        serializer.save(product=product, created_by=self.request.user)
+
+
+class ProductLookupView(APIView):
+    """
+    Vista para buscar un producto activo por código de barras o SKU exacto
+    (lector del mostrador), desde el caché de búsqueda en memoria.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        code = request.query_params.get('code', '').strip()
+        if not code:
+            return Response(
+                {'error': 'Debe indicar el código a buscar (code)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        snapshot = product_lookup.get(code)
+        if snapshot is None:
+            return Response(
+                {'error': 'No hay un producto activo con ese código'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(snapshot, status=status.HTTP_200_OK)
+
+
 class LowStockProductsView(generics.ListAPIView):
     """Vista para obtener productos con stock bajo"""
     serializer_class = ProductSerializer
@@ -55,21 +118,22 @@ class ProductReservationListCreateView(generics.ListCreateAPIView):
         
         # Los clientes solo ven sus propias reservas
         if user.role == 'CLIENTE':
-            return ProductReservation.objects.filter(client=user)
+            return ProductReservation.objects.select_related('client', 'product').filter(client=user)
         
         # Recepcionistas ven todas
-        return ProductReservation.objects.all()
+        return ProductReservation.objects.select_related('client', 'product')
 
 
 class ProductReservationDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Vista para ver, actualizar y eliminar reservas de productos"""
-    queryset = ProductReservation.objects.all()
+    queryset = ProductReservation.objects.select_related('client', 'product')
     serializer_class = ProductReservationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
 class SaleListCreateView(generics.ListCreateAPIView):
     """Vista para listar y crear ventas"""
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter, DjangoFilterBackend]
     ordering_fields = ['created_at', 'total_amount']
@@ -85,15 +149,15 @@ class SaleListCreateView(generics.ListCreateAPIView):
         
         # Los clientes solo ven sus propias compras
         if user.role == 'CLIENTE':
-            return Sale.objects.filter(client=user)
+            return Sale.objects.select_related('client', 'receptionist').prefetch_related('items__product').filter(client=user)
         
         # Recepcionistas ven todas
-        return Sale.objects.all()
+        return Sale.objects.select_related('client', 'receptionist').prefetch_related('items__product')
 
 
 class SaleDetailView(generics.RetrieveAPIView):
     """Vista para ver detalles de una venta"""
-    queryset = Sale.objects.all()
+    queryset = Sale.objects.select_related('client', 'receptionist').prefetch_related('items__product')
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -110,28 +174,58 @@ class ProductStatsView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        from django.db.models import Sum, Count
-        
-        total_products = Product.objects.filter(is_active=True).count()
-        low_stock_products = Product.objects.filter(
-            is_active=True,
-            stock__lte=models.F('min_stock')
-        ).count()
+        return Response(product_stats(), status=status.HTTP_200_OK)
+
+
+class SalesReportView(APIView):
+    """
+    Reporte de ventas por rango de fechas (unidades, recaudación, costo y margen),
+    respondido desde los resúmenes diarios y mensuales.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role == 'CLIENTE':
+            return Response(
+                {'error': 'No tiene permiso para ver reportes'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        total_sales = Sale.objects.count()
-        total_revenue = Sale.objects.aggregate(total=Sum('total_amount'))['total'] or 0
+        params = request.query_params
+        today = timezone.localdate()
+        try:
+            start = date.fromisoformat(params['start']) if params.get('start') else today.replace(day=1)
+            end = date.fromisoformat(params['end']) if params.get('end') else today
+            product = int(params['product']) if params.get('product') else None
+        except ValueError:
+            return Response(
+                {'error': 'Parámetros inválidos: use fechas YYYY-MM-DD y un id de producto numérico'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {'error': 'La fecha de inicio debe ser anterior o igual a la de término'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        pending_reservations = ProductReservation.objects.filter(
-            status='PENDIENTE'
-        ).count()
+        group_by = params.get('group_by') or None
+        category = params.get('category') or None
+        payment_method = params.get('payment_method') or None
+        if group_by and group_by not in GROUPS:
+            return Response(
+                {'error': f'group_by debe ser uno de: {", ".join(GROUPS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if category and category not in dict(Product.CATEGORY_CHOICES):
+            return Response({'error': 'Categoría inválida'}, status=status.HTTP_400_BAD_REQUEST)
+        if payment_method and payment_method not in dict(Sale.PAYMENT_METHOD_CHOICES):
+            return Response({'error': 'Método de pago inválido'}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'total_products': total_products,
-            'low_stock_products': low_stock_products,
-            'total_sales': total_sales,
-            'total_revenue': float(total_revenue),
-            'pending_reservations': pending_reservations
-        }, status=status.HTTP_200_OK)
+        report = sales_report(
+            start, end, group_by,
+            product=product, category=category, payment_method=payment_method
+        )
+        return Response(report, status=status.HTTP_200_OK)
 
 
 # Import necesario para el queryset en LowStockProductsView
@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
 
 from .serializers import (
     UserSerializer, 
@@ -11,6 +12,7 @@ from .serializers import (
     UserUpdateSerializer,
     ChangePasswordSerializer
 )
+from veterinaria_pochita.conditional import conditional_response
 
 User = get_user_model()
 
@@ -115,6 +117,11 @@ class VeterinariansPublicListView(APIView):
             is_active=True
         ).order_by('first_name', 'last_name')
         
-        serializer = UserSerializer(veterinarians, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # 304 si no cambió ningún veterinario activo desde la última consulta del cliente
+        version = veterinarians.aggregate(Max('updated_at'), Count('id'))
+        return conditional_response(
+            request,
+            version,
+            lambda: Response(UserSerializer(veterinarians, many=True).data, status=status.HTTP_200_OK)
+        )
 
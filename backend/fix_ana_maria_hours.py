@@ -7,14 +7,15 @@ Luego ejecutar: exec(open('fix_ana_maria_hours.py').read())
 
 import os
 import django
-from datetime import datetime, timedelta, time
+from datetime import datetime
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'veterinaria_pochita.settings')
 django.setup()
 
 from apps.users.models import User
-from apps.appointments.models import TimeSlot, Appointment
+from apps.appointments.models import TimeSlot
+from apps.appointments.services import generate_time_slots
 
 print("🔧 Arreglando horarios de Ana María Oñate...")
 print("=" * 60)
@@ -39,55 +40,14 @@ print(f"  - Disponibles: {available_slots.count()}")
 print(f"  - Ocupados: {occupied_slots.count()}")
 
 today = datetime.now().date()
-time_slots_created = 0
-time_slots_updated = 0
 
 print(f"\n📅 Creando/actualizando horarios desde {today}...")
 
-# Crear horarios para los próximos 60 días
-for day in range(60):
-    date = today + timedelta(days=day)
-    
-    # Saltar domingos
-    if date.weekday() == 6:
-        continue
-    
-    # Horarios de mañana (9:00 - 13:00) - TODOS los horarios
-    for hour in range(9, 13):
-        slot, created = TimeSlot.objects.get_or_create(
-            veterinarian=ana_maria,
-            date=date,
-            start_time=time(hour, 0),
-            defaults={
-                'end_time': time(hour + 1, 0),
-                'is_available': True
-            }
-        )
-        if created:
-            time_slots_created += 1
-        else:
-            # Si ya existe pero está ocupado, no lo tocamos
-            # Si está disponible pero no ocupado, lo actualizamos
-            if slot.is_available:
-                time_slots_updated += 1
-    
-    # Horarios de tarde (15:00 - 19:00) - Solo días de semana
-    if date.weekday() < 5:  # Lunes a Viernes
-        for hour in range(15, 19):
-            slot, created = TimeSlot.objects.get_or_create(
-                veterinarian=ana_maria,
-                date=date,
-                start_time=time(hour, 0),
-                defaults={
-                    'end_time': time(hour + 1, 0),
-                    'is_available': True
-                }
-            )
-            if created:
-                time_slots_created += 1
-            else:
-                if slot.is_available:
-                    time_slots_updated += 1
+# Crear horarios para los próximos 60 días: mañanas de lunes a sábado (9:00 - 13:00)
+# y tardes de lunes a viernes (15:00 - 19:00). Los bloques existentes no se tocan.
+result = generate_time_slots([ana_maria], today, 60)
+time_slots_created = result['created']
+time_slots_existing = result['existing']
 
 # Contar horarios después
 final_slots = TimeSlot.objects.filter(veterinarian=ana_maria, date__gte=today)
@@ -96,7 +56,7 @@ final_available = final_slots.filter(is_available=True)
 print(f"\n✅ Proceso completado!")
 print(f"=" * 60)
 print(f"📈 Nuevos horarios creados: {time_slots_created}")
-print(f"🔄 Horarios actualizados: {time_slots_updated}")
+print(f"🔄 Horarios que ya existían: {time_slots_existing}")
 print(f"\n📊 Horarios finales desde hoy:")
 print(f"  - Total: {final_slots.count()}")
 print(f"  - Disponibles: {final_available.count()}")
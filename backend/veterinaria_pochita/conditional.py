@@ -0,0 +1,69 @@
+"""
+GET condicionales (ETag / Last-Modified) a partir de una versión barata del recurso.
+
+La vista calcula primero una marca de versión que no requiere armar la respuesta
+(la versión del mes en calendar_cache, o Max('updated_at') y Count del listado).
+Si el cliente ya tiene esa versión se responde 304 sin ejecutar las consultas
+del listado ni el serializer. El ETag combina la versión con la URL completa
+(filtros, orden, cursor) y el formato negociado, así cada variante tiene el suyo.
+
+La versión se lee antes de armar la respuesta: si un cambio se confirma entre
+ambos pasos, el ETag queda más antiguo que los datos y la petición siguiente
+simplemente los vuelve a descargar.
+
+Con Cache-Control: no-cache el navegador guarda la respuesta y revalida cada
+vez con If-None-Match, por lo que el frontend aprovecha el 304 sin cambios.
+"""
+
+import hashlib
+import time as time_module
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(request, version, private=False):
+    """ETag de la versión para esta URL y formato (y usuario, si la respuesta depende de él)"""
+    parts = [repr(version), request.get_full_path(), getattr(request, 'accepted_media_type', None) or '']
+    if private:
+        parts.append(str(request.user.pk))
+    return quote_etag(hashlib.sha1('|'.join(parts).encode()).hexdigest())
+
+
+def _not_modified(request, etag, last_modified):
+    """True si el cliente ya tiene esta versión (If-None-Match tiene prioridad sobre If-Modified-Since)"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+        return '*' in etags or etag in etags
+
+    if last_modified is None:
+        return False
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def conditional_response(request, version, build, last_modified=None, private=False):
+    """
+    Responde 304 si el cliente ya tiene `version`; si no, llama a `build()` para
+    armar la respuesta. `last_modified` (timestamp en segundos) solo debe
+    indicarse si cambia con cada modificación, incluidas las eliminaciones.
+    """
+    etag = make_etag(request, version, private)
+    if _not_modified(request, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+    response['ETag'] = etag
+    # Last-Modified tiene resolución de un segundo: solo se envía cuando ese
+    # segundo ya terminó, para que un cambio posterior nunca quede con la misma fecha
+    if last_modified is not None and int(last_modified) < int(time_module.time()):
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    patch_vary_headers(response, ['Accept', 'Authorization'] if private else ['Accept'])
+    return response
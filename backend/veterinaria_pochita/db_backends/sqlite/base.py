@@ -0,0 +1,35 @@
+"""
+Backend SQLite ajustado para un solo nodo con escrituras concurrentes.
+
+Opciones adicionales en DATABASES['default']['OPTIONS']:
+    journal_mode: modo de journal (por defecto WAL, lectores no bloquean al escritor)
+    synchronous: nivel de sincronización (por defecto NORMAL, seguro con WAL)
+    transaction_mode: DEFERRED, IMMEDIATE o EXCLUSIVE para los bloques atomic()
+El resto de opciones (p. ej. timeout, que actúa como busy timeout) pasan a sqlite3.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.journal_mode = kwargs.pop('journal_mode', 'WAL')
+        self.synchronous = kwargs.pop('synchronous', 'NORMAL')
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # IMMEDIATE toma el lock de escritura al inicio y evita fallos "database is locked"
+        # al promover una transacción de lectura a escritura
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,82 @@
+"""
+Middleware de presupuesto de consultas SQL por endpoint.
+
+Cuenta las consultas de cada petición, las registra por vista y las compara con
+QUERY_BUDGETS, indexado por (método, vista), o QUERY_BUDGET_DEFAULT: el
+presupuesto de un listado (GET) no aplica a la creación (POST) en la misma
+ruta. HEAD usa el presupuesto de GET. Solo se activa con DEBUG o con
+QUERY_BUDGET_STRICT; en modo estricto (tests) exceder el presupuesto lanza
+QueryBudgetExceeded para que la prueba falle, en DEBUG solo se registra una advertencia.
+"""
+
+import logging
+import threading
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Estadísticas acumuladas por vista: {'requests', 'total', 'max'}
+query_stats = {}
+_stats_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(Exception):
+    """Una petición ejecutó más consultas que las permitidas para su endpoint"""
+
+
+class _QueryCounter:
+    """execute_wrapper que cuenta las consultas ejecutadas"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _record(view_name, count):
+    with _stats_lock:
+        stats = query_stats.setdefault(view_name, {'requests': 0, 'total': 0, 'max': 0})
+        stats['requests'] += 1
+        stats['total'] += count
+        stats['max'] = max(stats['max'], count)
+
+
+class QueryBudgetMiddleware:
+    """Cuenta consultas por petición y aplica el presupuesto del endpoint"""
+
+    def __init__(self, get_response):
+        if not (settings.DEBUG or settings.QUERY_BUDGET_STRICT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        _record(view_name, counter.count)
+        response['X-Query-Count'] = str(counter.count)
+
+        method = 'GET' if request.method == 'HEAD' else request.method
+        budget = settings.QUERY_BUDGETS.get((method, view_name), settings.QUERY_BUDGET_DEFAULT)
+        if counter.count > budget:
+            message = (
+                f'{request.method} {request.path} ({view_name}) ejecutó '
+                f'{counter.count} consultas; presupuesto: {budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
@@ -0,0 +1,184 @@
+"""
+Paginación por cursor (keyset) para listados con mucho historial.
+
+PageNumberPagination ejecuta un COUNT(*) y un OFFSET por página, cuyo costo
+crece con el número de página. KeysetPagination filtra a partir de la última
+fila entregada ("WHERE (fecha, hora, id) < (...)") y recorre el índice del
+orden, por lo que la página 10.000 cuesta lo mismo que la primera.
+
+El cursor es opaco (base64 de la posición) y la respuesta mantiene las claves
+`next`, `previous` y `results`. Las peticiones con ?page=N siguen usando la
+paginación numérica para no romper integraciones existentes.
+"""
+
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _field_name(field):
+    """Nombre del campo del modelo para una entrada de ordering ('-pk' -> 'id')"""
+    name = field.lstrip('-')
+    return 'id' if name == 'pk' else name
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación keyset sobre un orden estable.
+    El orden se toma de ?ordering= (si la vista usa OrderingFilter), del atributo
+    `keyset_ordering` de la vista o del Meta.ordering del modelo; siempre se agrega
+    el id como desempate para que la posición sea única.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE
+        self.fallback = None
+
+    # Orden y posición
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    break
+        else:
+            ordering = None
+        ordering = list(ordering or getattr(view, 'keyset_ordering', None) or queryset.model._meta.ordering)
+
+        if 'id' not in [_field_name(field) for field in ordering]:
+            descending = ordering[0].startswith('-') if ordering else True
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    def _position_filter(self, ordering, position):
+        """
+        Filas posteriores a `position` según `ordering`. Se expande como
+        a <= x AND (a < x OR (a = x AND (b < y OR (b = y AND id < z))))
+        para que el primer campo acote un rango del índice.
+        """
+        condition = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name = _field_name(field)
+            after = Q(**{f'{name}__lt' if field.startswith('-') else f'{name}__gt': value})
+            condition = after if condition is None else after | (Q(**{name: value}) & condition)
+
+        first, value = ordering[0], position[0]
+        name = _field_name(first)
+        return Q(**{f'{name}__lte' if first.startswith('-') else f'{name}__gte': value}) & condition
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': [_encode_value(value) for value in position], 'r': int(reverse)})
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = payload['p']
+            if len(values) != len(ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(_field_name(field)).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+            return position, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    # API de paginación de DRF
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'page' in request.query_params:
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(request, queryset, view)
+        self.ordering = ordering
+        position, reverse = self.decode_cursor(request, queryset.model, ordering)
+
+        # Hacia atrás se invierte el orden y luego se dan vuelta los resultados
+        query_ordering = ordering
+        if reverse:
+            query_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        queryset = queryset.order_by(*query_ordering)
+        if position is not None:
+            queryset = queryset.filter(self._position_filter(query_ordering, position))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        self.page = results
+        return results
+
+    def _position(self, instance):
+        return [getattr(instance, _field_name(field)) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
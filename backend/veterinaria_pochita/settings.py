@@ -2,6 +2,7 @@
 Django settings for veterinaria_pochita project.
 """
 
+import sys
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'veterinaria_pochita.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -73,26 +75,116 @@ TEMPLATES = [
 WSGI_APPLICATION = 'veterinaria_pochita.wsgi.application'
 
 # Database
-# Para desarrollo rápido usamos SQLite
-# Para producción, cambiar a PostgreSQL
-DATABASES = {
+# DB_ENGINE=sqlite (por defecto): un solo nodo, SQLite con WAL y busy timeout
+# DB_ENGINE=postgresql: producción, conexiones persistentes con health checks
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='veterinaria_pochita'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Reutilizar conexiones entre peticiones y verificarlas antes de usarlas
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            # Detrás de PgBouncer en modo transaction los cursores del servidor no sobreviven
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_POOLER', default='') == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                'options': f"-c statement_timeout={config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int)}",
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'veterinaria_pochita.db_backends.sqlite',
+            'NAME': PROJECT_ROOT / 'database' / 'db.sqlite3',
+            'OPTIONS': {
+                # Segundos que una escritura espera el lock antes de fallar (busy timeout)
+                'timeout': config('DB_SQLITE_TIMEOUT', default=20, cast=int),
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # Base de pruebas en archivo: la de memoria compartida no espera el lock (busy timeout)
+            # y las pruebas con hilos fallarían con "database table is locked"
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
+# Cache
+# Por defecto memoria local; en producción se puede apuntar a Redis/Memcached
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': PROJECT_ROOT / 'database' / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='veterinaria-pochita'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
     }
 }
 
-# Para usar PostgreSQL, descomentar esto y comentar lo de arriba:
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': config('DB_NAME', default='veterinaria_pochita'),
-#         'USER': config('DB_USER', default='postgres'),
-#         'PASSWORD': config('DB_PASSWORD', default=''),
-#         'HOST': config('DB_HOST', default='localhost'),
-#         'PORT': config('DB_PORT', default='5432'),
-#     }
-# }
+# Segundos que se mantiene en caché un mes del calendario (se invalida al escribir bloques o citas)
+CALENDAR_CACHE_TIMEOUT = config('CALENDAR_CACHE_TIMEOUT', default=300, cast=int)
+
+# Segundos que se cachean las estadísticas de productos (también se invalidan con cada escritura)
+PRODUCT_STATS_CACHE_TIMEOUT = config('PRODUCT_STATS_CACHE_TIMEOUT', default=30, cast=int)
+# Antigüedad mínima (segundos) de una venta para que rollup_sales la agregue a los resúmenes
+SALES_ROLLUP_LAG_SECONDS = config('SALES_ROLLUP_LAG_SECONDS', default=60, cast=int)
+# Códigos escaneados que guarda en memoria cada proceso para /api/products/lookup/, segundos
+# máximos antes de vaciarlos y segundos entre revisiones de la versión compartida (con un caché
+# compartido los cambios de otros procesos se detectan en ese intervalo)
+PRODUCT_LOOKUP_CACHE_SIZE = config('PRODUCT_LOOKUP_CACHE_SIZE', default=5000, cast=int)
+PRODUCT_LOOKUP_MAX_AGE = config('PRODUCT_LOOKUP_MAX_AGE', default=300, cast=int)
+PRODUCT_LOOKUP_VERSION_INTERVAL = config('PRODUCT_LOOKUP_VERSION_INTERVAL', default=1, cast=float)
+# Horas que una reserva con stock asignado lo mantiene apartado antes de expirar
+RESERVATION_HOLD_HOURS = config('RESERVATION_HOLD_HOURS', default=48, cast=int)
+
+# Segundos máximos antes de reconstruir el índice de disponibilidad en memoria.
+# Con un caché compartido (Redis/Memcached) los cambios de otros procesos se detectan de inmediato
+AVAILABILITY_INDEX_MAX_AGE = config('AVAILABILITY_INDEX_MAX_AGE', default=300, cast=int)
+# Días hacia adelante que cubre el índice (los horarios recurrentes se expanden hasta ahí)
+AVAILABILITY_INDEX_DAYS = config('AVAILABILITY_INDEX_DAYS', default=180, cast=int)
+
+# Stream de cambios del calendario (SSE): duración máxima de cada conexión antes de que el
+# navegador se reconecte, intervalo de keepalive y espera sugerida para reconectar
+SLOT_STREAM_MAX_SECONDS = config('SLOT_STREAM_MAX_SECONDS', default=300, cast=int)
+SLOT_STREAM_KEEPALIVE_SECONDS = config('SLOT_STREAM_KEEPALIVE_SECONDS', default=15, cast=int)
+SLOT_STREAM_RETRY_MS = config('SLOT_STREAM_RETRY_MS', default=3000, cast=int)
+
+# Segundos máximos antes de reconstruir la cola de la lista de espera en memoria
+WAITING_LIST_QUEUE_MAX_AGE = config('WAITING_LIST_QUEUE_MAX_AGE', default=300, cast=int)
+# Al liberarse un bloque: False lo ofrece a la mejor entrada (queda contactada con el bloque ofrecido),
+# True además crea la cita para esa entrada
+WAITING_LIST_AUTO_ASSIGN = config('WAITING_LIST_AUTO_ASSIGN', default=False, cast=bool)
+
+# Presupuesto de consultas SQL por (método, endpoint) (solo con DEBUG o en tests)
+# Las escrituras sin entrada propia (p. ej. POST de citas o ventas) usan QUERY_BUDGET_DEFAULT
+# En modo estricto una petición que lo excede falla; por defecto estricto al ejecutar `manage.py test`
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default='test' in sys.argv[1:2], cast=bool)
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=20, cast=int)
+QUERY_BUDGETS = {
+    ('GET', 'appointments:timeslot_list_create'): 4,
+    ('GET', 'appointments:availability_rule_list_create'): 4,
+    ('GET', 'appointments:availability_exception_list_create'): 4,
+    ('GET', 'appointments:appointment_list_create'): 4,
+    ('GET', 'appointments:waiting_list_list_create'): 4,
+    ('GET', 'pets:pet_list_create'): 4,
+    ('GET', 'pets:medical_record_list_create'): 4,
+    ('GET', 'pets:pet_medical_history'): 4,
+    ('GET', 'products:reservation_list_create'): 4,
+    ('GET', 'products:sale_list_create'): 6,
+    ('GET', 'products:product_lookup'): 2,
+    ('GET', 'users:user_list'): 4,
+    ('GET', 'dashboard_api'): 6,
+}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -168,5 +260,15 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 # Email Configuration (opcional, para notificaciones)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# Localmente los correos se muestran en consola; en producción usar smtp.EmailBackend con EMAIL_HOST, etc.
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Veterinaria Pochita <no-reply@veterinariapochita.cl>')
+
+# Horas de anticipación con que send_reminders envía el recordatorio de cada cita
+REMINDER_WINDOW_HOURS = config('REMINDER_WINDOW_HOURS', default=24, cast=int)
 
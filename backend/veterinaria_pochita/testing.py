@@ -0,0 +1,33 @@
+"""
+Utilidades compartidas por los tests.
+
+run_in_threads() lanza peticiones realmente concurrentes desde un
+TransactionTestCase: todos los hilos parten a la vez detrás de una barrera y
+cada uno usa (y cierra al terminar) su propia conexión a la base de datos de
+prueba. Con SQLite esa base es un archivo para que las transacciones esperen
+los bloqueos (ver DATABASES['default']['TEST'] en settings.py).
+"""
+
+import threading
+
+from django.db import connection
+
+
+def run_in_threads(targets):
+    """Ejecuta las funciones en hilos que parten a la vez y retorna sus resultados en orden"""
+    barrier = threading.Barrier(len(targets))
+    results = [None] * len(targets)
+
+    def worker(index, target):
+        try:
+            barrier.wait()
+            results[index] = target()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, target)) for i, target in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
@@ -0,0 +1,42 @@
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import resolve
+
+from apps.users.models import User
+from .middleware import QueryBudgetMiddleware, QueryBudgetExceeded
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, QUERY_BUDGETS={('GET', 'products:sale_list_create'): 2})
+class QueryBudgetMiddlewareTests(TestCase):
+    """El presupuesto se aplica por (método, vista)"""
+
+    def _call(self, method, queries):
+        def get_response(request):
+            request.resolver_match = resolve('/api/products/sales/')
+            for _ in range(queries):
+                User.objects.count()
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method.lower())('/api/products/sales/')
+        return QueryBudgetMiddleware(get_response)(request)
+
+    def test_get_over_budget_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self._call('GET', 3)
+
+    def test_get_within_budget(self):
+        response = self._call('GET', 2)
+        self.assertEqual(response['X-Query-Count'], '2')
+
+    def test_head_uses_get_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self._call('HEAD', 3)
+
+    def test_post_uses_default_budget(self):
+        # La creación en la misma ruta no hereda el presupuesto del listado
+        with override_settings(QUERY_BUDGET_DEFAULT=12):
+            response = self._call('POST', 12)
+            self.assertEqual(response['X-Query-Count'], '12')
+            with self.assertRaises(QueryBudgetExceeded):
+                self._call('POST', 13)
+
@@ -7,6 +7,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 
+from apps.appointments.views import DashboardView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -15,6 +17,7 @@ urlpatterns = [
     path('api/pets/', include('apps.pets.urls')),
     path('api/appointments/', include('apps.appointments.urls')),
     path('api/products/', include('apps.products.urls')),
+    path('api/dashboard/', DashboardView.as_view(), name='dashboard_api'),
     
     # Frontend views
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
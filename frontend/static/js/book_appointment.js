@@ -9,6 +9,8 @@ let selectedService = null;
 let veterinarians = [];
 let availableSlots = [];
 let currentSlotsData = [];
+let slotsStream = null;
+let slotsStreamKey = null;
 
 document.addEventListener('DOMContentLoaded', async function() {
     // NO requerir autenticación - cualquiera puede acceder
@@ -929,23 +931,24 @@ async function loadAvailableSlots() {
         if (isAuthenticated()) {
             // Si está autenticado, usar el endpoint normal
             response = await authenticatedFetch(
-                `/api/appointments/calendar/monthly/?year=${year}&month=${parseInt(month)}&veterinarian_id=${selectedVeterinarian.id}`
+                `/api/appointments/calendar/monthly/?year=${year}&month=${parseInt(month)}&veterinarian_id=${selectedVeterinarian.id}&format=compact`
             );
         } else {
             // Si no está autenticado, usar endpoint público
             response = await fetch(
-                `/api/appointments/calendar/monthly/?year=${year}&month=${parseInt(month)}&veterinarian_id=${selectedVeterinarian.id}`
+                `/api/appointments/calendar/monthly/?year=${year}&month=${parseInt(month)}&veterinarian_id=${selectedVeterinarian.id}&format=compact`
             );
         }
         
         if (response.ok) {
             const data = await response.json();
-            const vetSlots = (data.calendar || []).filter(
+            const vetSlots = decodeCompactCalendar(data).filter(
                 item => item.veterinarian_id === selectedVeterinarian.id
             );
             
             currentSlotsData = vetSlots;
             renderCalendar(year, parseInt(month), vetSlots);
+            watchAvailableSlots(year, parseInt(month), selectedVeterinarian.id);
         } else {
             console.error('Error loading slots:', response.status);
             showAlert('booking-alert', 'No se pudieron cargar los horarios disponibles', 'warning');
@@ -956,6 +959,26 @@ async function loadAvailableSlots() {
     }
 }
 
+// Aplicar los cambios de horarios del veterinario en vivo en lugar de volver a descargar el mes
+function watchAvailableSlots(year, month, veterinarianId) {
+    const key = `${year}-${month}-${veterinarianId}`;
+    if (slotsStream && slotsStreamKey === key) return;
+    
+    if (slotsStream) slotsStream.close();
+    slotsStreamKey = key;
+    slotsStream = subscribeCalendarStream(year, month, veterinarianId, async (delta) => {
+        if (!applySlotDelta(currentSlotsData, delta)) return;
+        
+        renderCalendar(year, month, currentSlotsData);
+        if (selectedDate === delta.date) {
+            await loadTimeSlotsForDate(selectedDate, currentSlotsData);
+            if (selectedTimeSlot) {
+                document.querySelector(`.time-slot-btn[data-slot-id="${selectedTimeSlot.id}"]`)?.classList.add('selected');
+            }
+        }
+    }, () => loadAvailableSlots());
+}
+
 // Función para calcular la fecha de Pascua (algoritmo de Meeus/Jones/Butcher)
 function calculateEaster(year) {
     const a = year % 19;
@@ -5,6 +5,8 @@ let selectedSlot = null;
 let veterinarians = [];
 let calendarData = [];
 let rescheduleAppointmentId = null;
+let calendarStream = null;
+let calendarStreamMonth = null;
 
 // Función para calcular la fecha de Pascua (algoritmo de Meeus/Jones/Butcher)
 function calculateEaster(year) {
@@ -369,7 +371,8 @@ async function loadCalendarData() {
     
     try {
         // SIEMPRE cargar todos los veterinarios, ignorar el filtro para mostrar todos los slots disponibles
-        let url = `/api/appointments/calendar/monthly/?year=${year}&month=${month}`;
+        // Formato compacto: grillas por día en lugar de un objeto por bloque
+        let url = `/api/appointments/calendar/monthly/?year=${year}&month=${month}&format=compact`;
         // No aplicar filtro aquí para que siempre muestre todos los veterinarios
         
         console.log('Cargando datos del calendario para:', year, month);
@@ -378,7 +381,7 @@ async function loadCalendarData() {
         
         if (response.ok) {
             const data = await response.json();
-            calendarData = data.calendar || [];
+            calendarData = decodeCompactCalendar(data);
             
             console.log('Datos del calendario cargados:', calendarData.length, 'días');
             // Agrupar por veterinario para ver cuántos hay
@@ -396,6 +399,7 @@ async function loadCalendarData() {
             });
             
             renderCalendar();
+            watchCalendar(year, month);
         } else {
             const errorData = await response.json().catch(() => ({}));
             console.error('Error al cargar calendario:', errorData);
@@ -407,6 +411,31 @@ async function loadCalendarData() {
     }
 }
 
+// Mantener el mes al día con el stream de cambios en lugar de volver a descargarlo
+function watchCalendar(year, month) {
+    const key = `${year}-${month}`;
+    if (calendarStream && calendarStreamMonth === key) return;
+    
+    if (calendarStream) calendarStream.close();
+    calendarStreamMonth = key;
+    calendarStream = subscribeCalendarStream(year, month, null, (delta) => {
+        if (!applySlotDelta(calendarData, delta)) return;
+        
+        renderCalendar();
+        if (selectedDate) {
+            document.querySelector(`.calendar-day[data-date="${selectedDate}"]`)?.classList.add('selected');
+        }
+        
+        // Refrescar los horarios del día abierto, conservando el horario elegido si sigue libre
+        if (selectedDate === delta.date && !document.getElementById('slots-section').classList.contains('d-none')) {
+            displayAvailableSlots(selectedDate, calendarData.filter(d => d.date === selectedDate));
+            if (selectedSlot) {
+                document.querySelector(`.time-slot-btn[data-slot-id="${selectedSlot.id}"]`)?.classList.add('selected');
+            }
+        }
+    }, () => loadCalendarData());
+}
+
 function updateCalendar() {
     // Actualizar selector de mes
     const monthSelector = document.getElementById('month-selector');
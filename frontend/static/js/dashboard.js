@@ -1,5 +1,6 @@
 // dashboard.js - Panel principal y gestión de secciones
 let dashboardInitialHTML = null;
+let dashboardDataPromise = null;
 
 // Inicialización cuando el DOM está listo
 document.addEventListener('DOMContentLoaded', function() {
@@ -214,6 +215,22 @@ function setupMenuByRole(role) {
 
 // ==================== CARGA DE SECCIONES ====================
 
+// Obtiene mascotas, próximas citas, fichas recientes y estadísticas en una sola petición.
+// La respuesta se comparte entre las secciones del panel hasta que se vuelva a cargar.
+function fetchDashboardData(forceReload = false) {
+    if (!dashboardDataPromise || forceReload) {
+        dashboardDataPromise = authenticatedFetch('/api/dashboard/').then(response => {
+            if (!response.ok) {
+                throw new Error(`Error ${response.status} al cargar el panel`);
+            }
+            return response.json();
+        });
+        // Permitir reintentar si la petición falla
+        dashboardDataPromise.catch(() => { dashboardDataPromise = null; });
+    }
+    return dashboardDataPromise;
+}
+
 async function loadDashboardContent() {
     const contentArea = document.getElementById('content-area');
     if (!contentArea) return;
@@ -226,6 +243,9 @@ async function loadDashboardContent() {
     // Restaurar contenido inicial
     contentArea.innerHTML = dashboardInitialHTML;
     
+    // Datos frescos cada vez que se vuelve al panel
+    fetchDashboardData(true);
+    
     // Cargar próximas citas
     loadUpcomingAppointments();
     
@@ -247,52 +267,28 @@ async function loadUpcomingAppointments() {
     container.innerHTML = '<div class="text-center py-3"><div class="spinner-border spinner-border-sm"></div></div>';
     
     try {
-        const response = await authenticatedFetch('/api/appointments/');
+        // El servidor ya filtra por rol y ordena por fecha
+        const data = await fetchDashboardData();
+        const upcomingAppointments = data.upcoming_appointments;
         
-        if (response.ok) {
-            const data = await response.json();
-            const appointments = data.results || data;
-            
-            const userData = getUserData();
-            const isVet = userData.role === 'VETERINARIO';
-            
-            // Filtrar citas según el rol
-            let upcomingAppointments;
-            if (isVet) {
-                // Veterinarios ven solo sus citas confirmadas
-                upcomingAppointments = appointments
-                    .filter(apt => apt.veterinarian === userData.id && apt.status === 'CONFIRMADA')
-                    .sort((a, b) => new Date(a.appointment_date) - new Date(b.appointment_date))
-                    .slice(0, 5);
-            } else {
-                // Clientes y recepcionistas ven todas las citas
-                upcomingAppointments = appointments
-                    .filter(apt => apt.status !== 'CANCELADA')
-                    .sort((a, b) => new Date(a.appointment_date) - new Date(b.appointment_date))
-                    .slice(0, 5);
-            }
-            
-            if (upcomingAppointments.length === 0) {
-                container.innerHTML = '<p class="text-muted text-center">No hay citas próximas</p>';
-                return;
-            }
-            
-            container.innerHTML = upcomingAppointments.map(apt => `
-                <div class="list-group-item">
-                    <div class="d-flex justify-content-between align-items-start">
-                        <div>
-                            <h6 class="mb-1">${apt.pet_name || 'Mascota'}</h6>
-                            <p class="mb-1"><i class="fas fa-calendar"></i> ${formatDate(apt.appointment_date)}</p>
-                            <p class="mb-1"><i class="fas fa-clock"></i> ${formatTime(apt.time_slot?.start_time || apt.start_time || '')}</p>
-                            ${apt.veterinarian_name ? `<p class="mb-0 text-muted"><small><i class="fas fa-user-md"></i> ${apt.veterinarian_name}</small></p>` : ''}
-                        </div>
-                        ${getStatusBadge(apt.status)}
+        if (upcomingAppointments.length === 0) {
+            container.innerHTML = '<p class="text-muted text-center">No hay citas próximas</p>';
+            return;
+        }
+        
+        container.innerHTML = upcomingAppointments.map(apt => `
+            <div class="list-group-item">
+                <div class="d-flex justify-content-between align-items-start">
+                    <div>
+                        <h6 class="mb-1">${apt.pet_name || 'Mascota'}</h6>
+                        <p class="mb-1"><i class="fas fa-calendar"></i> ${formatDate(apt.appointment_date)}</p>
+                        <p class="mb-1"><i class="fas fa-clock"></i> ${formatTime(apt.appointment_time || '')}</p>
+                        ${apt.veterinarian_name ? `<p class="mb-0 text-muted"><small><i class="fas fa-user-md"></i> ${apt.veterinarian_name}</small></p>` : ''}
                     </div>
+                    ${getStatusBadge(apt.status)}
                 </div>
-            `).join('');
-        } else {
-            container.innerHTML = '<p class="text-danger">Error al cargar las citas</p>';
-        }
+            </div>
+        `).join('');
     } catch (error) {
         console.error('Error loading appointments:', error);
         container.innerHTML = '<p class="text-danger">Error al cargar las citas</p>';
@@ -301,39 +297,22 @@ async function loadUpcomingAppointments() {
 
 async function loadStatistics() {
     try {
-        // Cargar estadísticas de citas
-        const appointmentsResponse = await authenticatedFetch('/api/appointments/');
-        if (appointmentsResponse.ok) {
-            const appointmentsData = await appointmentsResponse.json();
-            const appointments = appointmentsData.results || appointmentsData;
-            
-            const today = new Date().toISOString().split('T')[0];
-            const todayAppointments = appointments.filter(apt => 
-                apt.appointment_date && apt.appointment_date.split('T')[0] === today
-            );
-            
-            const statAppointments = document.getElementById('stat-appointments');
-            if (statAppointments) {
-                statAppointments.textContent = todayAppointments.length;
-            }
-            
-            const pendingAppointments = appointments.filter(apt => apt.status === 'PENDIENTE');
-            const statPending = document.getElementById('stat-pending');
-            if (statPending) {
-                statPending.textContent = pendingAppointments.length;
-            }
+        const data = await fetchDashboardData();
+        const stats = data.stats;
+        
+        const statAppointments = document.getElementById('stat-appointments');
+        if (statAppointments) {
+            statAppointments.textContent = stats.today_appointments;
         }
         
-        // Cargar estadísticas de mascotas
-        const petsResponse = await authenticatedFetch('/api/pets/');
-        if (petsResponse.ok) {
-            const petsData = await petsResponse.json();
-            const pets = petsData.results || petsData;
-            
-            const statPets = document.getElementById('stat-pets');
-            if (statPets) {
-                statPets.textContent = pets.length;
-            }
+        const statPending = document.getElementById('stat-pending');
+        if (statPending) {
+            statPending.textContent = stats.pending_appointments;
+        }
+        
+        const statPets = document.getElementById('stat-pets');
+        if (statPets) {
+            statPets.textContent = stats.pets;
         }
     } catch (error) {
         console.error('Error loading statistics:', error);
@@ -347,91 +326,22 @@ async function loadMedicalRecordsSection(container) {
     const isVet = userData.role === 'VETERINARIO';
     
     try {
-        let allRecords = [];
+        // Fichas recientes filtradas por rol, con mascota y dueño, en una sola petición
+        const data = await fetchDashboardData(true);
+        const allRecords = data.recent_medical_records;
         
-        if (isVet) {
-            // Para veterinarios: usar endpoint directo de fichas médicas
-            const recordsResponse = await authenticatedFetch('/api/pets/medical-records/');
-            
-            if (recordsResponse.ok) {
-                const recordsData = await recordsResponse.json();
-                allRecords = recordsData.results || recordsData;
-                
-                // Obtener información adicional de las mascotas
-                if (allRecords.length > 0) {
-                    const petsResponse = await authenticatedFetch('/api/pets/');
-                    if (petsResponse.ok) {
-                        const petsData = await petsResponse.json();
-                        const pets = petsData.results || petsData;
-                        const petsMap = {};
-                        pets.forEach(pet => {
-                            petsMap[pet.id] = pet;
-                        });
-                        
-                        allRecords.forEach(record => {
-                            const pet = petsMap[record.pet];
-                            if (pet) {
-                                record.pet_name = pet.name;
-                                record.pet_id = pet.id;
-                                record.owner_name = pet.owner_name || 'N/A';
-                            }
-                        });
-                    }
-                }
-            } else {
-                container.innerHTML = '<p class="text-danger">Error al cargar las fichas médicas</p>';
-                return;
-            }
-        } else {
-            // Para clientes y recepcionistas: cargar desde historial de mascotas
-            const petsResponse = await authenticatedFetch('/api/pets/');
-            
-            if (petsResponse.ok) {
-                const petsData = await petsResponse.json();
-                const pets = petsData.results || petsData;
-                
-                // Para clientes, solo mostrar sus propias mascotas
-                const userPets = userData.role === 'CLIENTE' 
-                    ? pets.filter(pet => pet.owner === userData.id || pet.owner_id === userData.id)
-                    : pets;
-                
-                if (userPets.length === 0) {
-                    container.innerHTML = `
-                        <div class="text-center py-5">
-                            <i class="fas fa-file-medical fa-3x text-muted mb-3"></i>
-                            <p class="text-muted">${userData.role === 'CLIENTE' ? 'No tienes mascotas registradas' : 'No hay mascotas registradas'}</p>
-                            ${userData.role === 'CLIENTE' ? `
-                                <button class="btn btn-primary mt-3" onclick="loadSection('pets')">
-                                    <i class="fas fa-plus"></i> Registrar Mascota
-                                </button>
-                            ` : ''}
-                        </div>
-                    `;
-                    return;
-                }
-                
-                // Cargar fichas médicas de todas las mascotas
-                for (const pet of userPets) {
-                    try {
-                        const recordsResponse = await authenticatedFetch(`/api/pets/${pet.id}/history/`);
-                        if (recordsResponse.ok) {
-                            const recordsData = await recordsResponse.json();
-                            const records = recordsData.results || recordsData;
-                            records.forEach(record => {
-                                record.pet_name = pet.name;
-                                record.pet_id = pet.id;
-                                record.owner_name = pet.owner_name || 'N/A';
-                            });
-                            allRecords = allRecords.concat(records);
-                        }
-                    } catch (error) {
-                        console.error(`Error loading records for pet ${pet.id}:`, error);
-                    }
-                }
-            } else {
-                container.innerHTML = '<p class="text-danger">Error al cargar las fichas médicas</p>';
-                return;
-            }
+        // Para clientes sin mascotas, invitar a registrar una
+        if (userData.role === 'CLIENTE' && data.pets.length === 0) {
+            container.innerHTML = `
+                <div class="text-center py-5">
+                    <i class="fas fa-file-medical fa-3x text-muted mb-3"></i>
+                    <p class="text-muted">No tienes mascotas registradas</p>
+                    <button class="btn btn-primary mt-3" onclick="loadSection('pets')">
+                        <i class="fas fa-plus"></i> Registrar Mascota
+                    </button>
+                </div>
+            `;
+            return;
         }
         
         // Ordenar por fecha más reciente
@@ -241,3 +241,147 @@ function showNoData(elementId, message = 'No hay datos para mostrar') {
     }
 }
 
+
+// Cambios del calendario en vivo (Server-Sent Events)
+// Abre el stream del mes y llama onDelta por cada cambio de bloque u onReset cuando hay que recargar el mes
+function subscribeCalendarStream(year, month, veterinarianId, onDelta, onReset) {
+    if (!window.EventSource) {
+        return null;
+    }
+    
+    let url = `/api/appointments/calendar/stream/?year=${year}&month=${month}`;
+    if (veterinarianId) {
+        url += `&veterinarian_id=${veterinarianId}`;
+    }
+    
+    const source = new EventSource(url);
+    source.addEventListener('slot', (event) => onDelta(JSON.parse(event.data)));
+    source.addEventListener('reset', () => onReset());
+    return source;
+}
+
+// Convierte el calendario mensual compacto (?format=compact) a la lista de días por veterinario del formato normal
+function decodeCompactCalendar(data) {
+    const pad = (n) => String(n).padStart(2, '0');
+    const clock = (minutes) => `${pad(Math.floor(minutes / 60))}:${pad(minutes % 60)}`;
+    const calendarDays = [];
+    
+    for (const vet of data.veterinarians) {
+        for (const compactDay of vet.days) {
+            const date = `${data.year}-${pad(data.month)}-${pad(compactDay.day)}`;
+            const day = {
+                veterinarian_id: vet.id,
+                veterinarian_name: vet.name,
+                date: date,
+                available_slots: [],
+                occupied_slots: []
+            };
+            const addSlot = (id, start, end, free, appointmentId, status) => {
+                if (free) {
+                    day.available_slots.push({
+                        id: id,
+                        veterinarian: vet.id,
+                        veterinarian_name: vet.name,
+                        date: date,
+                        start_time: `${start}:00`,
+                        end_time: `${end}:00`,
+                        is_available: true
+                    });
+                } else if (appointmentId) {
+                    day.occupied_slots.push({ time_slot_id: id, start_time: start, end_time: end, appointment_id: appointmentId, status: status });
+                } else {
+                    day.occupied_slots.push({ time_slot_id: id, start_time: start, end_time: end, reason: 'No disponible' });
+                }
+            };
+            
+            // Ids de la grilla: tramos [primer id, cantidad]; 0 = bloque virtual (id calculado como en virtual_slots.py)
+            const ids = [];
+            compactDay.ids.forEach(([first, count]) => {
+                for (let i = 0; i < count; i++) ids.push(first ? first + i : 0);
+            });
+            const appointments = {};
+            (compactDay.appointments || []).forEach(([position, id, status]) => {
+                appointments[position] = { id, status };
+            });
+            
+            const [hours, minutes] = compactDay.start.split(':').map(Number);
+            const anchor = hours * 60 + minutes;
+            let index = 0;
+            for (let position = 0; position < compactDay.slots.length; position++) {
+                const state = compactDay.slots[position];
+                if (state === '-') continue;
+                const start = anchor + position * compactDay.step;
+                const dateNumber = data.year * 10000 + data.month * 100 + compactDay.day;
+                const id = ids[index++] || -(vet.id * 1e12 + dateNumber * 1e4 + Math.floor(start / 60) * 100 + start % 60);
+                const appointment = appointments[position] || {};
+                addSlot(id, clock(start), clock(start + compactDay.step), state === '1', appointment.id, appointment.status);
+            }
+            (compactDay.extra || []).forEach(slot => {
+                addSlot(slot.id, slot.start, slot.end, slot.free, slot.appointment, slot.status);
+            });
+            
+            if (compactDay.extra) {
+                day.available_slots.sort((a, b) => a.start_time.localeCompare(b.start_time));
+                day.occupied_slots.sort((a, b) => a.start_time.localeCompare(b.start_time));
+            }
+            calendarDays.push(day);
+        }
+    }
+    return calendarDays;
+}
+
+// Aplica un delta del stream a los datos del calendario mensual (lista de días por veterinario)
+// Retorna true si los datos cambiaron
+function applySlotDelta(calendarDays, delta) {
+    let day = calendarDays.find(d => d.veterinarian_id === delta.vet && d.date === delta.date);
+    
+    // Cambio de estado de la cita de un bloque ocupado
+    if ('appointment' in delta) {
+        const occupied = day ? day.occupied_slots.find(s => s.time_slot_id === delta.slot) : null;
+        if (!occupied) return false;
+        occupied.appointment_id = delta.appointment;
+        occupied.status = delta.status;
+        return true;
+    }
+    
+    // Quitar el bloque de su posición actual (también el bloque virtual del mismo horario)
+    const startShort = delta.start.substring(0, 5);
+    if (day) {
+        day.available_slots = day.available_slots.filter(s => s.id !== delta.slot && s.start_time !== delta.start);
+        day.occupied_slots = day.occupied_slots.filter(s => s.time_slot_id !== delta.slot && s.start_time !== startShort);
+    }
+    if (delta.deleted) return true;
+    
+    if (!day) {
+        const sameVet = calendarDays.find(d => d.veterinarian_id === delta.vet);
+        day = {
+            veterinarian_id: delta.vet,
+            veterinarian_name: sameVet ? sameVet.veterinarian_name : '',
+            date: delta.date,
+            available_slots: [],
+            occupied_slots: []
+        };
+        calendarDays.push(day);
+    }
+    
+    if (delta.available) {
+        day.available_slots.push({
+            id: delta.slot,
+            veterinarian: delta.vet,
+            veterinarian_name: day.veterinarian_name,
+            date: delta.date,
+            start_time: delta.start,
+            end_time: delta.end,
+            is_available: true
+        });
+        day.available_slots.sort((a, b) => a.start_time.localeCompare(b.start_time));
+    } else {
+        day.occupied_slots.push({
+            time_slot_id: delta.slot,
+            start_time: startShort,
+            end_time: delta.end.substring(0, 5)
+        });
+        day.occupied_slots.sort((a, b) => a.start_time.localeCompare(b.start_time));
+    }
+    return true;
+}